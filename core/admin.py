@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Discipline, Course, Profile, Post, Comment, Like, Notification
+from .models import AIJob, Discipline, Course, Profile, Post, Comment, Like, Notification, StoredFile, UserStats
 
 admin.site.register(Discipline)
 admin.site.register(Course)
@@ -8,3 +8,6 @@ admin.site.register(Post)
 admin.site.register(Comment)
 admin.site.register(Like)
 admin.site.register(Notification)
+admin.site.register(UserStats)
+admin.site.register(StoredFile)
+admin.site.register(AIJob)
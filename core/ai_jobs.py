@@ -0,0 +1,376 @@
+# core/ai_jobs.py
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import AIJob, Post
+from .utils import (
+    ai_result_ok,
+    chunk_text,
+    extract_text_from_pdf,
+    generate_explanation,
+    generate_summary,
+)
+from .textrank import compress
+from .tracing import span, trace
+from .versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+# Short posts get an explanation, longer ones a summary
+TEXT_EXPLAIN_THRESHOLD = 200
+
+
+def content_hash(text) -> str:
+    return hashlib.sha256((text or "").strip().encode()).hexdigest()
+
+
+def is_short_content(text) -> bool:
+    text = text or ""
+    return bool(text.strip()) and len(text) <= TEXT_EXPLAIN_THRESHOLD
+
+
+def content_job_kind(text):
+    if not (text or "").strip():
+        return None
+    return AIJob.EXPLANATION if is_short_content(text) else AIJob.TEXT_SUMMARY
+
+
+def precomputed_result(post, kind):
+    """The stored explanation or text summary, if it matches the current content."""
+    result = getattr(post, kind)
+    if result and post.content_hash == content_hash(post.content):
+        return result
+    return None
+
+
+# ---------- scheduling ----------
+
+
+def pending_work(post) -> list:
+    """(kind, source) pairs for the results of ``post`` that are missing or stale."""
+    work = []
+    kind = content_job_kind(post.content)
+    current = content_hash(post.content)
+    if kind and (current != post.content_hash or not getattr(post, kind)):
+        work.append((kind, current))
+    if post.file and post.file.name.lower().endswith(".pdf") and not post.pdf_summary:
+        work.append((AIJob.PDF_SUMMARY, post.file.name))
+    return work
+
+
+def _enqueue(post, kind, source, run_after, priority):
+    job, created = AIJob.objects.get_or_create(
+        post=post,
+        kind=kind,
+        defaults={"source_hash": source, "run_after": run_after, "priority": priority},
+    )
+    if created:
+        return
+    jobs = AIJob.objects.filter(pk=job.pk)
+    # A job keeps the most urgent class it was ever queued with. Moving it up
+    # a class touches nothing else: not its schedule, lease or attempts.
+    jobs.filter(priority__gt=priority).update(priority=priority)
+    # The same version again (e.g. a page polling for its result) stands as
+    # it is; new content replaces the queued version. A worker still running
+    # the old one keeps its lease; the new version runs once it is released.
+    jobs.exclude(source_hash=source).update(
+        source_hash=source, run_after=run_after, attempts=0
+    )
+
+
+def schedule_precompute(post, priority=AIJob.EAGER) -> list:
+    """Queue AI work for the parts of ``post`` whose results are missing or stale.
+
+    Called after every create and edit; each edit pushes the job back by
+    AI_PRECOMPUTE_DEBOUNCE_SECONDS, so a burst of edits runs once.
+    Interactive requests are not debounced.
+    """
+    if not settings.AI_PRECOMPUTE_ENABLED:
+        return []
+    run_after = timezone.now()
+    if priority != AIJob.INTERACTIVE:
+        run_after += timedelta(seconds=settings.AI_PRECOMPUTE_DEBOUNCE_SECONDS)
+
+    work = pending_work(post)
+    for kind, source in work:
+        _enqueue(post, kind, source, run_after, priority)
+    return [kind for kind, _ in work]
+
+
+def queue_backfill(batch_size: int = 1000) -> int:
+    """Queue backfill jobs for every post with missing results; returns the count."""
+    now = timezone.now()
+    queued = 0
+    posts = Post.objects.filter(ai_jobs__isnull=True).only(
+        "pk",
+        "content",
+        "content_hash",
+        "text_summary",
+        "explanation",
+        "file",
+        "pdf_summary",
+    )
+    batch = []
+    for post in posts.iterator(chunk_size=batch_size):
+        batch.extend(
+            AIJob(
+                post=post,
+                kind=kind,
+                source_hash=source,
+                run_after=now,
+                priority=AIJob.BACKFILL,
+            )
+            for kind, source in pending_work(post)
+        )
+        if len(batch) >= batch_size:
+            queued += len(AIJob.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        queued += len(AIJob.objects.bulk_create(batch, ignore_conflicts=True))
+    return queued
+
+
+# ---------- fair scheduling ----------
+
+
+def class_name(priority) -> str:
+    return dict(AIJob.PRIORITY_CHOICES)[priority]
+
+
+class FairShare:
+    """Stride scheduling between priority classes.
+
+    Each class advances a virtual clock by 1/weight per job it is given,
+    and the class with the earliest clock goes next. Over time every
+    backlogged class gets jobs in proportion to its weight. A class that was
+    idle rejoins at the current clock instead of claiming the turns it missed.
+    """
+
+    def __init__(self):
+        self.passes = {}
+
+    def pick(self, active):
+        floor = min(self.passes.values(), default=0.0)
+        for priority in active:
+            self.passes[priority] = max(self.passes.get(priority, floor), floor)
+        # Ties go to the more urgent class
+        priority = min(active, key=lambda p: (self.passes[p], p))
+        self.passes[priority] += 1 / settings.AI_JOB_CLASS_WEIGHTS[class_name(priority)]
+        return priority
+
+
+_fair_share = FairShare()
+
+
+def effective_class(priority, run_after, now) -> int:
+    """Aging: a job moves up one class for every AI_JOB_AGING_SECONDS it waits."""
+    waited = (now - run_after).total_seconds()
+    return max(
+        AIJob.INTERACTIVE, priority - int(waited // settings.AI_JOB_AGING_SECONDS)
+    )
+
+
+def _count(key, amount=1):
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, timeout=None)
+
+
+def record_wait(priority, seconds):
+    name = class_name(priority)
+    _count(f"ai_jobs:claimed:{name}")
+    _count(f"ai_jobs:wait_ms:{name}", int(seconds * 1000))
+
+
+def claim_due_jobs(limit: int) -> list:
+    """Lease up to ``limit`` due jobs to this worker.
+
+    Jobs are shared between classes by AI_JOB_CLASS_WEIGHTS after aging,
+    and no class runs more than AI_JOB_CLASS_CONCURRENCY jobs at once
+    across all workers.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.AI_JOB_LEASE_SECONDS)
+    running = dict(
+        AIJob.objects.filter(locked_until__gt=now)
+        .values_list("priority")
+        .annotate(n=Count("pk"))
+    )
+    due = AIJob.objects.filter(run_after__lte=now).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lte=now)
+    )
+
+    queues = {priority: [] for priority, _ in AIJob.PRIORITY_CHOICES}
+    for priority, name in AIJob.PRIORITY_CHOICES:
+        room = settings.AI_JOB_CLASS_CONCURRENCY[name] - running.get(priority, 0)
+        if room <= 0:
+            continue
+        rows = due.filter(priority=priority).order_by("run_after")
+        for row in rows.values_list("pk", "locked_until", "run_after", "priority")[
+            : min(room, limit)
+        ]:
+            queues[effective_class(row[3], row[2], now)].append(row)
+    for rows in queues.values():
+        rows.sort(key=lambda row: row[2])
+
+    claimed = []
+    while len(claimed) < limit:
+        active = [p for p, rows in queues.items() if rows]
+        if not active:
+            break
+        pk, locked_until, run_after, priority = queues[_fair_share.pick(active)].pop(0)
+        # Only one worker's update matches the lease it saw
+        if AIJob.objects.filter(pk=pk, locked_until=locked_until).update(
+            locked_until=lease, attempts=F("attempts") + 1
+        ):
+            claimed.append(pk)
+            record_wait(priority, (now - run_after).total_seconds())
+    jobs = AIJob.objects.filter(pk__in=claimed).select_related("post").in_bulk()
+    # In the order the scheduler chose them
+    return [jobs[pk] for pk in claimed]
+
+
+def queue_stats() -> dict:
+    """Per-class queue depth, running jobs and wait times."""
+    now = timezone.now()
+    waiting = Q(run_after__lte=now) & ~Q(locked_until__gt=now)
+    rows = {
+        row["priority"]: row
+        for row in AIJob.objects.values("priority").annotate(
+            pending=Count("pk"),
+            depth=Count("pk", filter=waiting),
+            running=Count("pk", filter=Q(locked_until__gt=now)),
+            oldest=Min("run_after", filter=waiting),
+        )
+    }
+    stats = {}
+    for priority, name in AIJob.PRIORITY_CHOICES:
+        row = rows.get(priority, {})
+        claimed = cache.get(f"ai_jobs:claimed:{name}", 0)
+        wait_ms = cache.get(f"ai_jobs:wait_ms:{name}", 0)
+        stats[name] = {
+            "pending": row.get("pending", 0),
+            "depth": row.get("depth", 0),
+            "running": row.get("running", 0),
+            "oldest_wait": (
+                (now - row["oldest"]).total_seconds() if row.get("oldest") else 0.0
+            ),
+            "claimed": claimed,
+            "mean_wait": wait_ms / claimed / 1000 if claimed else 0.0,
+        }
+    return stats
+
+
+# ---------- running ----------
+
+
+def summarize_text(text: str) -> str:
+    summaries = [
+        generate_summary(text=block)
+        for block in chunk_text(compress(text), max_chars=8000)
+    ]
+    with span("reduce", parts=len(summaries)):
+        return "\n\n".join(summaries)
+
+
+def compute(job):
+    """Run the model call for ``job``; returns the Post fields to update."""
+    post = job.post
+    if job.kind == AIJob.PDF_SUMMARY:
+        shared = (
+            Post.objects.filter(file=post.file.name, pdf_summary__gt="")
+            .values_list("pdf_summary", flat=True)
+            .first()
+        )
+        summary = shared or summarize_text(extract_text_from_pdf(post.file.path))
+        return {"pdf_summary": summary}
+
+    text = post.content.strip()
+    if job.kind == AIJob.EXPLANATION:
+        result = generate_explanation(text)
+    else:
+        result = summarize_text(text)
+    # Written together, so the result is only ever served for this content
+    return {job.kind: result, "content_hash": job.source_hash}
+
+
+def is_stale(job) -> bool:
+    post = job.post
+    if job.kind == AIJob.PDF_SUMMARY:
+        return post.file.name != job.source_hash
+    return content_hash(post.content) != job.source_hash
+
+
+def run_job(job) -> bool:
+    with trace(
+        "ai_job", f"aijob-{job.pk}-{job.attempts}", kind=job.kind, post=job.post_id
+    ):
+        try:
+            return _run_job(job)
+        finally:
+            # An edit queued a newer version meanwhile; it waits for our lease
+            AIJob.objects.filter(pk=job.pk, locked_until=job.locked_until).update(
+                locked_until=None
+            )
+
+
+def _run_job(job) -> bool:
+    # A job rescheduled by a later edit keeps its row; only finish this version
+    this_version = AIJob.objects.filter(
+        pk=job.pk, source_hash=job.source_hash, run_after=job.run_after
+    )
+    if is_stale(job):
+        this_version.delete()
+        return False
+
+    try:
+        fields = compute(job)
+        result = fields.get(job.kind, "")
+        if not ai_result_ok(result):
+            raise RuntimeError(result)
+    except Exception as e:
+        if job.attempts >= settings.AI_JOB_MAX_ATTEMPTS:
+            logger.error(f"Giving up on {job} after {job.attempts} attempts: {e}")
+            this_version.delete()
+        else:
+            delay = timedelta(minutes=2**job.attempts)
+            logger.warning(f"{job} failed, retrying in {delay}: {e}")
+            this_version.update(run_after=timezone.now() + delay, locked_until=None)
+        return False
+
+    posts = Post.objects.filter(pk=job.post_id)
+    if job.kind == AIJob.PDF_SUMMARY:
+        posts = posts.filter(file=job.source_hash)
+    with span("persist"):
+        posts.update(**fields)
+        bump_version("post", job.post_id)
+        this_version.delete()
+    return True
+
+
+def _run_in_thread(job) -> bool:
+    try:
+        return run_job(job)
+    finally:
+        connection.close()
+
+
+def run_due_jobs(limit: int = 20, workers: int = 1) -> tuple[int, int]:
+    """Run due jobs once; returns (succeeded, attempted)."""
+    jobs = claim_due_jobs(limit)
+    if workers > 1 and len(jobs) > 1:
+        # The model calls are network-bound, so threads overlap them well
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            done = sum(pool.map(_run_in_thread, jobs))
+    else:
+        done = sum(run_job(job) for job in jobs)
+    return done, len(jobs)
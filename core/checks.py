@@ -0,0 +1,22 @@
+# core/checks.py
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.DEBUG or settings.TESTING or not backend.endswith("LocMemCache"):
+        return []
+    return [
+        Warning(
+            "The default cache is per-process (LocMemCache).",
+            hint=(
+                "Cache versions are not shared between workers, so edits made "
+                "in one worker leave stale fragments in the others. Set "
+                "REDIS_URL."
+            ),
+            id="core.W001",
+        )
+    ]
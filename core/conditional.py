@@ -0,0 +1,72 @@
+# core/conditional.py
+
+import hashlib
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .metrics import cache_lookup
+from .versions import get_version
+
+# Conditional GET for pages built from version counters (core.versions):
+# the ETag is computed from the counters without rendering anything, so an
+# unchanged page costs a few cache reads and a 304.
+
+
+def csrf_secret(request) -> str:
+    # The page embeds tokens derived from this secret. Creating it now, as
+    # rendering would, keeps the first response's ETag valid for later visits.
+    get_token(request)
+    return request.META["CSRF_COOKIE"]
+
+
+def page_etag(request, user, *parts) -> str | None:
+    """Weak ETag for a page rendered for ``user`` from the given versions.
+
+    Besides ``parts`` it covers what base.html shows: the user, their name
+    and avatar, their notifications and the CSRF secret behind the tokens in
+    its forms. Returns None when the page carries one-off flash messages.
+    """
+    if len(get_messages(request)):
+        return None
+    raw = ":".join(
+        str(part)
+        for part in (
+            settings.ETAG_SALT,
+            user.pk,
+            user.get_username(),
+            csrf_secret(request),
+            get_version("notifications", user.pk),
+            get_version("profile", user.pk),
+            *parts,
+        )
+    )
+    return f'W/"{hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()}"'
+
+
+def set_validators(response, etag, last_modified=None):
+    if etag is None:
+        return response
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    # Let browsers and htmx keep the page, but always revalidate it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 response when the client's copy is current, otherwise None."""
+    if etag is None:
+        return None
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified.timestamp() if last_modified else None,
+    )
+    cache_lookup("http_conditional", response is not None)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
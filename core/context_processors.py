@@ -8,9 +8,11 @@ def notifications(request):
         unread_count = Notification.objects.filter(
             user=request.user, is_read=False
         ).count()
-        recent_notifications = Notification.objects.filter(user=request.user).order_by(
-            "-created_at"
-        )[:5]
+        recent_notifications = (
+            Notification.objects.filter(user=request.user)
+            .select_related("post")
+            .order_by("-created_at")[:5]
+        )
 
         return {
             "unread_notifications_count": unread_count,
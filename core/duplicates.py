@@ -0,0 +1,184 @@
+# core/duplicates.py
+
+import hashlib
+import logging
+import re
+import zlib
+from functools import cache, reduce
+from operator import or_
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .ai_jobs import content_hash, content_job_kind, precomputed_result
+from .lazy import lazy_import
+from .models import AIJob, MinHashBand, Post, PostFingerprint
+from .utils import extract_text_from_pdf
+
+logger = logging.getLogger(__name__)
+np = lazy_import("numpy")
+
+WORD = re.compile(r"\w+")
+SHINGLE_WORDS = 5
+# Posts with fewer shingles ("thanks!", a bare link) match too easily
+MIN_SHINGLES = 10
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard similarity almost always share
+# a bucket, pairs below ~0.4 almost never do
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+
+@cache
+def _permutations():
+    """(a, b, prime, mask) of the NUM_PERM hash functions a * x + b mod prime."""
+    rng = np.random.RandomState(1)
+    # Fixed seed: signatures are only comparable under the same permutations
+    a = rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+    return a, b, np.uint64((1 << 61) - 1), np.uint64((1 << 32) - 1)
+
+
+def shingles(text: str) -> "np.ndarray":
+    """32-bit hashes of the distinct word 5-grams of ``text``."""
+    words = WORD.findall((text or "").lower())
+    grams = {
+        " ".join(words[i : i + SHINGLE_WORDS])
+        for i in range(max(len(words) - SHINGLE_WORDS + 1, 0))
+    }
+    return np.fromiter(
+        (zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams)
+    )
+
+
+def signature(text: str):
+    """MinHash signature of ``text`` (NUM_PERM uint32), or None if too short."""
+    hashes = shingles(text)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    a, b, prime, mask = _permutations()
+    result = np.full(NUM_PERM, mask, dtype=np.uint64)
+    # Blocks keep the NUM_PERM x block matrix small for long documents
+    for start in range(0, len(hashes), 4096):
+        block = hashes[start : start + 4096]
+        permuted = ((a[:, None] * block[None, :] + b[:, None]) % prime) & mask
+        np.minimum(result, permuted.min(axis=1), out=result)
+    return result.astype("<u4")
+
+
+def similarity(a, b) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.mean(a == b))
+
+
+def band_buckets(sig) -> list[int]:
+    buckets = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            sig[band * ROWS : (band + 1) * ROWS].tobytes(), digest_size=8
+        )
+        buckets.append(int.from_bytes(digest.digest(), "big", signed=True))
+    return buckets
+
+
+def fingerprint_text(post) -> str:
+    parts = [post.content or ""]
+    if post.file and post.file.name.lower().endswith(".pdf"):
+        try:
+            # The first pages identify a document well enough
+            parts.append(
+                extract_text_from_pdf(
+                    post.file.path, max_pages=settings.DUPLICATE_PDF_PAGES
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Could not read {post.file.name} for post {post.pk}: {e}")
+    return "\n".join(parts)
+
+
+def update_fingerprint(post):
+    """Recompute the signature and LSH buckets of ``post``; returns the signature."""
+    sig = signature(fingerprint_text(post))
+    with transaction.atomic():
+        MinHashBand.objects.filter(post=post).delete()
+        if sig is None:
+            PostFingerprint.objects.filter(post=post).delete()
+            return None
+        PostFingerprint.objects.update_or_create(
+            post=post, defaults={"signature": sig.tobytes()}
+        )
+        MinHashBand.objects.bulk_create(
+            MinHashBand(post=post, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_buckets(sig))
+        )
+    return sig
+
+
+def _load(raw):
+    return np.frombuffer(bytes(raw), dtype="<u4")
+
+
+def find_near_duplicates(post, threshold=None, limit=5) -> list:
+    """Earlier posts whose text is near-identical to ``post``'s, most similar first.
+
+    Returns (post, similarity) pairs. Candidates come from the LSH buckets,
+    so only posts sharing a band are compared.
+    """
+    if threshold is None:
+        threshold = settings.DUPLICATE_THRESHOLD
+    raw = (
+        PostFingerprint.objects.filter(post=post)
+        .values_list("signature", flat=True)
+        .first()
+    )
+    if raw is None:
+        return []
+    sig = _load(raw)
+    lookup = reduce(
+        or_,
+        (Q(band=band, bucket=bucket) for band, bucket in enumerate(band_buckets(sig))),
+    )
+    candidates = (
+        MinHashBand.objects.filter(lookup)
+        .exclude(post=post)
+        .values_list("post_id", flat=True)
+        .distinct()
+    )
+    scored = [
+        (post_id, similarity(sig, _load(other)))
+        for post_id, other in PostFingerprint.objects.filter(
+            post_id__in=candidates, post__created_at__lte=post.created_at
+        ).values_list("post_id", "signature")
+    ]
+    scored = sorted(
+        (pair for pair in scored if pair[1] >= threshold), key=lambda pair: -pair[1]
+    )[:limit]
+    posts = Post.objects.select_related("course").in_bulk([pk for pk, _ in scored])
+    return [(posts[pk], score) for pk, score in scored if pk in posts]
+
+
+def reuse_summaries(post, original) -> list:
+    """Copy the AI results of ``original`` onto its near-duplicate ``post``.
+
+    Returns the names of the fields copied. Copied text results are stamped
+    with ``post``'s own content hash so core.ai_jobs treats them as current.
+    """
+    fields = {}
+    # Similar text says nothing about the attachment: only the same file
+    # (by content digest) can share its summary
+    same_file = post.file_digest and post.file_digest == original.file_digest
+    if same_file and not post.pdf_summary and original.pdf_summary:
+        fields["pdf_summary"] = original.pdf_summary
+    kind = content_job_kind(post.content)
+    if kind and kind == content_job_kind(original.content):
+        result = precomputed_result(original, kind)
+        if result:
+            fields[kind] = result
+            fields["content_hash"] = content_hash(post.content)
+    if not fields:
+        return []
+    Post.objects.filter(pk=post.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(post, name, value)
+    AIJob.objects.filter(post=post, kind__in=list(fields)).delete()
+    return [name for name in fields if name != "content_hash"]
@@ -0,0 +1,102 @@
+# core/exports.py
+
+import csv
+import json
+
+from .models import Comment, Like, Post
+
+EXPORT_FORMATS = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+EXPORT_FIELDS = [
+    "type",
+    "id",
+    "post_id",
+    "user",
+    "title",
+    "content",
+    "file",
+    "pdf_summary",
+    "like_count",
+    "created_at",
+]
+
+
+def iter_course_rows(course, chunk_size: int = 2000):
+    """Yield every post, comment and like of a course as flat dicts.
+
+    Rows are fetched with server-side iteration in chunks, and the authors
+    are joined in, so memory stays flat and there is no query per row.
+    """
+    posts = (
+        Post.objects.filter(course=course)
+        .select_related("author")
+        .order_by("pk")
+        .iterator(chunk_size=chunk_size)
+    )
+    for post in posts:
+        yield {
+            "type": "post",
+            "id": post.pk,
+            "post_id": post.pk,
+            "user": post.author.username,
+            "title": post.title,
+            "content": post.content,
+            "file": post.file.name or "",
+            "pdf_summary": post.pdf_summary or "",
+            "like_count": post.like_count,
+            "created_at": post.created_at.isoformat(),
+        }
+
+    comments = (
+        Comment.objects.filter(post__course=course)
+        .select_related("user")
+        .order_by("pk")
+        .iterator(chunk_size=chunk_size)
+    )
+    for comment in comments:
+        yield {
+            "type": "comment",
+            "id": comment.pk,
+            "post_id": comment.post_id,
+            "user": comment.user.username,
+            "content": comment.content,
+            "created_at": comment.created_at.isoformat(),
+        }
+
+    likes = (
+        Like.objects.filter(post__course=course)
+        .select_related("user")
+        .order_by("pk")
+        .iterator(chunk_size=chunk_size)
+    )
+    for like in likes:
+        yield {
+            "type": "like",
+            "id": like.pk,
+            "post_id": like.post_id,
+            "user": like.user.username,
+            "created_at": like.created_at.isoformat(),
+        }
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def iter_export_lines(rows, export_format: str):
+    if export_format == "jsonl":
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+    elif export_format == "csv":
+        writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDS, restval="")
+        yield writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
@@ -0,0 +1,47 @@
+# core/lazy.py
+
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for module ``name`` until one of its attributes is used.
+
+    The first attribute access imports the real module under a lock, so
+    threads racing on it all wait for a fully initialised module;
+    importlib's LazyLoader lets them see it half-executed.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self):
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                self._lazy_module = importlib.import_module(self.__name__)
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        # Only called for names not set on the stand-in itself
+        return getattr(self._lazy_module or self._load(), attr)
+
+
+def lazy_import(name: str):
+    """Return module ``name``, deferring its import to first attribute access.
+
+    For heavy dependencies (numpy, httpx, requests, ...) that only some
+    requests use: importing the module that needs them stays cheap, so
+    workers boot fast and only pay for what they run. Annotations must not
+    touch the module (``-> "np.ndarray"``), or the import happens right away.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return LazyModule(name)
@@ -0,0 +1,211 @@
+# core/likes.py
+
+import logging
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
+
+from .models import Like, Post
+from . import stats
+from .versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+# Redis hashes used by the write-behind mode:
+#   pending: "<post_id>:<user_id>" -> 1 (liked) / 0 (unliked), last event wins
+#   delta:   "<post_id>" -> net change not yet applied to Post.like_count
+PENDING_KEY = "likes:pending"
+DELTA_KEY = "likes:delta"
+FLUSHING_PENDING_KEY = "likes:flushing:pending"
+FLUSHING_DELTA_KEY = "likes:flushing:delta"
+
+
+def write_behind_enabled() -> bool:
+    return getattr(settings, "LIKES_WRITE_BEHIND", False)
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def _field(post_id, user_id) -> str:
+    return f"{post_id}:{user_id}"
+
+
+def user_likes_post(user, post) -> bool:
+    if write_behind_enabled():
+        field = _field(post.pk, user.pk)
+        pipe = _redis().pipeline()
+        pipe.hget(PENDING_KEY, field)
+        pipe.hget(FLUSHING_PENDING_KEY, field)
+        for state in pipe.execute():
+            if state is not None:
+                return state == b"1"
+    return Like.objects.filter(user=user, post=post).exists()
+
+
+def post_like_count(post) -> int:
+    count = post.like_count
+    if write_behind_enabled():
+        pipe = _redis().pipeline()
+        pipe.hget(DELTA_KEY, post.pk)
+        pipe.hget(FLUSHING_DELTA_KEY, post.pk)
+        count += sum(int(delta) for delta in pipe.execute() if delta)
+    return max(count, 0)
+
+
+def toggle_post_like(user, post) -> bool:
+    """Like or unlike ``post`` for ``user``. Returns True if the post is now liked."""
+    if write_behind_enabled():
+        liked = _buffer_toggle(user, post)
+    else:
+        liked = _toggle_now(user, post)
+    # Like rows are written with fast deletes and bulk inserts, which skip
+    # model signals, so cached fragments are invalidated here instead.
+    bump_version("likes", post.pk)
+    bump_version("course", post.course_id)
+    return liked
+
+
+def _toggle_now(user, post) -> bool:
+    # Try the delete first: if a row went away this was an unlike, otherwise
+    # insert and let the unique_together constraint settle concurrent clicks.
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            Post.objects.filter(pk=post.pk).update(
+                like_count=F("like_count") - 1, updated_at=Now()
+            )
+            post.like_count = max(post.like_count - 1, 0)
+            liked = False
+        else:
+            try:
+                with transaction.atomic():
+                    Like.objects.create(user=user, post=post)
+            except IntegrityError:
+                # A concurrent request inserted the same like and bumped the count
+                return True
+            Post.objects.filter(pk=post.pk).update(
+                like_count=F("like_count") + 1, updated_at=Now()
+            )
+            post.like_count += 1
+            liked = True
+
+        stats.post_like_changed(post)
+    return liked
+
+
+# Reads the user's buffered state and flips it in one step, so two quick
+# clicks can never both see "not liked" and count the like twice. The
+# database state (ARGV[3]) only decides when nothing is buffered.
+TOGGLE_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], ARGV[1])
+if not state then
+  state = redis.call('HGET', KEYS[2], ARGV[1])
+end
+if not state then
+  state = ARGV[3]
+end
+local liked = 1
+local delta = 1
+if state == '1' then
+  liked = 0
+  delta = -1
+end
+redis.call('HSET', KEYS[1], ARGV[1], liked)
+redis.call('HINCRBY', KEYS[3], ARGV[2], delta)
+return liked
+"""
+
+
+def _buffer_toggle(user, post) -> bool:
+    in_db = Like.objects.filter(user=user, post=post).exists()
+    liked = _redis().eval(
+        TOGGLE_SCRIPT,
+        3,
+        PENDING_KEY,
+        FLUSHING_PENDING_KEY,
+        DELTA_KEY,
+        _field(post.pk, user.pk),
+        post.pk,
+        int(in_db),
+    )
+    return bool(liked)
+
+
+def refresh_like_counts(post_ids=None, using: str = DEFAULT_DB_ALIAS) -> int:
+    """Recompute Post.like_count from the Like table.
+
+    Only posts whose count was wrong are written, so updated_at (and with it
+    the page validators) stays put for everything else.
+    """
+    likes = (
+        Like.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    posts = Post.objects.using(using)
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    count = Coalesce(Subquery(likes), 0)
+    return (
+        posts.alias(actual=count)
+        .exclude(like_count=F("actual"))
+        .update(like_count=count, updated_at=Now())
+    )
+
+
+def flush_like_buffer(batch_size: int = 1000) -> int:
+    """Apply buffered like/unlike events to the database.
+
+    The pending hashes are renamed before processing, so toggles arriving
+    during a flush go into a fresh buffer. A flush that crashed half-way
+    leaves its hashes behind and is simply retried on the next call.
+    Returns the number of events applied.
+    """
+    conn = _redis()
+    if not conn.exists(FLUSHING_PENDING_KEY):
+        if not conn.exists(PENDING_KEY):
+            return 0
+        pipe = conn.pipeline(transaction=True)
+        pipe.rename(PENDING_KEY, FLUSHING_PENDING_KEY)
+        pipe.rename(DELTA_KEY, FLUSHING_DELTA_KEY)
+        pipe.execute()
+
+    events = conn.hgetall(FLUSHING_PENDING_KEY)
+    post_ids = {int(field.split(b":")[0]) for field in events}
+    existing = set(Post.objects.filter(pk__in=post_ids).values_list("pk", flat=True))
+
+    likes, unlikes = [], {}
+    for field, state in events.items():
+        post_id, user_id = (int(part) for part in field.split(b":"))
+        if post_id not in existing:
+            continue
+        if state == b"1":
+            likes.append(Like(post_id=post_id, user_id=user_id))
+        else:
+            unlikes.setdefault(post_id, []).append(user_id)
+
+    with transaction.atomic():
+        Like.objects.bulk_create(likes, batch_size=batch_size, ignore_conflicts=True)
+        for post_id, user_ids in unlikes.items():
+            for i in range(0, len(user_ids), batch_size):
+                Like.objects.filter(
+                    post_id=post_id, user_id__in=user_ids[i : i + batch_size]
+                ).delete()
+        refresh_like_counts(existing)
+        owners = list(
+            Post.objects.filter(pk__in=existing).values_list("author_id", "course_id")
+        )
+        stats.refresh_top_posts({author_id for author_id, _ in owners})
+
+    conn.delete(FLUSHING_PENDING_KEY, FLUSHING_DELTA_KEY)
+    bump_version("likes", *existing)
+    bump_version("course", *{course_id for _, course_id in owners})
+    logger.info(f"Flushed {len(events)} buffered like events for {len(existing)} posts")
+    return len(events)
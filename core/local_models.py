@@ -0,0 +1,157 @@
+# core/local_models.py
+
+import glob
+import logging
+import os
+import threading
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# torch, transformers and safetensors take seconds to import; they are only
+# imported here, on first use (see STARTUP_LAZY_MODULES)
+_models = {}
+_models_lock = threading.Lock()
+
+
+def resolve_model_dir(name: str) -> str:
+    """A local directory as is, or a Hub id resolved to its cached snapshot."""
+    if os.path.isdir(name):
+        return name
+    from huggingface_hub import snapshot_download
+
+    # Only what loading needs; never the duplicate pytorch_model.bin weights
+    return snapshot_download(
+        name, allow_patterns=["*.json", "*.safetensors", "*.txt", "*.model"]
+    )
+
+
+def weight_files(model_dir: str) -> list[str]:
+    paths = sorted(glob.glob(os.path.join(model_dir, "*.safetensors")))
+    if not paths:
+        raise FileNotFoundError(f"No .safetensors weights in {model_dir}")
+    return paths
+
+
+def map_weights(paths) -> dict:
+    """Tensors of the safetensors files ``paths``, backed by the files themselves.
+
+    safe_open memory-maps each file, so the tensor data lives in the OS page
+    cache: every worker reading the same files shares one copy, and pages
+    inherited across fork stay shared because they are never written.
+    """
+    from safetensors import safe_open
+
+    tensors = {}
+    for path in paths:
+        with safe_open(path, framework="pt", device="cpu") as fh:
+            for key in fh.keys():
+                tensors[key] = fh.get_tensor(key)
+    return tensors
+
+
+def warm_page_cache(paths):
+    """Ask the kernel to read ``paths`` ahead, so first requests don't fault."""
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+
+def model_class(config):
+    """The transformers seq2seq class for ``config``; imports its code."""
+    from transformers.models.auto.modeling_auto import (
+        MODEL_FOR_SEQ_TO_SEQ_CAUSAL_LM_MAPPING,
+    )
+
+    return MODEL_FOR_SEQ_TO_SEQ_CAUSAL_LM_MAPPING[type(config)]
+
+
+class LocalSummarizer:
+    """A seq2seq summarization model (e.g. bart-large-cnn) run in-process.
+
+    Weights are used straight from the memory-mapped safetensors files:
+    the model is built on the "meta" device, which allocates nothing, and
+    the mapped tensors are assigned to it. ``from_pretrained`` would copy
+    them into private memory in every worker.
+    """
+
+    def __init__(self, model_dir: str):
+        import torch
+        import transformers
+
+        self.name = os.path.basename(os.path.normpath(model_dir))
+        self.paths = weight_files(model_dir)
+        config = transformers.AutoConfig.from_pretrained(model_dir)
+        # Resolved first: the class' module must not be imported on "meta"
+        cls = model_class(config)
+        with torch.device("meta"):
+            model = cls(config)
+        model.load_state_dict(map_weights(self.paths), strict=False, assign=True)
+        # Tied weights (lm_head, embed_tokens) are stored once; point them back
+        model.tie_weights()
+        missing = [
+            name
+            for name, tensor in [*model.named_parameters(), *model.named_buffers()]
+            if tensor.is_meta
+        ]
+        if missing:
+            raise ValueError(f"{model_dir} has no weights for {', '.join(missing)}")
+        self.model = model.eval().requires_grad_(False)
+        # The tokenizer's thread pool does not survive a fork; workers
+        # tokenize one short chunk at a time anyway
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_dir)
+        self.max_input_tokens = getattr(config, "max_position_embeddings", 1024)
+        # generate() can use a lot of memory; run one at a time per process
+        self.lock = threading.Lock()
+        self.threads_set = False
+
+    def summarize(self, text: str, max_length: int = 200, min_length: int = 50) -> str:
+        import torch
+
+        with self.lock:
+            if not self.threads_set:
+                # Set in the worker, not at preload, so forking stays safe
+                torch.set_num_threads(settings.LOCAL_MODEL_THREADS)
+                self.threads_set = True
+            inputs = self.tokenizer(
+                text,
+                truncation=True,
+                max_length=self.max_input_tokens,
+                return_token_type_ids=False,
+                return_tensors="pt",
+            )
+            with torch.inference_mode():
+                output = self.model.generate(
+                    **inputs, max_new_tokens=max_length, min_length=min_length
+                )
+        return self.tokenizer.decode(output[0], skip_special_tokens=True).strip()
+
+
+def get_summarizer(name: str = None) -> LocalSummarizer:
+    """The process-wide summarizer for ``name`` (LOCAL_SUMMARY_MODEL), loaded once."""
+    name = name or settings.LOCAL_SUMMARY_MODEL
+    summarizer = _models.get(name)
+    if summarizer is None:
+        with _models_lock:
+            summarizer = _models.get(name)
+            if summarizer is None:
+                summarizer = LocalSummarizer(resolve_model_dir(name))
+                _models[name] = summarizer
+                logger.info(f"Loaded local summarization model {name}")
+    return summarizer
+
+
+def preload():
+    """Load the local model before workers fork (gunicorn --preload).
+
+    Workers then inherit the mapped weights, page cache already warm, and
+    do not load anything themselves. Nothing runs the model here: torch's
+    thread pools must be started after the fork.
+    """
+    if settings.AI_SUMMARY_PROVIDER != "local":
+        return
+    warm_page_cache(get_summarizer().paths)
@@ -0,0 +1,238 @@
+import json
+import os
+import signal
+import tempfile
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.ai_jobs import summarize_text
+from core.models import Post
+from core.storage import upload_storage
+from core.utils import ai_result_ok, extract_text_from_pdf
+from core.versions import bump_version
+
+MISSING = Q(pdf_summary__isnull=True) | Q(pdf_summary="")
+
+
+def _ignore_sigint():
+    # Ctrl-C is handled by the parent, which flushes and checkpoints first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate pdf_summary for PDF posts that have none. Text is extracted "
+        "in a process pool and summarized with bounded API concurrency; "
+        "progress is checkpointed so an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes extracting PDF text.",
+        )
+        parser.add_argument(
+            "--api-concurrency",
+            type=int,
+            default=4,
+            help="Documents being summarized by the API at once.",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--checkpoint",
+            default=os.path.join(settings.BASE_DIR, ".pdf_summary_backfill.json"),
+            help="File recording progress between runs.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint, retrying posts that failed before.",
+        )
+
+    def handle(self, *args, **options):
+        self.checkpoint = options["checkpoint"]
+        self.batch_size = options["batch_size"]
+        state = {"last_pk": 0, "summarized": 0, "failed": []}
+        if not options["restart"] and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as fh:
+                state.update(json.load(fh))
+            self.stdout.write(f"Resuming after post {state['last_pk']}")
+        self.state = state
+
+        posts = Post.objects.filter(MISSING, file__iendswith=".pdf")
+        self.total = posts.filter(pk__gt=state["last_pk"]).count()
+        self.processed = 0
+        self.started = self.last_report = time.monotonic()
+        # Posts read but not yet written or failed; bounds the checkpoint
+        self.pending = set()
+        self.seen_pk = state["last_pk"]
+        self.batch = []
+        # Uploads are content-addressed, so posts sharing a file share a summary
+        self.summaries = {}
+
+        extractors = ProcessPoolExecutor(
+            max_workers=options["processes"], initializer=_ignore_sigint
+        )
+        summarizers = ThreadPoolExecutor(max_workers=options["api_concurrency"])
+        interrupted = False
+        try:
+            self.run(posts, extractors, summarizers, options["api_concurrency"])
+        except KeyboardInterrupt:
+            interrupted = True
+            self.stderr.write("Interrupted; saving progress.")
+        finally:
+            extractors.shutdown(wait=False, cancel_futures=True)
+            summarizers.shutdown(wait=False, cancel_futures=True)
+            self.flush()
+
+        failed = len(self.state["failed"])
+        message = (
+            f"{self.state['summarized']} posts summarized, {failed} failed "
+            f"in {format_duration(time.monotonic() - self.started)}."
+        )
+        if interrupted:
+            self.stdout.write(message + " Run again to resume.")
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+            if failed:
+                self.stdout.write("Run with --restart to retry the failed posts.")
+
+    def rows(self, posts):
+        """(pk, file name) of the posts to process, read in keyset pages."""
+        last_pk = self.state["last_pk"]
+        while True:
+            page = list(
+                posts.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "file")[: self.batch_size]
+            )
+            if not page:
+                return
+            yield from page
+            last_pk = page[-1][0]
+
+    def run(self, posts, extractors, summarizers, api_concurrency):
+        rows = self.rows(posts)
+        in_flight = {}  # future -> (stage, file name)
+        waiting = {}  # file name -> pks of the posts using it
+        # Keep enough text extracted ahead that the API slots never sit idle
+        window = api_concurrency * 2
+        exhausted = False
+
+        while True:
+            while not exhausted and len(in_flight) < window:
+                row = next(rows, None)
+                if row is None:
+                    exhausted = True
+                    break
+                pk, name = row
+                self.pending.add(pk)
+                self.seen_pk = pk
+                if name in waiting:
+                    waiting[name].append(pk)
+                    continue
+                summary = self.summaries.get(name) or self.shared_summary(name)
+                if summary:
+                    self.finish([pk], summary)
+                    continue
+                waiting[name] = [pk]
+                future = extractors.submit(
+                    extract_text_from_pdf, upload_storage.path(name)
+                )
+                in_flight[future] = ("extract", name)
+
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, name = in_flight.pop(future)
+                try:
+                    result = future.result()
+                    if stage == "extract" and not result.strip():
+                        raise ValueError("no extractable text")
+                    if stage == "summarize" and not ai_result_ok(result):
+                        raise ValueError(result)
+                except Exception as e:
+                    self.fail(waiting.pop(name), f"{name}: {e}")
+                    continue
+                if stage == "extract":
+                    in_flight[summarizers.submit(summarize_text, result)] = (
+                        "summarize",
+                        name,
+                    )
+                else:
+                    self.summaries[name] = result
+                    self.finish(waiting.pop(name), result)
+
+    def shared_summary(self, name):
+        return (
+            Post.objects.filter(file=name)
+            .exclude(MISSING)
+            .values_list("pdf_summary", flat=True)
+            .first()
+        )
+
+    def finish(self, pks, summary):
+        self.batch.extend(Post(pk=pk, pdf_summary=summary) for pk in pks)
+        self.progress(len(pks))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def fail(self, pks, reason):
+        self.stderr.write(f"Failed posts {pks}: {reason}")
+        self.state["failed"].extend(pks)
+        self.pending.difference_update(pks)
+        self.progress(len(pks))
+
+    def flush(self):
+        if self.batch:
+            # Posts that got a summary meanwhile (e.g. from the view) keep it
+            Post.objects.filter(MISSING).bulk_update(
+                self.batch, ["pdf_summary"], batch_size=self.batch_size
+            )
+            pks = [post.pk for post in self.batch]
+            bump_version("post", *pks)
+            self.pending.difference_update(pks)
+            self.state["summarized"] += len(pks)
+            self.batch = []
+        self.save_checkpoint()
+
+    def save_checkpoint(self):
+        # Every post up to last_pk has been written or recorded as failed
+        self.state["failed"] = sorted(set(self.state["failed"]))
+        self.state["last_pk"] = min(self.pending) - 1 if self.pending else self.seen_pk
+        directory = os.path.dirname(os.path.abspath(self.checkpoint))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(self.state, fh)
+        os.replace(tmp_path, self.checkpoint)
+
+    def progress(self, count):
+        self.processed += count
+        now = time.monotonic()
+        if now - self.last_report < 5 and self.processed < self.total:
+            return
+        self.last_report = now
+        rate = self.processed / max(now - self.started, 1e-6)
+        remaining = max(self.total - self.processed, 0)
+        eta = format_duration(remaining / rate) if rate else "?"
+        self.stdout.write(
+            f"{self.processed}/{self.total} posts, {rate:.2f} posts/s, ETA {eta}"
+        )
@@ -0,0 +1,160 @@
+import json
+import platform
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.middleware import QueryRecorder
+from core.models import Course, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main views through the test client against the current "
+        "database and write a JSON report (see seed_data for test data)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--username",
+            help="User to browse as (default: the user with the most posts).",
+        )
+        parser.add_argument(
+            "--query", default="notes", help="Search term to benchmark."
+        )
+        parser.add_argument("--output", default="benchmark_report.json")
+        parser.add_argument(
+            "--compare",
+            help="Earlier report to compare against; prints the median change per view.",
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["username"])
+        course = Course.objects.order_by("-post_count").first()
+        post = Post.objects.order_by("-like_count").first()
+        if course is None or post is None:
+            raise CommandError(
+                "No courses or posts found; run `manage.py seed_data` first."
+            )
+
+        host = next(
+            (h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost"
+        )
+        client = Client(HTTP_HOST=host)
+        client.force_login(user)
+
+        toggle_url = reverse("toggle_like", kwargs={"post_id": post.pk})
+        scenarios = [
+            ("course_list", "get", reverse("course_list"), {}),
+            (
+                "course_detail",
+                "get",
+                reverse("course_detail", kwargs={"slug": course.slug}),
+                {},
+            ),
+            (
+                "post_detail",
+                "get",
+                reverse("post_detail", kwargs={"slug": post.slug}),
+                {},
+            ),
+            ("search", "get", reverse("search"), {"data": {"q": options["query"]}}),
+            ("dashboard", "get", reverse("dashboard"), {}),
+            ("notifications", "get", reverse("notifications"), {}),
+            # Runs an even number of times, so buffered likes (LIKES_WRITE_BEHIND)
+            # end up where they started too
+            ("toggle_like", "post", toggle_url, {"HTTP_HX_REQUEST": "true"}),
+        ]
+
+        results = {}
+        for name, method, url, kwargs in scenarios:
+            # Views write (likes, notifications, read marks); none of it is kept
+            with transaction.atomic():
+                results[name] = self.run_scenario(client, method, url, kwargs, options)
+                transaction.set_rollback(True)
+            r = results[name]
+            self.stdout.write(
+                f"{name:<15} median {r['median_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+                f"queries {r['queries']}"
+            )
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "iterations": options["iterations"],
+            "dataset": {
+                "users": User.objects.count(),
+                "courses": Course.objects.count(),
+                "posts": Post.objects.count(),
+            },
+            "views": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username!r} does not exist.")
+        user = User.objects.annotate(n=Count("posts")).order_by("-n").first()
+        if user is None:
+            raise CommandError("No users found; run `manage.py seed_data` first.")
+        return user
+
+    def run_scenario(self, client, method, url, kwargs, options):
+        request = getattr(client, method)
+        iterations = options["iterations"] + options["iterations"] % 2
+        warmup = options["warmup"] + options["warmup"] % 2
+        for _ in range(warmup):
+            request(url, **kwargs)
+
+        timings, queries, status = [], [], None
+        for _ in range(iterations):
+            with QueryRecorder() as recorder:
+                start = time.perf_counter()
+                response = request(url, **kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(recorder.count)
+            status = response.status_code
+
+        timings.sort()
+        return {
+            "url": url,
+            "status": status,
+            "min_ms": round(timings[0], 3),
+            "median_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[int(0.95 * (len(timings) - 1))], 3),
+            "max_ms": round(timings[-1], 3),
+            "queries": max(queries),
+        }
+
+    def compare(self, path, results):
+        with open(path, encoding="utf-8") as fh:
+            baseline = json.load(fh)["views"]
+        self.stdout.write(f"\nCompared with {path}:")
+        for name, current in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            change = (
+                (current["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+            )
+            self.stdout.write(
+                f"{name:<15} {before['median_ms']:8.2f}ms -> {current['median_ms']:8.2f}ms "
+                f"({change:+.1f}%)  queries {before['queries']} -> {current['queries']}"
+            )
@@ -0,0 +1,113 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from core.models import Comment, Course, Like, Notification, Post, User
+from core.queries import with_comment_counts
+
+PLAN_PROBLEMS = {
+    "sqlite": [
+        (re.compile(r"\bSCAN (\w+)"), "full scan of {0}"),
+        (re.compile(r"USE TEMP B-TREE FOR (.+)"), "temporary sort for {0}"),
+    ],
+    "postgresql": [
+        (re.compile(r"Seq Scan on (\w+)"), "sequential scan of {0}"),
+        (re.compile(r"^\s*(?:->\s+)?(Sort)\s"), "explicit {0}"),
+    ],
+}
+
+
+def hot_querysets():
+    """The ORM queries behind the hot views, with a sample id for each filter."""
+    course_id = Course.objects.values_list("pk", flat=True).first() or 0
+    user_id = User.objects.values_list("pk", flat=True).first() or 0
+    post_id = Post.objects.values_list("pk", flat=True).first() or 0
+
+    return [
+        (
+            "course_detail posts",
+            with_comment_counts(
+                Post.objects.filter(course_id=course_id).select_related(
+                    "author__profile"
+                )
+            ).order_by("-created_at"),
+        ),
+        (
+            "profile posts",
+            with_comment_counts(
+                Post.objects.filter(author_id=user_id).select_related("course")
+            ).order_by("-created_at"),
+        ),
+        (
+            "dashboard top posts",
+            Post.objects.filter(author_id=user_id)
+            .order_by("-like_count", "-created_at")
+            .values("id", "title", "slug", "like_count")[:5],
+        ),
+        (
+            "post_detail comments",
+            Comment.objects.filter(post_id=post_id)
+            .select_related("user__profile")
+            .order_by("-created_at"),
+        ),
+        ("post likes", Like.objects.filter(post_id=post_id)),
+        (
+            "notifications",
+            Notification.objects.filter(user_id=user_id).select_related("post"),
+        ),
+        (
+            "recent notifications",
+            Notification.objects.filter(user_id=user_id).order_by("-created_at")[:5],
+        ),
+        (
+            "unread notifications",
+            Notification.objects.filter(user_id=user_id, is_read=False),
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the querysets behind the hot views and fail if any plan "
+        "needs a sequential scan or a temporary sort."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        patterns = PLAN_PROBLEMS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f"Plan checks are not supported on {connection.vendor}")
+
+        failures = []
+        with transaction.atomic(using=connection.alias):
+            if connection.vendor == "postgresql":
+                # Small tables are cheaper to scan; ask whether an index path exists
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for label, queryset in hot_querysets():
+                plan = queryset.using(connection.alias).explain()
+                problems = [
+                    message.format(*match.groups())
+                    for line in plan.splitlines()
+                    for pattern, message in patterns
+                    for match in [pattern.search(line)]
+                    if match
+                ]
+                if problems:
+                    failures.append(label)
+                    self.stdout.write(
+                        self.style.ERROR(f"FAIL {label}: {'; '.join(problems)}")
+                    )
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(f"ok   {label}")
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} hot queries are not covered by an index"
+            )
+        self.stdout.write(self.style.SUCCESS("All hot queries use indexes."))
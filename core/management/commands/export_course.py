@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import EXPORT_FORMATS, iter_course_rows, iter_export_lines
+from core.models import Course
+
+
+class Command(BaseCommand):
+    help = "Stream a course's posts, comments, likes and summaries as JSONL or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("slug", help="Course slug.")
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="jsonl")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout).")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(slug=options["slug"])
+        except Course.DoesNotExist:
+            raise CommandError(f"No course with slug {options['slug']!r}")
+
+        rows = iter_course_rows(course, chunk_size=options["chunk_size"])
+        lines = iter_export_lines(rows, options["format"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+                fh.writelines(lines)
+        else:
+            self.stdout.ending = ""
+            for line in lines:
+                self.stdout.write(line)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.likes import flush_like_buffer, refresh_like_counts, write_behind_enabled
+
+
+class Command(BaseCommand):
+    help = "Flush buffered like/unlike events from Redis into the Like table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recompute every post's like_count from the Like table afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        if write_behind_enabled():
+            flushed = flush_like_buffer(batch_size=options["batch_size"])
+            self.stdout.write(f"Flushed {flushed} like events.")
+        else:
+            self.stdout.write("LIKES_WRITE_BEHIND is off; nothing to flush.")
+
+        if options["recount"]:
+            updated = refresh_like_counts()
+            self.stdout.write(f"Corrected the like count of {updated} posts.")
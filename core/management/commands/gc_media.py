@@ -0,0 +1,147 @@
+import os
+import shutil
+import time
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+
+from core.thumbnails import VARIANT_SUFFIX
+
+
+def referenced_names(chunk_size: int = 5000) -> set[str]:
+    """Every file name stored in a FileField/ImageField, plus field defaults."""
+    names = set()
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if not isinstance(field, models.FileField):
+                continue
+            if isinstance(field.default, str):
+                names.add(field.default)
+            values = (
+                model._base_manager.exclude(**{field.attname: ""})
+                .exclude(**{f"{field.attname}__isnull": True})
+                .values_list(field.attname, flat=True)
+            )
+            names.update(values.iterator(chunk_size=chunk_size))
+    return names
+
+
+def walk(root: str):
+    """Yield (relative name, DirEntry) for every file below ``root``."""
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as entries:
+            for entry in entries:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel)
+                elif entry.is_file(follow_symlinks=False):
+                    yield rel, entry
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete (or quarantine) files under MEDIA_ROOT that no database row "
+        "references, including resized variants of such files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report what would go."
+        )
+        parser.add_argument(
+            "--quarantine",
+            metavar="DIR",
+            help="Move orphans into DIR (keeping their paths) instead of deleting.",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Skip files modified in the last N seconds (uploads in flight).",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        root = os.path.abspath(settings.MEDIA_ROOT)
+        if not os.path.isdir(root):
+            raise CommandError(f"MEDIA_ROOT {root} does not exist")
+        quarantine = options["quarantine"]
+        if quarantine:
+            quarantine = os.path.abspath(quarantine)
+            if quarantine == root or quarantine.startswith(root + os.sep):
+                raise CommandError(
+                    "The quarantine directory must be outside MEDIA_ROOT"
+                )
+
+        referenced = referenced_names()
+        # Resized copies live beside their original, named <stem>.<size>.<fmt>
+        referenced_stems = {os.path.splitext(name)[0] for name in referenced}
+        self.stdout.write(f"{len(referenced)} files are referenced.")
+
+        cutoff = time.time() - options["min_age"]
+        self.dry_run = options["dry_run"]
+        self.quarantine = quarantine
+        self.root = root
+        scanned = orphans = reclaimed = 0
+        batch = []
+        for name, entry in walk(root):
+            scanned += 1
+            if name in referenced or self.is_variant_of(name, referenced_stems):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            batch.append(name)
+            orphans += 1
+            reclaimed += stat.st_size
+            if len(batch) >= options["batch_size"]:
+                self.remove(batch)
+                batch = []
+        self.remove(batch)
+
+        verb = "Would reclaim" if self.dry_run else "Reclaimed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {scanned} files, {orphans} orphaned. "
+                f"{verb} {format_bytes(reclaimed)}."
+            )
+        )
+
+    @staticmethod
+    def is_variant_of(name, stems) -> bool:
+        head, dot, tail = name.rpartition(".")
+        # "<stem>.320w.webp": strip the two trailing parts and look up the stem
+        stem, _, size = head.rpartition(".")
+        return bool(dot and stem) and (
+            VARIANT_SUFFIX.match(f".{size}.{tail}") is not None and stem in stems
+        )
+
+    def remove(self, names):
+        for name in names:
+            if self.dry_run:
+                self.stdout.write(f"  would remove {name}")
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if self.quarantine:
+                    target = os.path.join(self.quarantine, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        if names and not self.dry_run:
+            action = "Quarantined" if self.quarantine else "Deleted"
+            self.stdout.write(f"  {action} {len(names)} files")
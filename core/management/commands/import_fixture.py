@@ -0,0 +1,241 @@
+import codecs
+import json
+import os
+import tempfile
+import time
+from django.apps import apps
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from core.likes import refresh_like_counts
+from core.models import Profile, User
+from core.stats import rebuild_all_user_stats, rebuild_course_post_counts
+from core.stored_files import rebuild_stored_files
+
+
+def detect_encoding(head: bytes) -> str:
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    # BOM-less UTF-16: every other byte of the ASCII "[" and whitespace is NUL
+    if len(head) >= 2 and head[0] != 0 and head[1] == 0:
+        return "utf-16-le"
+    if len(head) >= 2 and head[0] == 0 and head[1] != 0:
+        return "utf-16-be"
+    return "utf-8"
+
+
+def iter_fixture_objects(fh, chunk_size: int = 1 << 16):
+    """Yield the objects of a top-level JSON array without loading the file."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("fixture must be a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The element may continue past the end of the buffer
+                if eof:
+                    raise
+            else:
+                yield obj
+                continue
+        elif eof:
+            raise ValueError("unexpected end of fixture")
+
+        chunk = fh.read(chunk_size)
+        eof = not chunk
+        buf, pos = buf[pos:] + chunk, 0
+
+
+def dependency_order(models):
+    """Order models so every model comes after the models it references."""
+    remaining = set(models)
+    ordered = []
+    while remaining:
+        ready = [
+            model
+            for model in remaining
+            if not any(
+                field.related_model in remaining and field.related_model is not model
+                for field in model._meta.get_fields()
+                if (field.many_to_one or field.one_to_one or field.many_to_many)
+                and field.concrete
+            )
+        ]
+        if not ready:
+            # A cycle; the database's deferred constraint checks handle it
+            ready = sorted(remaining, key=lambda m: m._meta.label)[:1]
+        for model in sorted(ready, key=lambda m: m._meta.label):
+            ordered.append(model)
+            remaining.discard(model)
+    return ordered
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a dumpdata JSON fixture (UTF-8 or UTF-16) into the database "
+        "with bulk inserts. Signals are not sent; profiles and denormalized "
+        "counters are rebuilt afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixture", help="Path to the JSON fixture.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--exclude",
+            "-e",
+            action="append",
+            default=[],
+            help="App label or app_label.ModelName to skip (repeatable).",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        path = options["fixture"]
+        if not os.path.isfile(path):
+            raise CommandError(f"No such fixture: {path}")
+        self.batch_size = options["batch_size"]
+        self.using = options["database"]
+        excluded = {label.lower() for label in options["exclude"]}
+        started = time.monotonic()
+
+        with open(path, "rb") as raw:
+            encoding = detect_encoding(raw.read(4))
+        self.stdout.write(f"Reading {path} as {encoding}")
+
+        with tempfile.TemporaryDirectory() as spool_dir:
+            spools = self.spool_by_model(path, encoding, spool_dir, excluded)
+            connection = connections[self.using]
+            with transaction.atomic(using=self.using):
+                with connection.constraint_checks_disabled():
+                    counts = {}
+                    for model in dependency_order(spools):
+                        counts[model] = self.load_model(model, spools[model])
+                        self.stdout.write(f"  {model._meta.label}: {counts[model]}")
+                connection.check_constraints(
+                    table_names=[model._meta.db_table for model in counts]
+                )
+                self.reset_sequences(connection, list(counts))
+                self.rebuild_derived_data()
+
+        cache.clear()
+        total = sum(counts.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {total} objects in {time.monotonic() - started:.1f}s."
+            )
+        )
+
+    def spool_by_model(self, path, encoding, spool_dir, excluded):
+        """Split the fixture into one JSON-lines file per model, in one pass."""
+        files, spools = {}, {}
+        try:
+            with open(path, encoding=encoding) as fh:
+                for obj in iter_fixture_objects(fh):
+                    label = obj["model"].lower()
+                    if label in excluded or label.split(".")[0] in excluded:
+                        continue
+                    if label not in files:
+                        try:
+                            model = apps.get_model(label)
+                        except LookupError:
+                            self.stderr.write(f"Skipping unknown model {label}")
+                            excluded.add(label)
+                            continue
+                        spools[model] = os.path.join(spool_dir, f"{label}.jsonl")
+                        files[label] = open(spools[model], "w", encoding="utf-8")
+                    files[label].write(json.dumps(obj) + "\n")
+        except ValueError as e:
+            raise CommandError(f"Could not parse {path}: {e}")
+        finally:
+            for fh in files.values():
+                fh.close()
+        return spools
+
+    def load_model(self, model, spool_path):
+        loaded = 0
+        with open(spool_path, encoding="utf-8") as fh:
+            batch = []
+            for line in fh:
+                batch.append(json.loads(line))
+                if len(batch) >= self.batch_size:
+                    loaded += self.load_batch(model, batch)
+                    batch = []
+            if batch:
+                loaded += self.load_batch(model, batch)
+        return loaded
+
+    def load_batch(self, model, rows):
+        objects = list(
+            serializers.deserialize(
+                "python", rows, using=self.using, ignorenonexistent=True
+            )
+        )
+        meta = model._meta
+        update_fields = [
+            field.name
+            for field in meta.concrete_fields
+            if not field.primary_key and field.name in rows[0]["fields"]
+        ]
+        instances = [obj.object for obj in objects]
+        if update_fields:
+            # Re-importing the same dump updates rows instead of failing
+            model._base_manager.using(self.using).bulk_create(
+                instances,
+                update_conflicts=True,
+                unique_fields=[meta.pk.name],
+                update_fields=update_fields,
+            )
+        else:
+            model._base_manager.using(self.using).bulk_create(
+                instances, ignore_conflicts=True
+            )
+
+        for field in meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+            links = [
+                through(**{source: obj.object.pk, target: pk})
+                for obj in objects
+                for pk in obj.m2m_data.get(field.name, [])
+            ]
+            through._base_manager.using(self.using).bulk_create(
+                links, batch_size=self.batch_size, ignore_conflicts=True
+            )
+        return len(instances)
+
+    def reset_sequences(self, connection, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def rebuild_derived_data(self):
+        # The post_save signal that creates profiles never fired
+        missing = User.objects.using(self.using).filter(profile__isnull=True)
+        Profile.objects.using(self.using).bulk_create(
+            [Profile(user_id=pk) for pk in missing.values_list("pk", flat=True)],
+            batch_size=self.batch_size,
+        )
+        refresh_like_counts(using=self.using)
+        rebuild_course_post_counts(using=self.using)
+        rebuild_all_user_stats(batch_size=self.batch_size, using=self.using)
+        rebuild_stored_files(using=self.using)
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker imports before it can serve its first request
+BOOT = (
+    "import educloudx.asgi; "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+def measure_imports() -> dict:
+    """Boot the app in a fresh interpreter under ``-X importtime``.
+
+    Returns {module: (self_us, cumulative_us, depth)}, in import order.
+    """
+    env = dict(os.environ)
+    # Unset while settings are overridden (tests); the environment has it then
+    if settings.SETTINGS_MODULE:
+        env["DJANGO_SETTINGS_MODULE"] = settings.SETTINGS_MODULE
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise CommandError(f"Booting the app failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def total_ms(modules) -> float:
+    return sum(cum for _, cum, depth in modules.values() if depth == 0) / 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Report what booting the app imports and how long it takes "
+        "(python -X importtime), and flag heavy modules that should be lazy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=1,
+            help="Boot this many times and report the fastest, to smooth out noise.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail when a STARTUP_LAZY_MODULES module is imported at start-up "
+            "or, if set, the imports take over STARTUP_IMPORT_BUDGET_MS.",
+        )
+
+    def handle(self, *args, **options):
+        modules = min(
+            (measure_imports() for _ in range(max(options["runs"], 1))), key=total_ms
+        )
+        total = total_ms(modules)
+        budget = settings.STARTUP_IMPORT_BUDGET_MS
+        self.stdout.write(
+            f"Start-up imports: {total:.1f}ms for {len(modules)} modules"
+            + (f" (budget {budget:.0f}ms)" if budget else "")
+        )
+        # Self time summed per distribution shows who to blame
+        packages = Counter()
+        for name, (self_us, _, _) in modules.items():
+            packages[name.split(".")[0]] += self_us
+        for package, self_us in packages.most_common(options["top"]):
+            self.stdout.write(f"{self_us / 1000:>9.1f}ms  {package}")
+
+        eager = [name for name in settings.STARTUP_LAZY_MODULES if name in modules]
+        for name in eager:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{name} ({modules[name][1] / 1000:.1f}ms) is imported at "
+                    "start-up; import it on first use (core.lazy.lazy_import)."
+                )
+            )
+        if options["check"]:
+            if budget and total > budget:
+                raise CommandError(
+                    f"Start-up imports take {total:.1f}ms > {budget:.0f}ms."
+                )
+            if eager:
+                raise CommandError(f"Imported at start-up: {', '.join(eager)}.")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from core.duplicates import update_fingerprint
+from core.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute MinHash fingerprints for near-duplicate detection. New and "
+        "edited posts are fingerprinted on save; run this once for older posts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every post, not only those without a fingerprint.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only("pk", "content", "file").order_by("pk")
+        if not options["all"]:
+            posts = posts.filter(fingerprint__isnull=True)
+        indexed = skipped = 0
+        for post in posts.iterator(chunk_size=options["batch_size"]):
+            if update_fingerprint(post) is None:
+                skipped += 1
+            else:
+                indexed += 1
+        self.stdout.write(
+            f"Fingerprinted {indexed} posts; {skipped} were too short to compare."
+        )
@@ -0,0 +1,143 @@
+import json
+import os
+import traceback
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.local_models import (
+    LocalSummarizer,
+    model_class,
+    resolve_model_dir,
+    warm_page_cache,
+    weight_files,
+)
+
+SAMPLE = (
+    "Photosynthesis converts light energy into chemical energy. Plants use "
+    "chlorophyll to absorb light. The process releases oxygen as a by-product."
+)
+
+
+def memory_mb() -> dict:
+    """Rss, Pss and anonymous memory of this process, in MB.
+
+    Mapped weights are file-backed; weights copied into the process would
+    show up as anonymous memory.
+    """
+    fields = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if parts[0].endswith(":") and len(parts) > 1 and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"], "anon": fields["Anonymous"]}
+
+
+def run_worker(load, ready_fd, measure_fd, result_fd):
+    try:
+        before = memory_mb()
+        summarizer = load()
+        summarizer.summarize(SAMPLE, max_length=20, min_length=1)
+        os.write(ready_fd, b".")
+        # Measure once every worker has touched the weights, as under load
+        os.read(measure_fd, 1)
+        after = memory_mb()
+        result = dict(after, growth=after["anon"] - before["anon"])
+    except Exception:
+        os.write(ready_fd, b".")
+        result = {"error": traceback.format_exc()}
+    os.write(result_fd, json.dumps(result).encode())
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the memory of forked workers sharing the local summarization "
+        "model: forks workers like gunicorn that each run a summary, and "
+        "reports their RSS, PSS and anonymous memory growth."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model", help="Directory or Hub id (LOCAL_SUMMARY_MODEL)."
+        )
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument(
+            "--no-preload",
+            action="store_true",
+            help="Have each worker load the model itself, as without --preload.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail if a worker's anonymous memory grows by more than a "
+            "quarter of the model weights, i.e. the weights were copied.",
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(os, "fork") or not os.path.exists("/proc/self/smaps_rollup"):
+            raise CommandError("Needs fork() and /proc (Linux).")
+        model_dir = resolve_model_dir(options["model"] or settings.LOCAL_SUMMARY_MODEL)
+        paths = weight_files(model_dir)
+        weights_mb = sum(os.path.getsize(path) for path in paths) / 2**20
+        if options["no_preload"]:
+            import transformers
+
+            # Import the model code up front, so the workers' growth is the
+            # model alone
+            model_class(transformers.AutoConfig.from_pretrained(model_dir))
+
+            def load():
+                return LocalSummarizer(model_dir)
+
+        else:
+            # What core.local_models.preload() does in the gunicorn master
+            summarizer = LocalSummarizer(model_dir)
+            warm_page_cache(paths)
+
+            def load():
+                return summarizer
+
+        self.stdout.write(
+            f"{os.path.basename(os.path.normpath(model_dir))}: {weights_mb:.1f}MB "
+            f"of weights; master {memory_mb()['rss']:.1f}MB RSS"
+        )
+
+        ready_r, ready_w = os.pipe()
+        measure_r, measure_w = os.pipe()
+        workers = []
+        for _ in range(options["workers"]):
+            result_r, result_w = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    run_worker(load, ready_w, measure_r, result_w)
+                finally:
+                    os._exit(0)
+            os.close(result_w)
+            workers.append((pid, result_r))
+        for _ in workers:
+            os.read(ready_r, 1)
+        os.write(measure_w, b"." * len(workers))
+
+        results = []
+        for pid, result_r in workers:
+            with os.fdopen(result_r) as fh:
+                results.append(json.loads(fh.read() or '{"error": "no result"}'))
+            os.waitpid(pid, 0)
+        for fd in (ready_r, ready_w, measure_r, measure_w):
+            os.close(fd)
+
+        for i, result in enumerate(results):
+            if "error" in result:
+                raise CommandError(f"Worker {i} failed:\n{result['error']}")
+            self.stdout.write(
+                f"worker {i}: {result['rss']:.1f}MB RSS, {result['pss']:.1f}MB PSS, "
+                f"+{result['growth']:.1f}MB anonymous memory after a summary"
+            )
+        if options["check"]:
+            worst = max(result["growth"] for result in results)
+            if worst > weights_mb / 4:
+                raise CommandError(
+                    f"A worker's anonymous memory grew by {worst:.1f}MB; "
+                    "the model weights are not shared."
+                )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.stats import rebuild_all_user_stats, rebuild_course_post_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute Course.post_count and every user's dashboard statistics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            courses = rebuild_course_post_counts()
+            users = rebuild_all_user_stats(batch_size=options["batch_size"])
+        self.stdout.write(f"Rebuilt post counts for {courses} courses.")
+        self.stdout.write(f"Rebuilt dashboard statistics for {users} users.")
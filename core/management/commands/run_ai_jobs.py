@@ -0,0 +1,66 @@
+import time
+from django.core.management.base import BaseCommand
+
+from core.ai_jobs import queue_backfill, queue_stats, run_due_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run due AI precomputation jobs (summaries and explanations queued "
+        "when posts are created or edited, or by clicks over the rate limit)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Jobs per pass.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Jobs to run in parallel within a pass.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for due jobs instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between passes when idle (with --loop).",
+        )
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="First queue low-priority jobs for every post missing results.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print queue depth and wait times per class and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for name, row in queue_stats().items():
+                self.stdout.write(
+                    f"{name:<12} depth={row['depth']} pending={row['pending']} "
+                    f"running={row['running']} oldest_wait={row['oldest_wait']:.0f}s "
+                    f"mean_wait={row['mean_wait']:.1f}s claimed={row['claimed']}"
+                )
+            return
+        if options["backfill"]:
+            self.stdout.write(f"Queued {queue_backfill()} backfill jobs.")
+
+        while True:
+            done, attempted = run_due_jobs(
+                limit=options["limit"], workers=options["workers"]
+            )
+            if attempted:
+                self.stdout.write(f"Ran {attempted} jobs, {done} succeeded.")
+            if not options["loop"]:
+                if not attempted:
+                    self.stdout.write("No due jobs.")
+                return
+            if attempted < options["limit"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,231 @@
+import random
+from array import array
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.likes import refresh_like_counts
+from core.models import (
+    Comment,
+    Course,
+    Discipline,
+    Like,
+    Notification,
+    Post,
+    Profile,
+    User,
+)
+from core.stats import rebuild_all_user_stats, rebuild_course_post_counts
+
+WORDS = (
+    "algorithm data structure network kernel process thread memory cache "
+    "tensor gradient model query index schema django template socket packet "
+    "compiler parser lecture exam homework notes summary project lab review"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset for benchmarking: users, disciplines, "
+        "courses, posts, likes and comments, with a few viral posts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--disciplines", type=int, default=10)
+        parser.add_argument("--courses", type=int, default=2000)
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument("--likes", type=int, default=500000)
+        parser.add_argument("--comments", type=int, default=200000)
+        parser.add_argument("--courses-per-user", type=int, default=8)
+        parser.add_argument(
+            "--viral-fraction",
+            type=float,
+            default=0.001,
+            help="Share of posts that are viral.",
+        )
+        parser.add_argument(
+            "--viral-share",
+            type=float,
+            default=0.3,
+            help="Share of all likes and comments that go to viral posts.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--prefix", default="seed", help="Prefix for generated names."
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+
+        user_ids = self.create_users(prefix, options["users"])
+        course_ids = self.create_courses(
+            prefix, options["disciplines"], options["courses"]
+        )
+        self.create_memberships(user_ids, course_ids, options["courses_per_user"])
+        post_ids = self.create_posts(prefix, user_ids, course_ids, options["posts"])
+
+        viral = max(1, int(len(post_ids) * options["viral_fraction"]))
+        viral_ids = array(
+            "q", self.rng.sample(list(post_ids), min(viral, len(post_ids)))
+        )
+        picker = self.post_picker(post_ids, viral_ids, options["viral_share"])
+
+        self.create_likes(user_ids, picker, options["likes"])
+        self.create_comments(user_ids, picker, options["comments"])
+
+        self.stdout.write("Rebuilding counters...")
+        with transaction.atomic():
+            refresh_like_counts()
+            rebuild_course_post_counts()
+            rebuild_all_user_stats(batch_size=self.batch_size)
+        # Cached fragments and version counters describe the old data
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    # ---------- helpers ----------
+
+    def words(self, n):
+        return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def bulk(self, model, objs, **kwargs):
+        created = []
+        for i in range(0, len(objs), self.batch_size):
+            created += model.objects.bulk_create(
+                objs[i : i + self.batch_size], **kwargs
+            )
+        return created
+
+    def post_picker(self, post_ids, viral_ids, viral_share):
+        def pick():
+            if self.rng.random() < viral_share:
+                return self.rng.choice(viral_ids)
+            return self.rng.choice(post_ids)
+
+        return pick
+
+    # ---------- generators ----------
+
+    def create_users(self, prefix, count):
+        password = make_password("benchmark")
+        users = [
+            User(
+                username=f"{prefix}_user_{i}",
+                email=f"{prefix}_user_{i}@example.com",
+                password=password,
+            )
+            for i in range(count)
+        ]
+        users = self.bulk(User, users)
+        # bulk_create skips the post_save signal that normally creates profiles
+        self.bulk(Profile, [Profile(user=user) for user in users])
+        self.stdout.write(f"Created {len(users)} users.")
+        return array("q", (user.pk for user in users))
+
+    def create_courses(self, prefix, disciplines, count):
+        disciplines = self.bulk(
+            Discipline,
+            [
+                Discipline(
+                    name=f"{prefix} discipline {i}", slug=f"{prefix}-discipline-{i}"
+                )
+                for i in range(disciplines)
+            ],
+        )
+        courses = [
+            Course(
+                discipline=disciplines[i % len(disciplines)],
+                code=f"S{i:05d}",
+                title=self.words(3).title(),
+                description=self.words(20),
+                slug=f"{prefix}-course-{i}",
+            )
+            for i in range(count)
+        ]
+        courses = self.bulk(Course, courses)
+        self.stdout.write(
+            f"Created {len(disciplines)} disciplines and {len(courses)} courses."
+        )
+        return array("q", (course.pk for course in courses))
+
+    def create_memberships(self, user_ids, course_ids, per_user):
+        Membership = Profile.joined_courses.through
+        profile_ids = dict(
+            Profile.objects.filter(user_id__in=user_ids).values_list("user_id", "pk")
+        )
+        rows = []
+        for user_id in user_ids:
+            for course_id in self.rng.sample(
+                list(course_ids), min(per_user, len(course_ids))
+            ):
+                rows.append(
+                    Membership(profile_id=profile_ids[user_id], course_id=course_id)
+                )
+        self.bulk(Membership, rows, ignore_conflicts=True)
+        self.stdout.write(f"Created {len(rows)} course memberships.")
+
+    def create_posts(self, prefix, user_ids, course_ids, count):
+        post_ids = array("q")
+        for start in range(0, count, self.batch_size):
+            batch = [
+                Post(
+                    course_id=self.rng.choice(course_ids),
+                    author_id=self.rng.choice(user_ids),
+                    title=self.words(5).capitalize(),
+                    content=self.words(self.rng.randint(20, 400)),
+                    slug=f"{prefix}-post-{i}",
+                )
+                for i in range(start, min(start + self.batch_size, count))
+            ]
+            post_ids.extend(post.pk for post in Post.objects.bulk_create(batch))
+            self.stdout.write(f"Created {len(post_ids)}/{count} posts.", ending="\r")
+        self.stdout.write("")
+        return post_ids
+
+    def create_likes(self, user_ids, pick_post, count):
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            pairs = {(self.rng.choice(user_ids), pick_post()) for _ in range(size)}
+            Like.objects.bulk_create(
+                [Like(user_id=user_id, post_id=post_id) for user_id, post_id in pairs],
+                ignore_conflicts=True,
+            )
+            created += size
+            self.stdout.write(f"Created {created}/{count} likes.", ending="\r")
+        self.stdout.write("")
+
+    def create_comments(self, user_ids, pick_post, count):
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            picks = [(pick_post(), self.rng.choice(user_ids)) for _ in range(size)]
+            # Only this batch's authors, not every post's
+            authors = dict(
+                Post.objects.filter(pk__in={post_id for post_id, _ in picks})
+                .values_list("pk", "author_id")
+                .order_by()
+            )
+            comments, notes = [], []
+            for post_id, user_id in picks:
+                comments.append(
+                    Comment(post_id=post_id, user_id=user_id, content=self.words(12))
+                )
+                if authors[post_id] != user_id:
+                    notes.append(
+                        Notification(
+                            user_id=authors[post_id],
+                            from_user_id=user_id,
+                            post_id=post_id,
+                            message="Someone commented on your post",
+                        )
+                    )
+            Comment.objects.bulk_create(comments)
+            Notification.objects.bulk_create(notes)
+            created += size
+            self.stdout.write(f"Created {created}/{count} comments.", ending="\r")
+        self.stdout.write("")
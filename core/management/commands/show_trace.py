@@ -0,0 +1,63 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+
+from core.tracing import read_traces
+
+
+def root_of(spans):
+    return next((s for s in spans if s["parent_id"] is None), spans[-1])
+
+
+def describe(span) -> str:
+    attrs = " ".join(f"{k}={v}" for k, v in span["attrs"].items())
+    error = f"  ! {span['error']}" if "error" in span else ""
+    return f"{span['name']}  {span['duration_ms']:.1f}ms  {attrs}".rstrip() + error
+
+
+class Command(BaseCommand):
+    help = (
+        "Break a traced request or AI job down by stage. Without an id, list "
+        "the slowest traces in TRACING_FILE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("trace_id", nargs="?", help="Request id (X-Request-ID).")
+        parser.add_argument(
+            "--file", help="Trace file to read instead of TRACING_FILE."
+        )
+        parser.add_argument("--slowest", type=int, default=10)
+
+    def handle(self, *args, **options):
+        traces = read_traces(options["file"])
+        if not options["trace_id"]:
+            slowest = sorted(
+                traces.items(), key=lambda item: -root_of(item[1])["duration_ms"]
+            )
+            for trace_id, spans in slowest[: options["slowest"]]:
+                self.stdout.write(f"{trace_id}  {describe(root_of(spans))}")
+            return
+
+        spans = traces.get(options["trace_id"])
+        if not spans:
+            raise CommandError(f"No trace {options['trace_id']!r}.")
+        children = defaultdict(list)
+        for span in spans:
+            children[span["parent_id"]].append(span)
+
+        def show(span, depth):
+            self.stdout.write("  " * depth + describe(span))
+            for child in sorted(children[span["span_id"]], key=lambda s: s["start"]):
+                show(child, depth + 1)
+
+        root = root_of(spans)
+        show(root, 0)
+
+        # Where the time went, summed over repeated stages (e.g. every hf_call)
+        totals = defaultdict(float)
+        for span in spans:
+            if span is not root:
+                totals[span["name"]] += span["duration_ms"]
+        self.stdout.write("")
+        for name, ms in sorted(totals.items(), key=lambda item: -item[1]):
+            share = ms / root["duration_ms"] * 100 if root["duration_ms"] else 0
+            self.stdout.write(f"{name:<24}{ms:>10.1f}ms {share:>5.1f}%")
@@ -0,0 +1,110 @@
+# core/metrics.py
+
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (before start-up) every gunicorn worker
+# writes its samples to memory-mapped files in that directory and /metrics
+# adds them up; see the METRICS section in settings.
+
+REQUEST_LATENCY = Histogram(
+    "educloudx_request_duration_seconds",
+    "Time spent handling a request, by view.",
+    ["view", "method"],
+)
+RESPONSES = Counter(
+    "educloudx_responses_total",
+    "Responses sent, by view and status class.",
+    ["view", "status"],
+)
+DB_QUERIES = Histogram(
+    "educloudx_db_queries_per_request",
+    "SQL statements run per request, by view.",
+    ["view"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+CACHE_LOOKUPS = Counter(
+    "educloudx_cache_lookups_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ["cache", "result"],
+)
+HF_LATENCY = Histogram(
+    "educloudx_hf_request_duration_seconds",
+    "Latency of Hugging Face inference calls, including retries.",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120),
+)
+HF_ERRORS = Counter(
+    "educloudx_hf_errors_total", "Hugging Face calls that failed, by model.", ["model"]
+)
+HF_RETRIES = Counter(
+    "educloudx_hf_retries_total",
+    "Hugging Face calls that were retried, by model.",
+    ["model"],
+)
+LOCAL_INFERENCE_LATENCY = Histogram(
+    "educloudx_local_inference_duration_seconds",
+    "Latency of in-process model calls (AI_SUMMARY_PROVIDER=local), by model.",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120),
+)
+LOCAL_INFERENCE_ERRORS = Counter(
+    "educloudx_local_inference_errors_total",
+    "In-process model calls that failed, by model.",
+    ["model"],
+)
+SUMMARY_CHUNKS = Histogram(
+    "educloudx_summary_chunks",
+    "Chunks sent to the model per summary.",
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34),
+)
+PDF_EXTRACT_LATENCY = Histogram(
+    "educloudx_pdf_extract_duration_seconds",
+    "Time spent extracting text from a PDF.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+@contextmanager
+def _model_call(latency, errors, model: str):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors.labels(model).inc()
+        raise
+    finally:
+        latency.labels(model).observe(time.perf_counter() - started)
+
+
+def hf_call(model: str):
+    """Time one Hugging Face API call and count it as an error if it raises."""
+    return _model_call(HF_LATENCY, HF_ERRORS, model)
+
+
+def local_inference(model: str):
+    """Same as ``hf_call``, for a model run in this process."""
+    return _model_call(LOCAL_INFERENCE_LATENCY, LOCAL_INFERENCE_ERRORS, model)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,448 @@
+# core/middleware.py
+
+import logging
+import random
+import re
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from collections import Counter
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.urls import Resolver404, resolve
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import DB_QUERIES, REQUEST_LATENCY, RESPONSES
+from .profiling import make_profiler, save_profile
+from .routers import reset_replica, track_writes, use_replica
+from .tracing import new_trace_id, trace
+
+logger = logging.getLogger(__name__)
+
+# "IN (%s, %s, %s)" and "IN (%s)" are the same statement for N+1 purposes
+_PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+
+
+def query_signature(sql: str) -> str:
+    return _PLACEHOLDER_LIST.sub("%s, ...", sql)
+
+
+# Recorders active in the current context. Connections are per thread, and
+# under ASGI the ORM runs in sync_to_async threads, not the one that entered
+# the recorder; the context follows the request into those threads.
+_recorders = ContextVar("query_recorders", default=())
+
+
+def _record_queries(execute, sql, params, many, context):
+    recorders = _recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for recorder in recorders:
+            recorder.record(sql, elapsed)
+
+
+def install_query_recording(connection):
+    # First in the list: connection.execute_wrapper() pops from the end
+    if _record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_queries)
+
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    install_query_recording(connection)
+
+
+class QueryRecorder:
+    """Records count, time and signatures of every SQL statement on any alias.
+
+    Queries are recorded through an execute wrapper on every connection, in
+    whichever thread runs them, so this works with DEBUG off and under ASGI
+    and costs a counter increment per statement.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.signatures = Counter()
+
+    def record(self, sql, seconds):
+        self.time += seconds
+        self.count += 1
+        self.signatures[query_signature(sql)] += 1
+
+    def __enter__(self):
+        # Connections opened before this module was imported
+        for connection in connections.all():
+            install_query_recording(connection)
+        self._token = _recorders.set((*_recorders.get(), self))
+        return self
+
+    def __exit__(self, *exc_info):
+        _recorders.reset(self._token)
+
+    def duplicates(self, max_repeats: int) -> dict:
+        """Statements executed more than ``max_repeats`` times (likely N+1)."""
+        return {sql: n for sql, n in self.signatures.items() if n > max_repeats}
+
+
+class AsyncCapableMiddleware:
+    """Base for middleware that runs natively under both WSGI and ASGI.
+
+    A sync-only middleware makes Django run everything below it in a thread,
+    which defeats async views. Subclasses implement ``__call__`` for the sync
+    path and ``__acall__`` for the async one.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+def metrics_view_name(request) -> str:
+    match = request.resolver_match
+    # Never label by raw path: every 404 would become a new time series
+    return match.view_name if match else "<unresolved>"
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Records request latency and response status per view (core.metrics)."""
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started):
+        view = metrics_view_name(request)
+        REQUEST_LATENCY.labels(view, request.method).observe(
+            time.perf_counter() - started
+        )
+        RESPONSES.labels(view, f"{response.status_code // 100}xx").inc()
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, made async-capable (see AsyncCapableMiddleware)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+def query_budget_for(view_name: str) -> int:
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    return budgets.get(view_name, settings.QUERY_BUDGET_MAX_QUERIES)
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """Logs views that exceed their query count, SQL time or duplicate budget.
+
+    With DEBUG on, the numbers are also sent back as X-Query-* headers.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_BUDGET_ENABLED", True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self.report(request, response, recorder)
+
+    def report(self, request, response, recorder):
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        sql_ms = recorder.time * 1000
+        DB_QUERIES.labels(metrics_view_name(request)).observe(recorder.count)
+        duplicates = recorder.duplicates(settings.QUERY_BUDGET_MAX_DUPLICATES)
+
+        problems = []
+        if recorder.count > query_budget_for(view_name):
+            problems.append(f"{recorder.count} queries")
+        if sql_ms > settings.QUERY_BUDGET_MAX_SQL_MS:
+            problems.append(f"{sql_ms:.1f}ms of SQL")
+        if duplicates:
+            problems.append(f"{len(duplicates)} repeated statements")
+        if problems:
+            worst = sorted(duplicates.items(), key=lambda item: -item[1])[:3]
+            logger.warning(
+                f"Query budget exceeded by {view_name} ({request.method} {request.path}): "
+                + ", ".join(problems)
+                + "".join(f"\n  {n}x {sql[:200]}" for sql, n in worst)
+            )
+
+        if settings.DEBUG:
+            response["X-Query-Count"] = str(recorder.count)
+            response["X-Query-Time-Ms"] = f"{sql_ms:.1f}"
+            response["X-Query-Duplicates"] = str(len(duplicates))
+        return response
+
+
+STICKY_SESSION_KEY = "db_primary_until"
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """Serves GETs of the views in READ_REPLICA_VIEWS from the read replica.
+
+    A request that writes pins the user's session to the primary for
+    READ_REPLICA_STICKY_SECONDS, so they see their own writes even if the
+    replica is lagging behind.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "READ_REPLICA_ALIAS", None):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        writes = track_writes()
+        token = use_replica(
+            settings.READ_REPLICA_ALIAS if self.reads_from_replica(request) else None
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica(token)
+
+        if writes[0] and hasattr(request, "session"):
+            request.session[STICKY_SESSION_KEY] = (
+                time.time() + settings.READ_REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    async def __acall__(self, request):
+        writes = track_writes()
+        # Loading the session may hit the database
+        replica = await sync_to_async(self.reads_from_replica)(request)
+        token = use_replica(settings.READ_REPLICA_ALIAS if replica else None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replica(token)
+
+        if writes[0] and hasattr(request, "session"):
+            await request.session.aset(
+                STICKY_SESSION_KEY, time.time() + settings.READ_REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    def reads_from_replica(self, request) -> bool:
+        if request.method not in ("GET", "HEAD"):
+            return False
+        session = getattr(request, "session", None)
+        if session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time():
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in settings.READ_REPLICA_VIEWS
+
+
+PROFILE_HEADER = "X-Profile"
+# One profiled request at a time: concurrent profilers clobber each other
+_profiling = threading.Lock()
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """Profiles single requests on demand and stores the output (core.profiling).
+
+    A request is profiled when a staff user sends ``X-Profile: 1`` or when it
+    is picked by PROFILING_SAMPLE_RATE. With PROFILING_ENABLED off the
+    middleware removes itself at startup and costs nothing.
+    Only one request is profiled at a time; sampled requests that arrive
+    meanwhile are not profiled, requested ones wait their turn.
+    Under ASGI the request's sync_to_async thread, which runs sync views and
+    the ORM, is profiled along with the event loop; the loop part also
+    covers whatever else the loop ran meanwhile.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        requested = request.headers.get(PROFILE_HEADER) == "1"
+        if requested and not request.user.is_staff:
+            requested = False
+        if not (requested or self.sampled(request)):
+            return self.get_response(request)
+        if not _profiling.acquire(blocking=requested):
+            return self.get_response(request)
+
+        try:
+            profiler, started = make_profiler(), time.perf_counter()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+        finally:
+            _profiling.release()
+        return self.store(request, response, profiler, started, requested)
+
+    async def __acall__(self, request):
+        requested = request.headers.get(PROFILE_HEADER) == "1"
+        if requested and not (await request.auser()).is_staff:
+            requested = False
+        if not (requested or self.sampled(request)):
+            return await self.get_response(request)
+        if requested:
+            await sync_to_async(_profiling.acquire, thread_sensitive=False)()
+        elif not _profiling.acquire(blocking=False):
+            return await self.get_response(request)
+
+        try:
+            profiler, started = make_profiler(), time.perf_counter()
+            profiler.start()
+            # The same thread the request's sync views and queries run in
+            await sync_to_async(profiler.follow_thread)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(profiler.unfollow_thread)()
+                profiler.stop()
+        finally:
+            _profiling.release()
+        return await sync_to_async(self.store)(
+            request, response, profiler, started, requested
+        )
+
+    def sampled(self, request) -> bool:
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return False
+        if not settings.PROFILING_VIEWS:
+            return True
+        try:
+            return resolve(request.path_info).url_name in settings.PROFILING_VIEWS
+        except Resolver404:
+            return False
+
+    def store(self, request, response, profiler, started, requested):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        try:
+            name = save_profile(profiler, view_name, request.method, elapsed)
+        except OSError as e:
+            logger.warning(f"Could not save profile of {view_name}: {e}")
+            return response
+        if requested:
+            response["X-Profile-Id"] = name
+        return response
+
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID = re.compile(r"^[\w.-]{1,64}$")
+
+
+class TracingMiddleware(AsyncCapableMiddleware):
+    """Traces requests to TRACING_VIEWS stage by stage (core.tracing).
+
+    Every request gets a request id, taken from an incoming X-Request-ID
+    header (e.g. set by the load balancer) or generated, and echoed back.
+    It is the trace id, so a slow response can be looked up with
+    ``python manage.py show_trace <id>``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "TRACING_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_id = self.request_id(request)
+        if not self.traced(request):
+            response = self.get_response(request)
+        else:
+            with trace("request", request_id, **self.attrs(request)) as root:
+                response = self.get_response(request)
+                root.set(status=response.status_code)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id = self.request_id(request)
+        if not self.traced(request):
+            response = await self.get_response(request)
+        else:
+            # Exporting is one small file append, cheap enough for the loop
+            with trace("request", request_id, **self.attrs(request)) as root:
+                response = await self.get_response(request)
+                root.set(status=response.status_code)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def request_id(self, request) -> str:
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        request.request_id = (
+            incoming if _REQUEST_ID.match(incoming) else new_trace_id()
+        )
+        return request.request_id
+
+    def traced(self, request) -> bool:
+        if not settings.TRACING_VIEWS:
+            return True
+        try:
+            return resolve(request.path_info).url_name in settings.TRACING_VIEWS
+        except Resolver404:
+            return False
+
+    def attrs(self, request) -> dict:
+        return {"method": request.method, "path": request.path}
@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 05:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_counts(apps, schema_editor):
+    Post = apps.get_model("core", "Post")
+    Like = apps.get_model("core", "Like")
+
+    likes = (
+        Like.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    Post.objects.update(like_count=Coalesce(Subquery(likes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_update_course_names"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="like_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="pdf_summary",
+            field=models.TextField(
+                blank=True,
+                help_text="PDF/text summary generated by HuggingFace AI",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(backfill_like_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-19 06:18
+
+import core.storage
+import os
+from django.db import migrations, models
+
+
+def backfill_original_filenames(apps, schema_editor):
+    Post = apps.get_model("core", "Post")
+
+    batch = []
+    for post in (
+        Post.objects.exclude(file="").exclude(file=None).only("file").iterator()
+    ):
+        post.original_filename = os.path.basename(post.file.name)[:255]
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ["original_filename"])
+            batch = []
+    Post.objects.bulk_update(batch, ["original_filename"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("digest", models.CharField(db_index=True, max_length=64)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="original_filename",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                db_index=True,
+                null=True,
+                storage=core.storage.get_upload_storage,
+                upload_to="uploads/",
+            ),
+        ),
+        migrations.RunPython(backfill_original_filenames, migrations.RunPython.noop),
+    ]
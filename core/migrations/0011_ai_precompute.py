@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-19 06:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="content_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="explanation",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="text_summary",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="AIJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("pdf_summary", "PDF summary"),
+                            ("text_summary", "Text summary"),
+                            ("explanation", "Explanation"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("source_hash", models.CharField(max_length=255)),
+                ("run_after", models.DateTimeField()),
+                ("locked_until", models.DateTimeField(blank=True, null=True)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ai_jobs",
+                        to="core.post",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["run_after"], name="aijob_run_after_idx")
+                ],
+                "unique_together": {("post", "kind")},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_ai_precompute"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="aijob",
+            name="aijob_run_after_idx",
+        ),
+        migrations.AddField(
+            model_name="aijob",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "interactive"), (1, "eager"), (2, "backfill")], default=1
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="aijob",
+            index=models.Index(
+                fields=["priority", "run_after"], name="aijob_priority_run_after_idx"
+            ),
+        ),
+    ]
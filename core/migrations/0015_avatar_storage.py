@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 07:45
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_content_addressed_avatars"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="avatar",
+            field=models.ImageField(
+                default="avatars/default.png",
+                storage=core.storage.get_avatar_storage,
+                upload_to="avatars/",
+            ),
+        ),
+    ]
@@ -6,6 +6,9 @@ from django.utils.text import slugify
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
+import os
+
+from .storage import digest_from_name, get_avatar_storage, get_upload_storage
 
 
 class Discipline(models.Model):
@@ -27,6 +30,8 @@ class Course(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
     slug = models.SlugField(unique=True, editable=False)
+    # Denormalized number of posts, kept in sync by core.stats
+    post_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ("discipline", "code")
@@ -43,14 +48,16 @@ class Course(models.Model):
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
-    avatar = models.ImageField(upload_to="avatars/", default="avatars/default.png")
+    # Content-addressed like Post.file, so resized variants follow the content
+    avatar = models.ImageField(
+        upload_to="avatars/", default="avatars/default.png", storage=get_avatar_storage
+    )
     github_url = models.URLField(blank=True, null=True)
-    
+
     linkedin_url = models.URLField(blank=True, null=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     joined_courses = models.ManyToManyField(Course, blank=True, related_name="members")
 
-
     def __str__(self):
         return f"{self.user.username} Profile"
 
@@ -61,7 +68,15 @@ class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     title = models.CharField(max_length=150)
     content = models.TextField(blank=True)
-    file = models.FileField(upload_to="uploads/", blank=True, null=True)
+    file = models.FileField(
+        upload_to="uploads/",
+        storage=get_upload_storage,
+        blank=True,
+        null=True,
+        db_index=True,
+    )
+    # Uploads are stored under their content digest; keep the name for display
+    original_filename = models.CharField(max_length=255, blank=True, editable=False)
 
     # --- New field: Summary text to be generated by AI ---
     pdf_summary = models.TextField(
@@ -69,19 +84,64 @@ class Post(models.Model):
         null=True,
         help_text="PDF/text summary generated by HuggingFace AI",
     )
+    # Precomputed by core.ai_jobs for the content whose hash is content_hash
+    text_summary = models.TextField(blank=True, null=True)
+    explanation = models.TextField(blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also touched by comment and like writes; used as the page's Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
     slug = models.SlugField(unique=True, editable=False)
     likes = models.ManyToManyField(
         User, through="Like", related_name="liked_posts", blank=True
     )
+    # Denormalized number of likes, kept in sync by core.likes
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["course", "-created_at"], name="post_course_created_idx"
+            ),
+            models.Index(
+                fields=["author", "-created_at"], name="post_author_created_idx"
+            ),
+            models.Index(
+                fields=["author", "-like_count", "-created_at"],
+                name="post_author_likes_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets core.stored_files see whether the file changed without a query
+        if "file" in instance.__dict__:
+            instance._loaded_file = instance.__dict__["file"]
+        return instance
 
     def save(self, *args, **kwargs):
         if not self.slug:
             ts = int(self.created_at.timestamp()) if self.created_at else ""
             self.slug = slugify(f"{self.title}-{self.author.username}-{ts}")
+        if self.file and not self.file._committed:
+            self.original_filename = os.path.basename(self.file.name)[:255]
+            # The storage counts a reference of its own; see core.stored_files
+            self._file_uploaded = True
+            # The old summary described the old file
+            self.pdf_summary = None
         super().save(*args, **kwargs)
 
+    @property
+    def file_digest(self):
+        """SHA-256 of the attached file, or None for files stored before hashing."""
+        return digest_from_name(self.file.name) if self.file else None
+
+    @property
+    def display_filename(self):
+        return self.original_filename or os.path.basename(self.file.name or "")
+
     def __str__(self):
         return self.title
 
@@ -91,6 +151,14 @@ class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at"], name="comment_post_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.post.title}"
@@ -126,11 +194,124 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="notif_user_created_idx"),
+            models.Index(
+                fields=["user", "is_read", "-created_at"], name="notif_user_unread_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username} from {self.from_user.username}: {self.message}"
 
 
+class StoredFile(models.Model):
+    """A content-addressed upload and the number of posts pointing at it."""
+
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class AIJob(models.Model):
+    """Pending background AI work for a post, run by `manage.py run_ai_jobs`.
+
+    There is at most one job per post and kind; a newer edit pushes its
+    run_after back instead of queueing a second job (debouncing).
+    """
+
+    PDF_SUMMARY = "pdf_summary"
+    TEXT_SUMMARY = "text_summary"
+    EXPLANATION = "explanation"
+    KIND_CHOICES = [
+        (PDF_SUMMARY, "PDF summary"),
+        (TEXT_SUMMARY, "Text summary"),
+        (EXPLANATION, "Explanation"),
+    ]
+
+    # Scheduling classes, most urgent first (see core.ai_jobs.claim_due_jobs)
+    INTERACTIVE = 0
+    EAGER = 1
+    BACKFILL = 2
+    PRIORITY_CHOICES = [
+        (INTERACTIVE, "interactive"),
+        (EAGER, "eager"),
+        (BACKFILL, "backfill"),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="ai_jobs")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Content hash or file name the job was scheduled for
+    source_hash = models.CharField(max_length=255)
+    run_after = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    priority = models.PositiveSmallIntegerField(
+        choices=PRIORITY_CHOICES, default=EAGER
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("post", "kind")
+        indexes = [
+            models.Index(
+                fields=["priority", "run_after"], name="aijob_priority_run_after_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for post {self.post_id}"
+
+
+class PostFingerprint(models.Model):
+    """MinHash signature of a post's text and PDF text, kept by core.duplicates.
+
+    Stored apart from Post so ordinary post queries do not load it.
+    """
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="fingerprint"
+    )
+    # NUM_PERM little-endian uint32 values
+    signature = models.BinaryField()
+
+
+class MinHashBand(models.Model):
+    """LSH index row: one band of a post's MinHash signature, hashed.
+
+    Posts sharing any (band, bucket) pair are near-duplicate candidates.
+    """
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="minhash_bands"
+    )
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["band", "bucket"], name="minhashband_lookup_idx")
+        ]
+
+
+class UserStats(models.Model):
+    """Precomputed dashboard numbers for one user, maintained by core.stats."""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="stats")
+    total_posts = models.PositiveIntegerField(default=0)
+    # The user's most liked posts: [{"id", "title", "slug", "like_count"}, ...]
+    top_posts = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.user.username}"
+
+
 # Optional: If you want to add an event calendar in the future:
 # class Event(models.Model):
 #     title       = models.CharField(max_length=100)
@@ -0,0 +1,168 @@
+# core/profiling.py
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import thread as futures_thread
+from datetime import datetime
+from django.conf import settings
+
+# 20261019T101500123456_course_list_GET_153ms.collapsed
+PROFILE_NAME = re.compile(
+    r"^(?P<stamp>\d{8}T\d{12})_(?P<view>[\w.:-]+)_(?P<method>[A-Z]+)_(?P<ms>\d+)ms"
+    r"\.(?P<format>collapsed|prof)$"
+)
+
+
+# An executor thread waiting for work sits in this function
+_IDLE_WORKER = futures_thread._worker.__code__
+
+
+class StackSampler:
+    """Samples the Python stacks of the profiled threads on a timer, for flame graphs.
+
+    Writes Brendan Gregg's collapsed format ("outer;inner;leaf count" per
+    line), which flamegraph.pl and speedscope read directly.
+    """
+
+    extension = "collapsed"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.targets = set()
+
+    def start(self):
+        self.targets.add(threading.get_ident())
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def follow_thread(self):
+        """Sample the calling thread too, e.g. a sync_to_async worker."""
+        self.targets.add(threading.get_ident())
+
+    def unfollow_thread(self):
+        self.targets.discard(threading.get_ident())
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for target in list(self.targets):
+                frame = frames.get(target)
+                if frame is None or frame.f_code is _IDLE_WORKER:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                    )
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w") as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+class DeterministicProfiler:
+    """cProfile, saved as pstats (snakeviz, ``python -m pstats``, flameprof)."""
+
+    extension = "prof"
+
+    def __init__(self, interval: float = None):
+        self.profile = cProfile.Profile()
+        self.followed = {}
+
+    def start(self):
+        self.profile.enable()
+
+    def follow_thread(self):
+        """Profile the calling thread too; cProfile only sees the thread it runs in."""
+        profile = self.followed[threading.get_ident()] = cProfile.Profile()
+        profile.enable()
+
+    def unfollow_thread(self):
+        self.followed[threading.get_ident()].disable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        stats = pstats.Stats(self.profile)
+        for profile in self.followed.values():
+            if profile.getstats():
+                stats.add(profile)
+        stats.dump_stats(path)
+
+
+PROFILERS = {"collapsed": StackSampler, "pstats": DeterministicProfiler}
+
+
+def make_profiler():
+    return PROFILERS[settings.PROFILING_FORMAT](settings.PROFILING_INTERVAL)
+
+
+def save_profile(profiler, view_name: str, method: str, elapsed: float) -> str:
+    """Write ``profiler``'s output and prune old profiles; returns the file name."""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    view = re.sub(r"[^\w.:-]", "-", view_name)[:80] or "unknown"
+    name = f"{stamp}_{view}_{method}_{int(elapsed * 1000)}ms.{profiler.extension}"
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    profiler.dump(tmp_path)
+    os.replace(tmp_path, os.path.join(directory, name))
+    prune_profiles()
+    return name
+
+
+def list_profiles() -> list[dict]:
+    """Stored profiles, newest first."""
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        match = PROFILE_NAME.match(name)
+        if match:
+            profiles.append(
+                {
+                    "name": name,
+                    "view": match["view"],
+                    "method": match["method"],
+                    "ms": int(match["ms"]),
+                    "format": match["format"],
+                    "created": datetime.strptime(match["stamp"], "%Y%m%dT%H%M%S%f"),
+                }
+            )
+    # The timestamp prefix sorts chronologically
+    return sorted(profiles, key=lambda p: p["name"], reverse=True)
+
+
+def prune_profiles():
+    for profile in list_profiles()[settings.PROFILING_KEEP :]:
+        try:
+            os.remove(os.path.join(settings.PROFILING_DIR, profile["name"]))
+        except FileNotFoundError:
+            pass
+
+
+def profile_path(name: str):
+    """Path of a stored profile, or None for names that are not ours."""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, name)
+    return path if os.path.isfile(path) else None
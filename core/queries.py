@@ -0,0 +1,19 @@
+# core/queries.py
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment
+
+
+def with_comment_counts(posts):
+    # A correlated subquery instead of Count("comments"): no GROUP BY, so the
+    # (course|author, -created_at) indexes still provide the ordering.
+    counts = (
+        Comment.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return posts.annotate(comment_count=Coalesce(Subquery(counts), 0))
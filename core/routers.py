@@ -0,0 +1,52 @@
+# core/routers.py
+
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set per request by core.middleware.ReplicaRoutingMiddleware
+_read_alias = ContextVar("read_alias", default=None)
+_writes = ContextVar("writes", default=None)
+
+
+def use_replica(alias):
+    """Route reads in the current context to ``alias``; returns a reset token."""
+    return _read_alias.set(alias)
+
+
+def reset_replica(token):
+    _read_alias.reset(token)
+
+
+def track_writes():
+    """Start counting writes in the current context; returns the counter."""
+    counter = [0]
+    _writes.set(counter)
+    return counter
+
+
+class PrimaryReplicaRouter:
+    """Sends reads to the replica for whitelisted views, everything else to default.
+
+    Once a request has written, its remaining reads stay on the primary too,
+    so a view never reads around its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        counter = _writes.get()
+        if counter is not None and counter[0]:
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        counter = _writes.get()
+        if counter is not None:
+            counter[0] += 1
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        aliases = {DEFAULT_DB_ALIAS, settings.READ_REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
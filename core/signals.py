@@ -1,26 +1,13 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
+from django.db.models.functions import Now
 from django.contrib.auth.models import User
-from .models import Profile, Notification, Post, Comment, Like
-import os
+from .models import Profile, Notification, Post, Comment, Like, Course
+from . import duplicates, stats, stored_files
+from .versions import bump_version
 
-
-@receiver(pre_save, sender=Profile)
-def delete_old_avatar(sender, instance, **kwargs):
-    # if creating a new profile, do nothing
-    if not instance.pk:
-        return
-
-    try:
-        old_profile = Profile.objects.get(pk=instance.pk)
-        # if avatar is updated and the old one is not the default
-        if old_profile.avatar and old_profile.avatar.url != instance.avatar.url and 'default.png' not in old_profile.avatar.url:
-            if os.path.isfile(old_profile.avatar.path):
-                os.remove(old_profile.avatar.path)
-    except Profile.DoesNotExist:
-        # This can happen if the profile is being created, but the check for instance.pk should prevent it.
-        # It's good practice to have it anyway.
-        pass
+# Replaced avatars and files of deleted posts are cleaned up in batches by
+# `manage.py gc_media` instead of on every save.
 
 
 @receiver(post_save, sender=User)
@@ -29,4 +16,114 @@ def create_user_profile(sender, instance, created, **kwargs):
     if kwargs.get('raw', False):
         return
     if created:
-        Profile.objects.create(user=instance)
\ No newline at end of file
+        Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def update_stats_on_post_save(sender, instance, created, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    if created:
+        stats.post_created(instance)
+    else:
+        stats.post_changed(instance)
+
+
+@receiver(post_delete, sender=Post)
+def update_stats_on_post_delete(sender, instance, **kwargs):
+    stats.post_deleted(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_file_refs_on_post_save(sender, instance, created, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    stored_files.post_file_saved(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def update_file_refs_on_post_delete(sender, instance, **kwargs):
+    stored_files.post_file_deleted(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_fingerprint_on_post_save(sender, instance, update_fields=None, **kwargs):
+    if kwargs.get('raw', False):
+        return
+    if update_fields is not None and not {"content", "file"} & set(update_fields):
+        return
+    duplicates.update_fingerprint(instance)
+
+
+# ---------- fragment cache invalidation ----------
+
+
+@receiver(post_save, sender=Course)
+def bump_course_version(sender, instance, **kwargs):
+    bump_version("course", instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_versions(sender, instance, **kwargs):
+    bump_version("post", instance.pk)
+    bump_version("course", instance.course_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, **kwargs):
+    # Comments removed by a post's cascade are covered by the post's own bump
+    if isinstance(kwargs.get("origin"), Post):
+        return
+    Post.objects.filter(pk=instance.post_id).update(updated_at=Now())
+    bump_version("post", instance.post_id)
+    bump_version("course", instance.post.course_id)
+
+
+# Pages show authors' and commenters' names and avatars
+PROFILE_FIELDS = {User: {"username"}, Profile: {"avatar"}}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def bump_profile_versions(sender, instance, created, update_fields=None, **kwargs):
+    if created or kwargs.get('raw', False):
+        return
+    # e.g. the last_login update on every login
+    if update_fields is not None and not PROFILE_FIELDS[sender] & set(update_fields):
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    bump_version("profile", user_id)
+    post_ids = set(Post.objects.filter(author_id=user_id).values_list("pk", flat=True))
+    post_ids.update(
+        Comment.objects.filter(user_id=user_id).values_list("post_id", flat=True)
+    )
+    course_ids = set(
+        Post.objects.filter(pk__in=post_ids).values_list("course_id", flat=True)
+    )
+    bump_version("post", *post_ids)
+    bump_version("course", *course_ids)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def bump_notification_version(sender, instance, **kwargs):
+    bump_version("notifications", instance.user_id)
+
+
+@receiver(m2m_changed, sender=Profile.joined_courses.through)
+def bump_membership_versions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # pk_set is not provided for clears, so record what is about to go
+        if reverse:
+            instance._cleared_pks = {instance.pk}
+        else:
+            instance._cleared_pks = set(
+                instance.joined_courses.values_list("pk", flat=True)
+            )
+        return
+    if action == "post_clear":
+        bump_version("course", *getattr(instance, "_cleared_pks", ()))
+    elif action in ("post_add", "post_remove"):
+        bump_version("course", *([instance.pk] if reverse else pk_set))
@@ -0,0 +1,182 @@
+# core/stats.py
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Course, Post, Profile, User, UserStats
+
+TOP_POSTS = 5
+
+
+def _top_posts(author_id) -> list[dict]:
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .order_by("-like_count", "-created_at")
+        .values("id", "title", "slug", "like_count")[:TOP_POSTS]
+    )
+
+
+def rebuild_user_stats(user) -> UserStats:
+    stats, _ = UserStats.objects.update_or_create(
+        user=user,
+        defaults={
+            "total_posts": Post.objects.filter(author=user).count(),
+            "top_posts": _top_posts(user.pk),
+        },
+    )
+    return stats
+
+
+def get_user_stats(user) -> UserStats:
+    # Rows are built lazily, so the incremental updates below only ever
+    # touch existing rows and never need to create them.
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        return rebuild_user_stats(user)
+
+
+def refresh_top_posts(author_ids) -> None:
+    for author_id in author_ids:
+        UserStats.objects.filter(user_id=author_id).update(
+            top_posts=_top_posts(author_id)
+        )
+
+
+def _in_top_posts(post) -> bool:
+    stats = UserStats.objects.filter(user_id=post.author_id).only("top_posts").first()
+    return stats is not None and any(p["id"] == post.pk for p in stats.top_posts)
+
+
+# ---------- event hooks (signals and core.likes) ----------
+
+
+def post_created(post) -> None:
+    UserStats.objects.filter(user_id=post.author_id).update(
+        total_posts=F("total_posts") + 1
+    )
+    Course.objects.filter(pk=post.course_id).update(post_count=F("post_count") + 1)
+    # A brand new post only enters the top list once the list isn't full
+    stats = UserStats.objects.filter(user_id=post.author_id).only("top_posts").first()
+    if stats is not None and len(stats.top_posts) < TOP_POSTS:
+        refresh_top_posts([post.author_id])
+
+
+def post_changed(post) -> None:
+    if _in_top_posts(post):
+        refresh_top_posts([post.author_id])
+
+
+def post_deleted(post) -> None:
+    UserStats.objects.filter(user_id=post.author_id).update(
+        total_posts=Greatest(F("total_posts") - 1, 0)
+    )
+    Course.objects.filter(pk=post.course_id).update(
+        post_count=Greatest(F("post_count") - 1, 0)
+    )
+    if _in_top_posts(post):
+        refresh_top_posts([post.author_id])
+
+
+def post_like_changed(post) -> None:
+    stats = UserStats.objects.filter(user_id=post.author_id).only("top_posts").first()
+    if stats is None:
+        return
+    top = stats.top_posts
+    floor = min(p["like_count"] for p in top) if len(top) >= TOP_POSTS else -1
+    if post.like_count > floor or any(p["id"] == post.pk for p in top):
+        refresh_top_posts([post.author_id])
+
+
+def course_card_stats(course_ids) -> dict:
+    """Members, likes and comments per course, in three queries for any number of courses."""
+    members = dict(
+        Profile.joined_courses.through.objects.filter(course_id__in=course_ids)
+        .values("course_id")
+        .annotate(n=Count("pk"))
+        .values_list("course_id", "n")
+    )
+    likes = dict(
+        Post.objects.filter(course_id__in=course_ids)
+        .values("course_id")
+        .annotate(n=Sum("like_count"))
+        .values_list("course_id", "n")
+    )
+    comments = dict(
+        Comment.objects.filter(post__course_id__in=course_ids)
+        .values("post__course_id")
+        .annotate(n=Count("pk"))
+        .values_list("post__course_id", "n")
+    )
+    return {
+        pk: {
+            "members_count": members.get(pk, 0),
+            "total_likes": likes.get(pk) or 0,
+            "total_comments": comments.get(pk, 0),
+        }
+        for pk in course_ids
+    }
+
+
+# ---------- full rebuild (manage.py rebuild_user_stats) ----------
+
+
+def rebuild_course_post_counts(using: str = DEFAULT_DB_ALIAS) -> int:
+    posts = (
+        Post.objects.using(using)
+        .filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return Course.objects.using(using).update(post_count=Coalesce(Subquery(posts), 0))
+
+
+def rebuild_all_user_stats(
+    batch_size: int = 1000, using: str = DEFAULT_DB_ALIAS
+) -> int:
+    totals = dict(
+        Post.objects.using(using)
+        .order_by()
+        .values("author")
+        .annotate(n=Count("pk"))
+        .values_list("author", "n")
+    )
+
+    # One streaming pass over all posts, best first per author
+    top = {}
+    rows = (
+        Post.objects.using(using)
+        .order_by("author_id", "-like_count", "-created_at")
+        .values_list("author_id", "id", "title", "slug", "like_count")
+        .iterator(chunk_size=batch_size)
+    )
+    for author_id, post_id, title, slug, like_count in rows:
+        posts = top.setdefault(author_id, [])
+        if len(posts) < TOP_POSTS:
+            posts.append(
+                {"id": post_id, "title": title, "slug": slug, "like_count": like_count}
+            )
+
+    UserStats.objects.using(using).all().delete()
+    user_ids = User.objects.using(using).values_list("pk", flat=True)
+    stats = (
+        UserStats(
+            user_id=user_id,
+            total_posts=totals.get(user_id, 0),
+            top_posts=top.get(user_id, []),
+        )
+        for user_id in user_ids.iterator()
+    )
+    created = 0
+    batch = []
+    for row in stats:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            created += len(UserStats.objects.using(using).bulk_create(batch))
+            batch = []
+    if batch:
+        created += len(UserStats.objects.using(using).bulk_create(batch))
+    return created
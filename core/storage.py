@@ -0,0 +1,110 @@
+# core/storage.py
+
+import hashlib
+import os
+import re
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+DIGEST_NAME = re.compile(r"(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(?:\.[^/]*)?$")
+
+
+def digest_from_name(name) -> str | None:
+    """The SHA-256 digest a content-addressed file name was stored under."""
+    match = DIGEST_NAME.search(name or "")
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each upload once, under the SHA-256 of its content.
+
+    ``uploads/syllabus.pdf`` is saved as ``uploads/ab/cd/abcd….pdf``. The
+    digest is computed while the upload is streamed to a temporary file, and
+    an upload whose content is already on disk reuses the existing file.
+    With ``count_references``, each save counts a reference in
+    core.models.StoredFile (see core.stored_files).
+    """
+
+    def __init__(self, *args, count_references=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_references = count_references
+
+    def get_available_name(self, name, max_length=None):
+        # Names are chosen in _save; identical content is meant to collide
+        return name
+
+    def _save(self, name, content):
+        directory, basename = os.path.split(name)
+        ext = os.path.splitext(basename)[1].lower()
+
+        tmp_dir = self.path(directory)
+        os.makedirs(tmp_dir, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    sha.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            digest = sha.hexdigest()
+            final = os.path.join(directory, digest[:2], digest[2:4], digest + ext)
+            final_path = self.path(final)
+            if self.count_references:
+                from .stored_files import retain
+
+                # Before the existence check: the deletion of an unused file
+                # either sees this reference or is over, and the file is
+                # written again below
+                retain(final.replace("\\", "/"), size)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final.replace("\\", "/")
+
+    def save_derived(self, name, content):
+        """Save a file derived from a stored one (e.g. a thumbnail) under ``name``.
+
+        Derived files are deterministic, so a concurrent writer of the same
+        name is simply replaced.
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".derived-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in content.chunks():
+                    tmp.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+upload_storage = ContentAddressedStorage(count_references=True)
+avatar_storage = ContentAddressedStorage()
+
+
+def get_upload_storage():
+    # A callable keeps the storage out of migrations
+    return upload_storage
+
+
+def get_avatar_storage():
+    return avatar_storage
@@ -0,0 +1,115 @@
+# core/stored_files.py
+
+import logging
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F
+
+from .models import Post, StoredFile
+from .storage import digest_from_name
+from .thumbnails import delete_variants
+
+logger = logging.getLogger(__name__)
+
+_UNKNOWN = object()
+
+
+def _name(value) -> str:
+    return getattr(value, "name", value) or ""
+
+
+def retain(name: str, size: int = 0):
+    """Count one more post using the stored file ``name``."""
+    digest = digest_from_name(name)
+    if digest is None:
+        return
+    while True:
+        StoredFile.objects.get_or_create(
+            name=name, defaults={"digest": digest, "size": size}
+        )
+        if StoredFile.objects.filter(name=name).update(ref_count=F("ref_count") + 1):
+            return
+        # _delete_file removed the row (and the file) in between; start over
+
+
+def release(name: str):
+    """Count one post fewer; the file is deleted once nothing uses it."""
+    if digest_from_name(name) is None:
+        return
+    StoredFile.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1
+    )
+    if StoredFile.objects.filter(name=name, ref_count=0).exists():
+        storage = Post._meta.get_field("file").storage
+        # The release may still roll back; only touch the disk once it is final
+        transaction.on_commit(lambda: _delete_file(storage, name))
+
+
+def _delete_file(storage, name):
+    # The row is deleted first and stays locked until the file is gone, so a
+    # new upload of the same content (see ContentAddressedStorage._save)
+    # either keeps the file or waits in retain() and then writes it again
+    try:
+        with transaction.atomic():
+            deleted, _ = StoredFile.objects.filter(name=name, ref_count=0).delete()
+            if deleted:
+                storage.delete(name)
+                delete_variants(storage, name)
+    except OSError as e:
+        logger.warning(f"Could not delete unused upload {name}: {e}")
+
+
+def post_file_saved(post, created: bool):
+    # An upload was already counted by the storage while it was saved (see
+    # ContentAddressedStorage._save); that reference becomes the post's
+    uploaded = getattr(post, "_file_uploaded", False)
+    post._file_uploaded = False
+    old = None if created else getattr(post, "_loaded_file", _UNKNOWN)
+    if old is _UNKNOWN:
+        return
+    old, new = _name(old), _name(post.file)
+    post._loaded_file = new
+    if old == new:
+        if uploaded:
+            # The same content uploaded again was counted twice
+            release(new)
+        return
+    with transaction.atomic():
+        if new and not uploaded:
+            retain(new, post.file.size)
+        if old:
+            release(old)
+
+
+def post_file_deleted(post):
+    name = _name(getattr(post, "_loaded_file", post.file))
+    if name:
+        release(name)
+
+
+def rebuild_stored_files(using: str = DEFAULT_DB_ALIAS):
+    """Recount references from Post rows, e.g. after a bulk import."""
+    storage = Post._meta.get_field("file").storage
+    counts = dict(
+        Post.objects.using(using)
+        .exclude(file="")
+        .exclude(file=None)
+        .values_list("file")
+        .annotate(n=Count("pk"))
+        .order_by()
+    )
+    stored_files = StoredFile.objects.using(using)
+    with transaction.atomic(using=using):
+        stored_files.exclude(name__in=list(counts)).delete()
+        for name, n in counts.items():
+            digest = digest_from_name(name)
+            if digest is None:
+                continue
+            stored_files.update_or_create(
+                name=name,
+                defaults={"ref_count": n},
+                create_defaults={
+                    "digest": digest,
+                    "ref_count": n,
+                    "size": storage.size(name) if storage.exists(name) else 0,
+                },
+            )
@@ -0,0 +1,28 @@
+# core/templatetags/media_tags.py
+
+from django import template
+
+from core import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(fieldfile, width, fmt="webp", crop=False):
+    """URL of a ``width`` pixel wide copy of an uploaded image."""
+    return thumbnails.variant_url(fieldfile, int(width), fmt, crop)
+
+
+@register.simple_tag
+def srcset(fieldfile, width, fmt="webp", crop=False):
+    """1x/2x ``srcset`` for an image displayed ``width`` CSS pixels wide."""
+    width = int(width)
+    return ", ".join(
+        f"{thumbnails.variant_url(fieldfile, width * density, fmt, crop)} {density}x"
+        for density in (1, 2)
+    )
+
+
+@register.filter
+def is_image(fieldfile):
+    return bool(fieldfile) and thumbnails.is_image(fieldfile.name)
@@ -0,0 +1,34 @@
+# core/testing.py
+
+from django.conf import settings
+
+from .middleware import QueryRecorder
+
+
+class QueryBudgetMixin:
+    """TestCase mixin for asserting how many queries a URL is allowed to run."""
+
+    def assertQueryBudget(
+        self, url, max_queries, max_duplicates=None, method="get", **kwargs
+    ):
+        if max_duplicates is None:
+            max_duplicates = settings.QUERY_BUDGET_MAX_DUPLICATES
+
+        with QueryRecorder() as recorder:
+            response = getattr(self.client, method)(url, **kwargs)
+
+        self.assertLess(
+            response.status_code, 400, f"{url} returned {response.status_code}"
+        )
+        self.assertLessEqual(
+            recorder.count,
+            max_queries,
+            f"{url} ran {recorder.count} queries, budget is {max_queries}",
+        )
+        duplicates = recorder.duplicates(max_duplicates)
+        self.assertFalse(
+            duplicates,
+            f"{url} repeated statements (possible N+1):\n"
+            + "\n".join(f"{n}x {sql}" for sql, n in duplicates.items()),
+        )
+        return response
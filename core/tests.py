@@ -1,9 +1,60 @@
 # core/tests.py
 
-from django.test import TestCase, Client
+import hashlib
+import httpx
+import importlib.util
+import json
+import os
+import pstats
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from core.models import Discipline, Course
+from PIL import Image
+from PyPDF2 import PdfWriter
+from core.ai_jobs import (
+    FairShare,
+    _fair_share,
+    claim_due_jobs,
+    content_hash,
+    effective_class,
+    precomputed_result,
+    queue_backfill,
+    queue_stats,
+    run_due_jobs,
+    run_job,
+    schedule_precompute,
+)
+from core.models import AIJob, Discipline, Course, Post, Like, Comment, Notification, StoredFile
+from core import local_models
+from core.lazy import lazy_import
+from core.metrics import CACHE_LOOKUPS, render_metrics
+from core.likes import post_like_count, refresh_like_counts, toggle_post_like
+from core.middleware import ReplicaRoutingMiddleware
+from core.routers import PrimaryReplicaRouter
+from core.profiling import profile_path
+from core.stats import get_user_stats
+from core.duplicates import reuse_summaries, signature, similarity
+from core.textrank import compress, extractive_summary
+from core.throttle import get_limiter
+from core.tracing import read_traces, span, trace
+from core.testing import QueryBudgetMixin
+from core.thumbnails import get_variant
+from core.utils import chunk_text, extract_text_from_pdf, generate_summary
 
 User = get_user_model()
 
@@ -71,3 +122,1269 @@ class SmokeTests(TestCase):
         # 4) Correct redirection to the detail page
         detail_url = reverse("post_detail", kwargs={"slug": post.slug})
         self.assertRedirects(response_post, detail_url)
+
+
+class LikeToggleTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass12345")
+        self.user = User.objects.create_user(username="liker", password="pass12345")
+        discipline = Discipline.objects.create(name="Likes Discipline")
+        course = Course.objects.create(
+            code="LIK101", title="Likes", description="", discipline=discipline
+        )
+        self.post = Post.objects.create(
+            course=course, author=self.author, title="Likeable", content="x"
+        )
+        self.client.login(username="liker", password="pass12345")
+
+    def test_toggle_updates_like_count(self):
+        url = reverse("toggle_like", kwargs={"post_id": self.post.id})
+
+        self.client.post(url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+
+        self.client.post(url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertFalse(Like.objects.filter(user=self.user, post=self.post).exists())
+
+    def test_recount_only_touches_wrong_counts(self):
+        toggle_post_like(self.user, self.post)
+        stamped = Post.objects.get(pk=self.post.pk).updated_at
+        self.assertEqual(refresh_like_counts(), 0)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated_at, stamped)
+
+        Post.objects.filter(pk=self.post.pk).update(like_count=7)
+        self.assertEqual(refresh_like_counts(), 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).like_count, 1)
+
+    def test_htmx_toggle_renders_partial(self):
+        url = reverse("toggle_like", kwargs={"post_id": self.post.id})
+        response = self.client.post(url, HTTP_HX_REQUEST="true")
+        self.assertContains(response, "Unlike")
+        self.assertContains(response, "<strong>1</strong> like")
+
+    @skipUnless(importlib.util.find_spec("fakeredis"), "needs fakeredis[lua]")
+    @override_settings(LIKES_WRITE_BEHIND=True)
+    def test_buffered_toggles_count_each_click_once(self):
+        import fakeredis
+
+        conn = fakeredis.FakeRedis()
+        with patch("core.likes._redis", return_value=conn):
+            results = [toggle_post_like(self.user, self.post) for _ in range(3)]
+            self.assertEqual(results, [True, False, True])
+            self.assertEqual(post_like_count(self.post), 1)
+
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="stats", password="pass12345")
+        discipline = Discipline.objects.create(name="Stats Discipline")
+        self.course = Course.objects.create(
+            code="STA101", title="Stats", description="", discipline=discipline
+        )
+        self.user.profile.joined_courses.add(self.course)
+
+    def make_post(self, title):
+        return Post.objects.create(
+            course=self.course, author=self.user, title=title, content="x"
+        )
+
+    def test_stats_follow_post_and_like_events(self):
+        first = self.make_post("First")
+        self.assertEqual(get_user_stats(self.user).total_posts, 1)
+
+        second = self.make_post("Second")
+        toggle_post_like(self.user, second)
+
+        stats = get_user_stats(self.user)
+        self.assertEqual(stats.total_posts, 2)
+        self.assertEqual(stats.top_posts[0]["id"], second.id)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.post_count, 2)
+
+        second.delete()
+        stats = get_user_stats(self.user)
+        self.assertEqual(stats.total_posts, 1)
+        self.assertEqual([p["id"] for p in stats.top_posts], [first.id])
+
+    def test_rebuild_command_matches_incremental_stats(self):
+        self.make_post("One")
+        self.make_post("Two")
+        incremental = get_user_stats(self.user)
+
+        call_command("rebuild_user_stats", stdout=StringIO())
+
+        rebuilt = get_user_stats(self.user)
+        self.assertEqual(rebuilt.total_posts, incremental.total_posts)
+        self.assertEqual(rebuilt.top_posts, incremental.top_posts)
+
+    def test_dashboard_renders_from_stats(self):
+        self.make_post("Shown")
+        self.client.login(username="stats", password="pass12345")
+        get_user_stats(self.user)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Most Active: Stats")
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass12345")
+        discipline = Discipline.objects.create(name="Cache Discipline")
+        self.course = Course.objects.create(
+            code="CAC101", title="Caching", description="", discipline=discipline
+        )
+        self.post = Post.objects.create(
+            course=self.course, author=self.user, title="Cached", content="Body v1"
+        )
+        self.client.login(username="reader", password="pass12345")
+
+    def test_course_card_is_served_from_cache_until_bumped(self):
+        url = reverse("course_list")
+        self.assertContains(self.client.get(url), "1 Resources")
+
+        # Writes that bypass signals leave the cached card untouched...
+        Course.objects.filter(pk=self.course.pk).update(post_count=42)
+        self.assertContains(self.client.get(url), "1 Resources")
+
+        # ...while a real post write bumps the course version
+        Post.objects.create(course=self.course, author=self.user, title="Another")
+        self.assertContains(self.client.get(url), "43 Resources")
+
+    def test_post_body_and_like_form_are_invalidated_by_writes(self):
+        url = reverse("post_detail", kwargs={"slug": self.post.slug})
+        self.assertContains(self.client.get(url), "Body v1")
+
+        self.post.content = "Body v2"
+        self.post.save()
+        self.client.post(reverse("toggle_like", kwargs={"post_id": self.post.id}))
+
+        response = self.client.get(url)
+        self.assertContains(response, "Body v2")
+        self.assertContains(response, "<strong>1</strong> like")
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f"member{i}", password="pass12345")
+            for i in range(4)
+        ]
+        discipline = Discipline.objects.create(name="Budget Discipline")
+        cls.courses = []
+        for c in range(5):
+            course = Course.objects.create(
+                code=f"BUD{c}", title=f"Budget {c}", description="", discipline=discipline
+            )
+            cls.courses.append(course)
+            for user in cls.users:
+                user.profile.joined_courses.add(course)
+                post = Post.objects.create(
+                    course=course, author=user, title=f"Post {c} {user.username}"
+                )
+                for other in cls.users:
+                    toggle_post_like(other, post)
+                    Comment.objects.create(post=post, user=other, content="Nice")
+                    Notification.objects.create(
+                        user=user, from_user=other, post=post, message="hello"
+                    )
+        cls.post = post
+        get_user_stats(cls.users[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="member0", password="pass12345")
+
+    def test_catalogue_and_course_pages(self):
+        self.assertQueryBudget(reverse("course_list"), 12)
+        # Warm cache: the card statistics are not queried again
+        self.assertQueryBudget(reverse("course_list"), 8)
+        self.assertQueryBudget(
+            reverse("course_detail", kwargs={"slug": self.courses[0].slug}), 10
+        )
+
+    def test_post_pages(self):
+        self.assertQueryBudget(
+            reverse("post_detail", kwargs={"slug": self.post.slug}), 10
+        )
+        self.assertQueryBudget(reverse("search") + "?q=Post", 8)
+
+    def test_user_pages(self):
+        self.assertQueryBudget(reverse("dashboard"), 6)
+        self.assertQueryBudget(reverse("profile"), 10)
+        self.assertQueryBudget(reverse("notifications"), 10)
+
+    @override_settings(DEBUG=True)
+    async def test_counts_queries_of_async_views(self):
+        # Under ASGI the ORM runs in sync_to_async threads, not on the loop
+        await self.async_client.aforce_login(self.users[0])
+        response = await self.async_client.get(
+            reverse("post_explain", args=[self.post.slug])
+        )
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertGreater(float(response["X-Query-Time-Ms"]), 0)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seed_and_benchmark(self):
+        call_command(
+            "seed_data",
+            users=5,
+            disciplines=2,
+            courses=4,
+            posts=30,
+            likes=60,
+            comments=40,
+            courses_per_user=2,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 40)
+        post = Post.objects.order_by("-like_count").first()
+        self.assertEqual(post.like_count, post.likes.count())
+
+        likes, notifications = Like.objects.count(), Notification.objects.count()
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "report.json")
+            call_command("benchmark_views", iterations=3, warmup=1, output=output, stdout=StringIO())
+            with open(output) as fh:
+                report = json.load(fh)
+
+        self.assertEqual(report["dataset"]["posts"], 30)
+        for view in ("course_list", "post_detail", "dashboard", "toggle_like"):
+            self.assertLess(report["views"][view]["status"], 400)
+        self.assertEqual(post.likes.count(), Post.objects.get(pk=post.pk).like_count)
+        # The benchmark leaves nothing behind
+        self.assertEqual(Like.objects.count(), likes)
+        self.assertEqual(Notification.objects.count(), notifications)
+
+
+class ImportFixtureTests(TestCase):
+    def test_import_utf16_dump_streams_and_rebuilds_counters(self):
+        fixture = os.path.join(settings.BASE_DIR, "all_data.json")
+        excluded = ["sessions", "contenttypes", "auth.permission", "admin"]
+        for _ in range(2):  # importing twice updates instead of duplicating
+            call_command(
+                "import_fixture", fixture, exclude=excluded, batch_size=5, stdout=StringIO()
+            )
+
+        self.assertEqual(Post.objects.count(), 16)
+        self.assertEqual(Like.objects.count(), 27)
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+        for post in Post.objects.all():
+            self.assertEqual(post.like_count, post.likes.count())
+        for course in Course.objects.all():
+            self.assertEqual(course.post_count, course.posts.count())
+
+
+class CourseExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="analyst", password="pass12345", is_staff=True
+        )
+        discipline = Discipline.objects.create(name="Export Discipline")
+        self.course = Course.objects.create(
+            code="EXP101", title="Export", description="", discipline=discipline
+        )
+        post = Post.objects.create(
+            course=self.course, author=self.staff, title="Exported", content="Body"
+        )
+        Comment.objects.create(post=post, user=self.staff, content="First!")
+        toggle_post_like(self.staff, post)
+        self.url = reverse("export_course", kwargs={"slug": self.course.slug})
+
+    def test_export_requires_staff(self):
+        User.objects.create_user(username="student", password="pass12345")
+        self.client.login(username="student", password="pass12345")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_jsonl_and_csv_exports_stream_all_rows(self):
+        self.client.login(username="analyst", password="pass12345")
+
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["type"] for row in rows], ["post", "comment", "like"])
+
+        response = self.client.get(self.url, {"format": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith("type,id,post_id"))
+        self.assertEqual(len(lines), 4)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_are_index_backed(self):
+        call_command("check_query_plans", stdout=StringIO())
+
+
+@override_settings(READ_REPLICA_ALIAS="replica")
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.session = SessionStore()
+        self.router = PrimaryReplicaRouter()
+
+    def request(self, method, url, write=False):
+        aliases = []
+
+        def view(request):
+            aliases.append(self.router.db_for_read(Course))
+            if write:
+                self.router.db_for_write(Comment)
+            return HttpResponse()
+
+        request = getattr(self.factory, method)(url)
+        request.session = self.session
+        ReplicaRoutingMiddleware(view)(request)
+        return aliases[0]
+
+    def test_read_only_views_use_replica(self):
+        self.assertEqual(self.request("get", reverse("course_list")), "replica")
+        self.assertIsNone(self.request("get", reverse("dashboard")))
+        self.assertIsNone(self.request("post", reverse("course_list")))
+
+    def test_writes_pin_session_to_primary(self):
+        self.request("post", reverse("add_comment", args=[1]), write=True)
+        self.assertIsNone(self.request("get", reverse("course_list")))
+
+        self.session["db_primary_until"] = 0
+        self.assertEqual(self.request("get", reverse("course_list")), "replica")
+
+
+@override_settings(HF_API_TOKEN=None)
+class AsyncAIViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="pw")
+        discipline = Discipline.objects.create(name="AI", slug="ai")
+        course = Course.objects.create(
+            code="AI101", title="AI", slug="ai-101", discipline=discipline
+        )
+        cls.post = Post.objects.create(
+            course=course, author=cls.user, title="Notes", content="Some notes."
+        )
+
+    async def test_explain_runs_without_blocking(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("post_explain", args=[self.post.slug])
+        )
+        self.assertContains(response, "API not configured")
+
+    async def test_summary_reports_missing_configuration(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("post_summary", args=[self.post.slug]), {"type": "text"}
+        )
+        self.assertContains(response, "API Token missing")
+
+
+@override_settings(AI_RATE_BURST=4, AI_RATE_PER_MINUTE=1)
+class AIAdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="clicker", password="pw")
+        discipline = Discipline.objects.create(name="Limits", slug="limits")
+        course = Course.objects.create(
+            code="L101", title="Limits", slug="l-101", discipline=discipline
+        )
+        # Three 8000-character chunks, so three HF calls per summary
+        cls.post = Post.objects.create(
+            course=course, author=cls.user, title="Long", content="word " * 4800
+        )
+
+    def setUp(self):
+        get_limiter().reset()
+        self.addCleanup(get_limiter().reset)
+        self.client.force_login(self.user)
+        self.url = reverse("post_summary", args=[self.post.slug])
+
+    def test_summary_is_charged_per_chunk(self):
+        first = self.client.get(self.url, {"type": "text"})
+        self.assertNotContains(first, "queued")
+
+        second = self.client.get(self.url, {"type": "text"})
+        self.assertContains(second, "request limit")
+        self.assertEqual(second["Retry-After"], "120")
+        self.assertFalse(second.has_header("ETag"))
+        # The over-limit request was handed to the background worker
+        self.assertTrue(AIJob.objects.filter(post=self.post).exists())
+
+    @override_settings(AI_MAX_CONCURRENT=0)
+    def test_global_cap_turns_requests_away(self):
+        response = self.client.get(
+            reverse("post_explain", args=[self.post.slug])
+        )
+        self.assertContains(response, "busy")
+
+
+class ContentAddressedUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.user = User.objects.create_user(username="uploader", password="pw")
+        discipline = Discipline.objects.create(name="Files", slug="files")
+        self.course = Course.objects.create(
+            code="FS101", title="Files", slug="fs-101", discipline=discipline
+        )
+
+    def upload(self, title, data=b"%PDF-1.4 syllabus"):
+        return Post.objects.create(
+            course=self.course,
+            author=self.user,
+            title=title,
+            file=SimpleUploadedFile("syllabus.pdf", data),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = self.upload("One"), self.upload("Two")
+
+        digest = hashlib.sha256(b"%PDF-1.4 syllabus").hexdigest()
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.file_digest, digest)
+        self.assertEqual(second.display_filename, "syllabus.pdf")
+        self.assertEqual(StoredFile.objects.get(digest=digest).ref_count, 2)
+
+    def test_file_is_deleted_with_its_last_post(self):
+        first, second = self.upload("One"), self.upload("Two")
+        path = first.file.path
+
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_reused_file_survives_a_pending_delete(self):
+        post = self.upload("One")
+        path = post.file.path
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.delete()
+
+        # A new upload of the same content, saved before its post exists
+        storage = Post._meta.get_field("file").storage
+        name = storage.save(
+            "uploads/syllabus.pdf", SimpleUploadedFile("s.pdf", b"%PDF-1.4 syllabus")
+        )
+        for callback in callbacks:
+            callback()
+        self.assertEqual(name, post.file.name)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        cache.clear()
+        self.user = User.objects.create_user(username="painter", password="pw")
+        discipline = Discipline.objects.create(name="Art", slug="art")
+        self.course = Course.objects.create(
+            code="ART1", title="Art", slug="art-1", discipline=discipline
+        )
+
+    def image_upload(self, size=(1600, 1200)):
+        out = BytesIO()
+        Image.new("RGB", size, "teal").save(out, "PNG")
+        return SimpleUploadedFile("photo.png", out.getvalue())
+
+    def test_variants_are_generated_once_and_smaller(self):
+        post = Post.objects.create(
+            course=self.course, author=self.user, title="Pic", file=self.image_upload()
+        )
+        name = get_variant(post.file, 320, "webp")
+
+        self.assertTrue(name.endswith(".320w.webp"))
+        self.assertLess(post.file.storage.size(name), post.file.size)
+        self.assertEqual(get_variant(post.file, 320, "webp"), name)
+
+        # A variant deleted behind its back (gc_media) is made again
+        post.file.storage.delete(name)
+        self.assertEqual(get_variant(post.file, 320, "webp"), name)
+        self.assertTrue(post.file.storage.exists(name))
+
+    def test_avatar_variants_follow_its_content(self):
+        profile = self.user.profile
+        profile.avatar = self.image_upload(size=(300, 300))
+        profile.save()
+        first = get_variant(profile.avatar, 96, "jpeg", crop=True)
+
+        upload = BytesIO()
+        Image.new("RGB", (300, 300), "orange").save(upload, "PNG")
+        profile.avatar = SimpleUploadedFile("photo.png", upload.getvalue())
+        profile.save()
+        second = get_variant(profile.avatar, 96, "jpeg", crop=True)
+        self.assertNotEqual(first, second)
+        with profile.avatar.storage.open(second) as fh:
+            red, _, blue = Image.open(fh).getpixel((48, 48))
+        self.assertGreater(red, 200)
+        self.assertLess(blue, 50)
+
+    def test_feed_uses_thumbnails(self):
+        post = Post.objects.create(
+            course=self.course, author=self.user, title="Pic", file=self.image_upload()
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("course_detail", args=[self.course.slug]))
+        self.assertContains(response, ".320w.webp 1x")
+        self.assertContains(response, ".640w.jpeg 2x")
+
+        # Variants go away with the upload they were made from
+        variants = os.listdir(os.path.dirname(post.file.path))
+        self.assertGreater(len(variants), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(os.listdir(os.path.dirname(post.file.path)), [])
+
+
+class MediaGCTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.user = User.objects.create_user(username="gc", password="pw")
+
+    def touch(self, name, size=10):
+        path = os.path.join(self.media, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(b"x" * size)
+        return path
+
+    def test_only_unreferenced_files_are_removed(self):
+        profile = self.user.profile
+        profile.avatar = "avatars/current.png"
+        profile.save()
+        keep = [
+            self.touch("avatars/current.png"),
+            self.touch("avatars/current.40sq.webp"),
+            self.touch("avatars/default.png"),
+        ]
+        drop = [
+            self.touch("avatars/old.png", 100),
+            self.touch("avatars/old.40sq.webp", 20),
+            self.touch("uploads/deleted-post.pdf", 300),
+        ]
+
+        out = StringIO()
+        call_command("gc_media", "--min-age", "0", stdout=out)
+
+        self.assertTrue(all(os.path.exists(path) for path in keep))
+        self.assertFalse(any(os.path.exists(path) for path in drop))
+        self.assertIn("3 orphaned", out.getvalue())
+        self.assertIn("420.0 B", out.getvalue())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="revisit", password="pw")
+        discipline = Discipline.objects.create(name="Cache", slug="cache")
+        cls.course = Course.objects.create(
+            code="C304", title="Caching", slug="c-304", discipline=discipline
+        )
+        cls.post = Post.objects.create(
+            course=cls.course, author=cls.user, title="ETags", content="Body"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertRevalidates(self, url, change):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], etag)
+
+        change()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_post_detail(self):
+        url = reverse("post_detail", args=[self.post.slug])
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response)
+
+        self.assertRevalidates(
+            url,
+            lambda: Comment.objects.create(post=self.post, user=self.user, content="Hi"),
+        )
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.updated_at, self.post.created_at)
+
+    def test_course_detail(self):
+        self.assertRevalidates(
+            reverse("course_detail", args=[self.course.slug]),
+            lambda: toggle_post_like(self.user, self.post),
+        )
+
+    def test_new_avatar_changes_etag(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        commenter = User.objects.create_user(username="painter", password="pw")
+        Comment.objects.create(post=self.post, user=commenter, content="Nice")
+        url = reverse("post_detail", args=[self.post.slug])
+
+        def change_avatar():
+            upload = BytesIO()
+            Image.new("RGB", (64, 64), "teal").save(upload, "PNG")
+            commenter.profile.avatar = SimpleUploadedFile("me.png", upload.getvalue())
+            commenter.profile.save()
+
+        self.assertRevalidates(url, change_avatar)
+        avatar = os.path.splitext(commenter.profile.avatar.name)[0]
+        self.assertContains(self.client.get(url), avatar)
+
+    def test_renamed_author_changes_etag(self):
+        other = User.objects.create_user(username="visitor", password="pw")
+        self.client.force_login(other)
+
+        def rename():
+            self.user.username = "renamed"
+            self.user.save()
+
+        self.assertRevalidates(reverse("course_detail", args=[self.course.slug]), rename)
+
+    def test_new_notification_changes_etag(self):
+        other = User.objects.create_user(username="poker", password="pw")
+        self.assertRevalidates(
+            reverse("post_detail", args=[self.post.slug]),
+            lambda: Notification.objects.create(
+                user=self.user, from_user=other, message="Hello"
+            ),
+        )
+
+
+class AIPrecomputeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="eager", password="pw")
+        discipline = Discipline.objects.create(name="Jobs", slug="jobs")
+        cls.course = Course.objects.create(
+            code="J101", title="Queues", slug="j-101", discipline=discipline
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def create(self, content):
+        self.client.post(
+            reverse("create_post", args=[self.course.slug]),
+            {"title": "Eager", "content": content},
+        )
+        return Post.objects.get(title="Eager")
+
+    def edit(self, post, content):
+        self.client.post(
+            reverse("edit_post", args=[post.slug]),
+            {"title": post.title, "content": content},
+        )
+
+    def make_due(self):
+        AIJob.objects.update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_edits_are_debounced_into_one_job(self):
+        post = self.create("Short note")
+        job = AIJob.objects.get(post=post)
+        self.assertEqual(job.kind, AIJob.EXPLANATION)
+        self.assertGreater(job.run_after, timezone.now())
+
+        self.edit(post, "Short note, edited")
+        self.edit(post, "Short note, edited again")
+        self.assertEqual(AIJob.objects.filter(post=post).count(), 1)
+        rescheduled = AIJob.objects.get(post=post)
+        self.assertGreaterEqual(rescheduled.run_after, job.run_after)
+        self.assertEqual(rescheduled.source_hash, content_hash("Short note, edited again"))
+
+    @patch("core.ai_jobs.generate_explanation", return_value="It is a note.")
+    def test_worker_stores_result_and_view_serves_it(self, explain):
+        post = self.create("Short note")
+        self.make_due()
+        call_command("run_ai_jobs", stdout=StringIO())
+        self.assertFalse(AIJob.objects.exists())
+
+        post.refresh_from_db()
+        self.assertEqual(post.explanation, "It is a note.")
+        response = self.client.get(reverse("post_explain", args=[post.slug]))
+        self.assertContains(response, "It is a note.")
+        self.assertEqual(explain.call_count, 1)
+
+        # Saving unchanged content does not queue the work again
+        self.edit(post, "Short note")
+        self.assertFalse(AIJob.objects.exists())
+
+        self.edit(post, "A different note")
+        post.refresh_from_db()
+        self.assertIsNone(precomputed_result(post, AIJob.EXPLANATION))
+        self.assertTrue(AIJob.objects.filter(post=post).exists())
+
+    @override_settings(HF_API_TOKEN=None, AI_JOB_MAX_ATTEMPTS=2)
+    def test_failed_jobs_back_off_then_give_up(self):
+        post = self.create("Short note")
+        self.make_due()
+        run_due_jobs()
+        job = AIJob.objects.get(post=post)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+
+        self.make_due()
+        run_due_jobs()
+        self.assertFalse(AIJob.objects.exists())
+        post.refresh_from_db()
+        self.assertIsNone(post.explanation)
+
+
+class AIJobSchedulerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="backfiller", password="pw")
+        discipline = Discipline.objects.create(name="Sched", slug="sched")
+        course = Course.objects.create(
+            code="S101", title="Scheduling", slug="s-101", discipline=discipline
+        )
+        cls.posts = [
+            Post.objects.create(
+                course=course, author=user, title=f"Old {i}", content=f"Old note {i}"
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        # Start every test from a fresh scheduler clock
+        self.addCleanup(_fair_share.passes.clear)
+        _fair_share.passes.clear()
+
+    def test_interactive_job_skips_the_backfill_queue(self):
+        self.assertEqual(queue_backfill(), 5)
+        clicked = Post.objects.create(
+            course=self.posts[0].course,
+            author=self.posts[0].author,
+            title="Clicked",
+            content="Explain me",
+        )
+        schedule_precompute(clicked, priority=AIJob.INTERACTIVE)
+
+        jobs = claim_due_jobs(limit=10)
+        # Backfill is capped at one running job; the click goes first
+        self.assertEqual([job.post for job in jobs][0], clicked)
+        self.assertEqual(len(jobs), 2)
+
+        stats = queue_stats()
+        self.assertEqual(stats["backfill"]["depth"], 4)
+        self.assertEqual(stats["backfill"]["running"], 1)
+        self.assertEqual(stats["interactive"]["running"], 1)
+
+    def test_polling_leaves_a_running_job_alone(self):
+        post = self.posts[0]
+        schedule_precompute(post, priority=AIJob.EAGER)
+        AIJob.objects.update(run_after=timezone.now())
+        [job] = claim_due_jobs(limit=1)
+
+        # The page polls while the worker runs the job
+        for priority in (AIJob.BACKFILL, AIJob.INTERACTIVE, AIJob.INTERACTIVE):
+            schedule_precompute(post, priority=priority)
+        polled = AIJob.objects.get(pk=job.pk)
+        self.assertEqual(polled.priority, AIJob.INTERACTIVE)
+        self.assertEqual(polled.locked_until, job.locked_until)
+        self.assertEqual(polled.run_after, job.run_after)
+        self.assertEqual(polled.attempts, 1)
+        self.assertEqual(claim_due_jobs(limit=1), [])
+
+        # An edit queues the new version behind the running one
+        post.content = "Old note, edited"
+        schedule_precompute(post, priority=AIJob.INTERACTIVE)
+        self.assertEqual(claim_due_jobs(limit=1), [])
+        with patch("core.ai_jobs.generate_explanation", return_value="Old."):
+            run_job(job)
+        [rerun] = claim_due_jobs(limit=1)
+        self.assertEqual(rerun.source_hash, content_hash("Old note, edited"))
+
+    def test_fair_share_follows_weights(self):
+        share = FairShare()
+        picks = [share.pick([AIJob.EAGER, AIJob.BACKFILL]) for _ in range(8)]
+        self.assertEqual(picks.count(AIJob.EAGER), 6)
+        self.assertEqual(picks.count(AIJob.BACKFILL), 2)
+
+    @override_settings(AI_JOB_AGING_SECONDS=60)
+    def test_waiting_jobs_age_into_higher_classes(self):
+        now = timezone.now()
+        self.assertEqual(effective_class(AIJob.BACKFILL, now, now), AIJob.BACKFILL)
+        self.assertEqual(
+            effective_class(AIJob.BACKFILL, now - timedelta(seconds=61), now),
+            AIJob.EAGER,
+        )
+        self.assertEqual(
+            effective_class(AIJob.BACKFILL, now - timedelta(hours=1), now),
+            AIJob.INTERACTIVE,
+        )
+
+
+class PdfSummaryBackfillTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.checkpoint = os.path.join(media.name, "checkpoint.json")
+        user = User.objects.create_user(username="archivist", password="pw")
+        discipline = Discipline.objects.create(name="Archive", slug="archive")
+        course = Course.objects.create(
+            code="AR101", title="Archive", slug="ar-101", discipline=discipline
+        )
+        self.make = lambda title, data: Post.objects.create(
+            course=course,
+            author=user,
+            title=title,
+            file=SimpleUploadedFile(f"{title}.pdf", data),
+        )
+
+    def backfill(self, *args):
+        out = StringIO()
+        call_command(
+            "backfill_pdf_summaries",
+            "--processes=1",
+            "--api-concurrency=1",
+            f"--checkpoint={self.checkpoint}",
+            *args,
+            stdout=out,
+            stderr=StringIO(),
+        )
+        return out.getvalue()
+
+    def test_reuses_summaries_and_checkpoints_failures(self):
+        summarized = self.make("done", b"%PDF-1.4 shared")
+        Post.objects.filter(pk=summarized.pk).update(pdf_summary="Shared summary")
+        copy = self.make("copy", b"%PDF-1.4 shared")
+        blank = BytesIO()
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        writer.write(blank)
+        unreadable = self.make("blank", blank.getvalue())
+
+        self.assertIn("1 posts summarized, 1 failed", self.backfill())
+        copy.refresh_from_db()
+        self.assertEqual(copy.pdf_summary, "Shared summary")
+        with open(self.checkpoint) as fh:
+            state = json.load(fh)
+        self.assertEqual(state["failed"], [unreadable.pk])
+        self.assertEqual(state["last_pk"], unreadable.pk)
+
+        # A second run resumes after the checkpoint and has nothing to do
+        self.assertIn("Resuming after post", self.backfill())
+        self.assertIn("1 failed", self.backfill("--restart"))
+
+
+class TextRankTests(TestCase):
+    TEXT = (
+        "Photosynthesis converts light energy into chemical energy. "
+        "The cafeteria opens at noon. "
+        "Plants use light energy and water to make sugar in photosynthesis. "
+        "Chlorophyll absorbs the light energy used by photosynthesis. "
+        "My bike has a flat tyre."
+    )
+
+    def test_extractive_summary_keeps_central_sentences_in_order(self):
+        summary = extractive_summary(self.TEXT, max_sentences=2)
+        self.assertNotIn("cafeteria", summary)
+        self.assertNotIn("bike", summary)
+        self.assertLess(summary.index("Photosynthesis"), summary.index("Chlorophyll"))
+
+    def test_compress_bounds_length(self):
+        self.assertEqual(compress(self.TEXT, max_chars=10_000), self.TEXT)
+        self.assertLessEqual(len(compress(self.TEXT, max_chars=150)), 150)
+
+        # Large inputs are ranked by centroid instead of the sentence graph
+        long_text = " ".join(
+            f"Sentence {i} is about topic {i % 7} and energy." for i in range(2000)
+        )
+        shortened = compress(long_text, max_chars=2000)
+        self.assertLessEqual(len(shortened), 2000)
+        self.assertIn("energy", shortened)
+
+    @patch(
+        "core.views.agenerate_summary",
+        return_value="Summary unavailable. All models failed.",
+    )
+    def test_summary_view_falls_back_to_extractive(self, summarize):
+        user = User.objects.create_user(username="fallback", password="pw")
+        discipline = Discipline.objects.create(name="Bio", slug="bio")
+        course = Course.objects.create(
+            code="B101", title="Biology", slug="b-101", discipline=discipline
+        )
+        post = Post.objects.create(
+            course=course, author=user, title="Plants", content=self.TEXT * 3
+        )
+        self.client.force_login(user)
+        response = self.client.get(
+            reverse("post_summary", args=[post.slug]), {"type": "text"}
+        )
+        self.assertContains(response, "Quick Summary")
+        self.assertContains(response, "photosynthesis")
+        self.assertFalse(response.has_header("ETag"))
+
+
+class NearDuplicateTests(TestCase):
+    NOTES = " ".join(
+        f"Lecture point {i}: the derivative of x to the power {i} is {i} times x "
+        f"to the power {i - 1}."
+        for i in range(2, 30)
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reposter", password="pw")
+        discipline = Discipline.objects.create(name="Maths", slug="maths")
+        cls.course = Course.objects.create(
+            code="M101", title="Calculus", slug="m-101", discipline=discipline
+        )
+        cls.other_course = Course.objects.create(
+            code="M102", title="Calculus II", slug="m-102", discipline=discipline
+        )
+
+    def test_signatures_estimate_similarity(self):
+        edited = self.NOTES.replace("point 7", "item 7")
+        self.assertGreater(similarity(signature(self.NOTES), signature(edited)), 0.8)
+        unrelated = " ".join(f"Chapter {i} covers the French revolution." for i in range(40))
+        self.assertLess(similarity(signature(self.NOTES), signature(unrelated)), 0.2)
+        self.assertIsNone(signature("Thanks!"))
+
+    def test_repost_is_flagged_and_reuses_summary(self):
+        original = Post.objects.create(
+            course=self.course, author=self.user, title="Derivatives", content=self.NOTES
+        )
+        Post.objects.filter(pk=original.pk).update(
+            text_summary="Power rule.", content_hash=content_hash(self.NOTES)
+        )
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("create_post", args=[self.other_course.slug]),
+            {"title": "My notes", "content": self.NOTES + " Good luck!"},
+            follow=True,
+        )
+        self.assertContains(response, "looks like a repost")
+        self.assertContains(response, reverse("post_detail", args=[original.slug]))
+
+        repost = Post.objects.get(title="My notes")
+        self.assertEqual(precomputed_result(repost, AIJob.TEXT_SUMMARY), "Power rule.")
+        self.assertFalse(AIJob.objects.filter(post=repost).exists())
+
+    def test_pdf_summary_is_only_reused_for_the_same_file(self):
+        def upload(digest):
+            return f"uploads/{digest[:2]}/{digest[2:4]}/{digest}.pdf"
+
+        original, repost = [
+            Post.objects.create(
+                course=self.course, author=self.user, title=title, content=self.NOTES
+            )
+            for title in ("Slides", "My slides")
+        ]
+        Post.objects.filter(pk=original.pk).update(
+            file=upload("a" * 64), pdf_summary="About slides A."
+        )
+        Post.objects.filter(pk=repost.pk).update(file=upload("b" * 64))
+        original.refresh_from_db()
+        repost.refresh_from_db()
+        self.assertEqual(reuse_summaries(repost, original), [])
+
+        Post.objects.filter(pk=repost.pk).update(file=upload("a" * 64))
+        repost.refresh_from_db()
+        self.assertEqual(reuse_summaries(repost, original), ["pdf_summary"])
+        self.assertEqual(repost.pdf_summary, "About slides A.")
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(
+            override_settings(
+                PROFILING_ENABLED=True,
+                PROFILING_DIR=directory.name,
+                PROFILING_KEEP=2,
+                PROFILING_INTERVAL=0.001,
+            )
+        )
+        self.staff = User.objects.create_user(
+            username="profiler", password="pw", is_staff=True
+        )
+        self.student = User.objects.create_user(username="student", password="pw")
+
+    def test_staff_header_profiles_request(self):
+        self.client.force_login(self.staff)
+        for _ in range(3):
+            response = self.client.get(reverse("course_list"), HTTP_X_PROFILE="1")
+        name = response["X-Profile-Id"]
+        self.assertIn("_course_list_GET_", name)
+        self.assertTrue(name.endswith(".collapsed"))
+
+        listing = self.client.get(reverse("profile_list"))
+        # Only the newest PROFILING_KEEP profiles are kept
+        self.assertEqual(len(listing.context["profiles"]), 2)
+        self.assertEqual(listing.context["profiles"][0]["name"], name)
+        download = self.client.get(reverse("profile_download", args=[name]))
+        self.assertEqual(download.status_code, 200)
+
+    @override_settings(PROFILING_FORMAT="pstats")
+    def test_header_is_ignored_for_other_users(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("course_list"), HTTP_X_PROFILE="1")
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(self.client.get(reverse("profile_list")).status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("course_list"), HTTP_X_PROFILE="1")
+        self.assertTrue(response["X-Profile-Id"].endswith(".prof"))
+        response = self.client.get(reverse("course_list"), HTTP_X_PROFILE="0")
+        self.assertFalse(response.has_header("X-Profile-Id"))
+
+    @override_settings(PROFILING_FORMAT="pstats")
+    async def test_async_profile_includes_the_sync_thread(self):
+        # Under ASGI the sync view and its queries run in a sync_to_async thread
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(
+            reverse("course_list"), headers={"X-Profile": "1"}
+        )
+        stats = pstats.Stats(profile_path(response["X-Profile-Id"])).stats
+        functions = {name for _, _, name in stats}
+        self.assertIn("course_list", functions)
+        self.assertIn("execute_sql", functions)
+
+
+class MetricsTests(TestCase):
+    def test_metrics_endpoint_reports_requests(self):
+        self.client.get(reverse("course_list"))
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'educloudx_request_duration_seconds_count{method="GET",view="course_list"}',
+            body,
+        )
+        self.assertIn('educloudx_db_queries_per_request_count{view="course_list"}', body)
+
+    def test_course_cards_report_fragment_cache_lookups(self):
+        cache.clear()
+        discipline = Discipline.objects.create(name="Maths", slug="maths")
+        Course.objects.create(
+            code="MA1", title="Algebra", slug="ma-1", discipline=discipline
+        )
+        self.client.force_login(User.objects.create_user(username="m", password="pw"))
+
+        def lookups(result):
+            return CACHE_LOOKUPS.labels("fragment", result)._value.get()
+
+        misses, hits = lookups("miss"), lookups("hit")
+        self.client.get(reverse("course_list"))
+        self.client.get(reverse("course_list"))
+        self.assertEqual(lookups("miss") - misses, 1)
+        self.assertEqual(lookups("hit") - hits, 1)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+
+class FakeHFClient:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    async def post(self, url, **kwargs):
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(
+            status,
+            json=[{"summary_text": "A summary."}],
+            request=httpx.Request("POST", url),
+        )
+
+
+class TracingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "traces.jsonl")
+        self.enterContext(
+            override_settings(TRACING_ENABLED=True, TRACING_FILE=self.path)
+        )
+
+    def test_spans_nest_and_export_as_jsonl(self):
+        pdf = BytesIO()
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        writer.write(pdf)
+        pdf_path = os.path.join(os.path.dirname(self.path), "blank.pdf")
+        with open(pdf_path, "wb") as fh:
+            fh.write(pdf.getvalue())
+
+        with trace("job", "trace-1"):
+            with span("outer"):
+                extract_text_from_pdf(pdf_path)
+            chunk_text("One. Two. Three.")
+        with span("untraced"):
+            pass
+
+        spans = {s["name"]: s for s in read_traces(self.path)["trace-1"]}
+        self.assertEqual(
+            set(spans), {"job", "outer", "extract_text_from_pdf", "chunk_text"}
+        )
+        self.assertEqual(
+            spans["extract_text_from_pdf"]["parent_id"], spans["outer"]["span_id"]
+        )
+        self.assertEqual(spans["chunk_text"]["parent_id"], spans["job"]["span_id"])
+        self.assertEqual(spans["chunk_text"]["attrs"]["chunks"], 1)
+
+        out = StringIO()
+        call_command("show_trace", "trace-1", file=self.path, stdout=out)
+        self.assertIn("    extract_text_from_pdf", out.getvalue())
+
+    @override_settings(HF_API_TOKEN="token", TRACING_VIEWS=["post_summary"])
+    async def test_summary_request_is_traced_by_request_id(self):
+        user = await User.objects.acreate_user(username="tracer", password="pw")
+        discipline = await Discipline.objects.acreate(name="T", slug="t")
+        course = await Course.objects.acreate(
+            code="T1", title="T", slug="t-1", discipline=discipline
+        )
+        post = await Post.objects.acreate(
+            course=course, author=user, title="Long", content="Plants grow. " * 40
+        )
+        await self.async_client.aforce_login(user)
+        # One 503 forces a retry with backoff
+        with patch("core.utils._async_client", return_value=FakeHFClient([503])):
+            response = await self.async_client.get(
+                reverse("post_summary", args=[post.slug]),
+                {"type": "text"},
+                headers={"X-Request-ID": "req-42"},
+            )
+        self.assertContains(response, "A summary.")
+        self.assertEqual(response["X-Request-ID"], "req-42")
+
+        names = [s["name"] for s in read_traces(self.path)["req-42"]]
+        self.assertEqual(names.count("hf_attempt"), 2)
+        for stage in ("chunk_text", "summarize_block", "hf_call", "retry_backoff", "reduce"):
+            self.assertIn(stage, names)
+        self.assertEqual(names[-1], "request")
+
+
+class StartupImportTests(TestCase):
+    # About four times a typical boot, so that only a real regression (e.g. a
+    # heavy dependency imported eagerly) fails on a slow machine
+    @override_settings(STARTUP_IMPORT_BUDGET_MS=3000)
+    def test_boot_stays_within_import_budget(self):
+        out = StringIO()
+        # Also fails when a STARTUP_LAZY_MODULES module is imported eagerly
+        call_command("import_report", check=True, stdout=out)
+        self.assertIn("Start-up imports:", out.getvalue())
+
+    def test_lazy_import_is_safe_across_threads(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, "slow_module.py"), "w") as fh:
+            fh.write("import time\ntime.sleep(0.2)\nVALUE = 42\n")
+        self.enterContext(patch.object(sys, "path", [directory.name, *sys.path]))
+        self.addCleanup(sys.modules.pop, "slow_module", None)
+
+        module = lazy_import("slow_module")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            values = list(pool.map(lambda _: module.VALUE, range(8)))
+        self.assertEqual(values, [42] * 8)
+
+
+def save_tiny_bart(directory):
+    """A randomly initialised ~70MB BART with a word-level tokenizer."""
+    import transformers
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    words = ["<s>", "<pad>", "</s>", "<unk>"] + sorted(
+        set(re.findall(r"\w+", LocalModelMemoryTests.TEXT.lower()))
+    )
+    tokenizer = Tokenizer(
+        models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="<unk>")
+    )
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token="<s>",
+        pad_token="<pad>",
+        eos_token="</s>",
+        unk_token="<unk>",
+    ).save_pretrained(directory)
+    config = transformers.BartConfig(
+        vocab_size=len(words),
+        d_model=256,
+        encoder_layers=2,
+        decoder_layers=2,
+        encoder_attention_heads=4,
+        decoder_attention_heads=4,
+        encoder_ffn_dim=8192,
+        decoder_ffn_dim=8192,
+        max_position_embeddings=128,
+    )
+    transformers.BartForConditionalGeneration(config).save_pretrained(directory)
+
+
+@skipUnless(
+    importlib.util.find_spec("torch") and importlib.util.find_spec("transformers"),
+    "torch and transformers are needed for the local model",
+)
+@skipUnless(os.path.exists("/proc/self/smaps_rollup"), "needs Linux /proc")
+class LocalModelMemoryTests(TestCase):
+    TEXT = "Plants use chlorophyll to turn light into chemical energy and oxygen."
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        save_tiny_bart(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        # Drop the loaded model with its files; it holds ~70MB mapped
+        local_models._models.pop(cls.directory.name, None)
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def test_workers_share_mapped_weights(self):
+        out = StringIO()
+        # Each worker loads the model itself, the case --preload cannot hide;
+        # --check fails if a worker's anonymous memory grows by the weights
+        call_command(
+            "local_model_memory",
+            model=self.directory.name,
+            workers=2,
+            no_preload=True,
+            check=True,
+            stdout=out,
+        )
+        sys.stdout.write(out.getvalue())
+        self.assertIn("worker 1:", out.getvalue())
+
+    def test_local_provider_summarizes_in_process(self):
+        with override_settings(
+            AI_SUMMARY_PROVIDER="local", LOCAL_SUMMARY_MODEL=self.directory.name
+        ):
+            summary = generate_summary(self.TEXT, max_length=8, min_length=1)
+        self.assertIsInstance(summary, str)
+        # Timed as local inference, not as a Hugging Face API call
+        body = render_metrics()[0].decode()
+        label = f'{{model="{os.path.basename(self.directory.name)}"}}'
+        self.assertIn(f"educloudx_local_inference_duration_seconds_count{label}", body)
+        self.assertNotIn(f"educloudx_hf_request_duration_seconds_count{label}", body)
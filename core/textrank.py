@@ -0,0 +1,115 @@
+# core/textrank.py
+
+import re
+from django.conf import settings
+
+from .lazy import lazy_import
+from .tracing import span
+from .utils import split_sentences
+
+np = lazy_import("numpy")
+WORD = re.compile(r"\w{2,}")
+DAMPING = 0.85
+# Above this many sentences the n x n similarity matrix gets too big; rank by
+# closeness to the document's TF-IDF centroid instead (linear in the text)
+MAX_GRAPH_SENTENCES = 500
+
+
+def _tfidf(sentences):
+    """Sparse L2-normalised TF-IDF rows as (row, term, weight) arrays."""
+    tokens = [WORD.findall(sentence.lower()) for sentence in sentences]
+    vocab = {}
+    terms = np.fromiter(
+        (
+            vocab.setdefault(token, len(vocab))
+            for sentence in tokens
+            for token in sentence
+        ),
+        dtype=np.int64,
+    )
+    rows = np.repeat(np.arange(len(sentences)), [len(t) for t in tokens])
+    size = max(len(vocab), 1)
+
+    cells, counts = np.unique(rows * size + terms, return_counts=True)
+    rows, terms = np.divmod(cells, size)
+    df = np.bincount(terms, minlength=size)
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+    weights = counts * idf[terms]
+    norms = np.sqrt(np.bincount(rows, weights=weights**2, minlength=len(sentences)))
+    return rows, terms, weights / norms[rows], size
+
+
+def _pagerank(similarity, iterations=100, tolerance=1e-6):
+    n = len(similarity)
+    totals = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no words with any other link to every sentence equally
+    transition = np.divide(
+        similarity, totals, out=np.full_like(similarity, 1 / n), where=totals > 0
+    )
+    scores = np.full(n, 1 / n)
+    for _ in range(iterations):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def rank_sentences(sentences) -> "np.ndarray":
+    """Centrality score of each sentence (TextRank over TF-IDF cosine similarity)."""
+    n = len(sentences)
+    if n < 3:
+        return np.ones(n)
+    rows, terms, weights, size = _tfidf(sentences)
+    if n > MAX_GRAPH_SENTENCES:
+        centroid = np.bincount(terms, weights=weights, minlength=size)
+        return np.bincount(rows, weights=weights * centroid[terms], minlength=n)
+
+    vectors = np.zeros((n, size))
+    vectors[rows, terms] = weights
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+    return _pagerank(similarity)
+
+
+def _select(sentences, scores, max_sentences=None, max_chars=None):
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        if max_sentences is not None and len(chosen) >= max_sentences:
+            break
+        length = len(sentences[i]) + 1
+        if max_chars is not None and used + length > max_chars:
+            if chosen:
+                continue
+            # Never return nothing because the best sentence is too long
+            sentences[i] = sentences[i][: max_chars - 1]
+            length = max_chars
+        chosen.append(i)
+        used += length
+    # Back in document order
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def extractive_summary(text: str, max_sentences: int = 5) -> str:
+    """The most central sentences of ``text``; instant and needs no API."""
+    sentences = [s.strip() for s in split_sentences(text or "") if s.strip()]
+    if not sentences:
+        return ""
+    return _select(sentences, rank_sentences(sentences), max_sentences=max_sentences)
+
+
+def compress(text: str, max_chars: int = None) -> str:
+    """Shrink ``text`` to its most central sentences, at most ``max_chars`` long.
+
+    Used before abstractive summarization so a huge document costs a few
+    model calls instead of one per 8000-character chunk.
+    """
+    if max_chars is None:
+        max_chars = settings.AI_PRECOMPRESS_CHARS
+    if not max_chars or len(text) <= max_chars:
+        return text
+    with span("compress", chars=len(text)) as stage:
+        sentences = [s.strip() for s in split_sentences(text) if s.strip()]
+        result = _select(sentences, rank_sentences(sentences), max_chars=max_chars)
+        stage.set(sentences=len(sentences), kept_chars=len(result))
+        return result
@@ -0,0 +1,199 @@
+# core/throttle.py
+
+import math
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# Costs are measured in HF calls: one per 8000-character chunk (see chunk_text)
+CHUNK_CHARS = 8000
+# PDFs are charged before extraction; text is roughly a third of a PDF's bytes
+PDF_BYTES_PER_CHUNK = 3 * CHUNK_CHARS
+
+
+def _max_chunks():
+    # Longer texts are compressed first (core.textrank.compress)
+    limit = settings.AI_PRECOMPRESS_CHARS
+    return math.ceil(limit / CHUNK_CHARS) if limit else math.inf
+
+
+def text_cost(text: str) -> int:
+    return max(1, min(math.ceil(len(text) / CHUNK_CHARS), _max_chunks()))
+
+
+def pdf_cost(size: int) -> int:
+    return max(1, min(math.ceil(size / PDF_BYTES_PER_CHUNK), _max_chunks()))
+
+
+@dataclass
+class Admission:
+    admitted: bool
+    # Why the request was turned away: "rate" or "busy"
+    reason: str = ""
+    # Seconds until a retry could be admitted
+    retry_after: int = 0
+
+
+# ---------- in-process backend ----------
+
+
+class LocalLimiter:
+    """Token buckets and slot counters for a single process (dev and tests)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.slots = {}
+
+    def take(self, key, cost, capacity, rate):
+        now = time.monotonic()
+        with self.lock:
+            tokens, stamp = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            ok = tokens >= cost
+            if ok:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            return ok, tokens
+
+    def acquire(self, limits, lease, ttl):
+        with self.lock:
+            if any(len(self.slots.get(key, ())) >= limit for key, limit in limits):
+                return False
+            for key, _ in limits:
+                self.slots.setdefault(key, set()).add(lease)
+            return True
+
+    def release(self, keys, lease):
+        with self.lock:
+            for key in keys:
+                self.slots.get(key, set()).discard(lease)
+
+    def reset(self):
+        with self.lock:
+            self.buckets.clear()
+            self.slots.clear()
+
+
+# ---------- Redis backend ----------
+
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local ok = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  ok = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {ok, tostring(tokens)}
+"""
+
+# Slots are sorted-set members scored by lease expiry, so a worker that dies
+# mid-request frees its slots after AI_SLOT_TTL instead of leaking them.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local expires = tonumber(ARGV[2])
+local lease = ARGV[3]
+for i, key in ipairs(KEYS) do
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+  if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+    return 0
+  end
+end
+for i, key in ipairs(KEYS) do
+  redis.call('ZADD', key, expires, lease)
+  redis.call('EXPIREAT', key, math.ceil(expires))
+end
+return 1
+"""
+
+
+class RedisLimiter:
+    """The same operations, shared by every worker through Redis."""
+
+    def _conn(self):
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+
+    def take(self, key, cost, capacity, rate):
+        ok, tokens = self._conn().eval(
+            TAKE_SCRIPT, 1, key, capacity, rate, time.time(), cost
+        )
+        return bool(ok), float(tokens)
+
+    def acquire(self, limits, lease, ttl):
+        now = time.time()
+        keys = [key for key, _ in limits]
+        args = [now, now + ttl, lease] + [limit for _, limit in limits]
+        return bool(self._conn().eval(ACQUIRE_SCRIPT, len(keys), *keys, *args))
+
+    def release(self, keys, lease):
+        pipe = self._conn().pipeline()
+        for key in keys:
+            pipe.zrem(key, lease)
+        pipe.execute()
+
+
+_local = LocalLimiter()
+
+
+def get_limiter():
+    # Same switch as the cache: without Redis every process limits on its own
+    return RedisLimiter() if settings.REDIS_URL else _local
+
+
+# ---------- admission ----------
+
+
+def _admit(user_id, cost, lease) -> Admission:
+    limiter = get_limiter()
+    slots = [
+        ("ai:slots:global", settings.AI_MAX_CONCURRENT),
+        (f"ai:slots:user:{user_id}", settings.AI_MAX_CONCURRENT_PER_USER),
+    ]
+    # Slots first: they are free to give back if the bucket says no
+    if not limiter.acquire(slots, lease, settings.AI_SLOT_TTL):
+        return Admission(False, "busy", retry_after=5)
+
+    capacity = settings.AI_RATE_BURST
+    rate = settings.AI_RATE_PER_MINUTE / 60
+    # A request bigger than the whole bucket is charged a full bucket
+    cost = min(cost, capacity)
+    ok, tokens = limiter.take(f"ai:bucket:{user_id}", cost, capacity, rate)
+    if not ok:
+        limiter.release([key for key, _ in slots], lease)
+        return Admission(False, "rate", retry_after=math.ceil((cost - tokens) / rate))
+    return Admission(True)
+
+
+def _release(user_id, lease):
+    get_limiter().release(["ai:slots:global", f"ai:slots:user:{user_id}"], lease)
+
+
+@asynccontextmanager
+async def ai_admission(user, cost: int):
+    """Admit ``user`` to run an AI request costing ``cost`` chunks.
+
+    Yields an Admission; work should only start when ``admitted`` is true.
+    The concurrency slots are held until the block exits.
+    """
+    lease = uuid.uuid4().hex
+    admission = await sync_to_async(_admit)(user.pk, cost, lease)
+    try:
+        yield admission
+    finally:
+        if admission.admitted:
+            await sync_to_async(_release)(user.pk, lease)
@@ -0,0 +1,142 @@
+# core/thumbnails.py
+
+import io
+import logging
+import os
+import re
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+from .metrics import cache_lookup
+from .storage import digest_from_name
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+# Originals that could not be resized are not retried for this long
+FAILED_TIMEOUT = 60 * 60
+
+
+def is_image(name: str) -> bool:
+    return os.path.splitext(name or "")[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_name(name: str, width: int, fmt: str, crop: bool = False) -> str:
+    """``avatars/me.png`` -> ``avatars/me.96w.webp`` (``.96sq.webp`` when cropped).
+
+    Uploads are stored under their content digest (core.storage), so a
+    variant's name identifies the content it was made from.
+    """
+    stem = os.path.splitext(name)[0]
+    return f"{stem}.{width}{'sq' if crop else 'w'}.{fmt}"
+
+
+def render_variant(source, width: int, fmt: str, crop: bool = False) -> bytes:
+    # Pillow is only needed the first time a variant is made
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as img:
+        # Let the JPEG decoder downscale while decoding instead of afterwards
+        img.draft("RGB", (width * 2, width * 2))
+        img = ImageOps.exif_transpose(img)
+        if crop:
+            img = ImageOps.fit(img, (width, width), Image.LANCZOS)
+        else:
+            img.thumbnail((width, width * 4), Image.LANCZOS)
+
+        if img.mode in ("P", "LA", "PA"):
+            img = img.convert("RGBA")
+        if fmt == "jpeg" and img.mode == "RGBA":
+            # JPEG has no alpha channel; flatten onto white instead of black
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+
+        options = {"quality": settings.THUMBNAIL_QUALITY}
+        if fmt == "jpeg":
+            options.update(optimize=True, progressive=True)
+        else:
+            options.update(method=4)
+        out = io.BytesIO()
+        img.save(out, FORMATS[fmt], **options)
+        return out.getvalue()
+
+
+def get_variant(fieldfile, width: int, fmt: str = "webp", crop: bool = False) -> str:
+    """Name of a resized copy of ``fieldfile``, generated on first use.
+
+    Falls back to the original name when the file is not an image or cannot
+    be read, so templates always get something to show.
+    """
+    name = fieldfile.name if fieldfile else ""
+    if not name or not is_image(name) or fmt not in FORMATS:
+        return name
+
+    # Whether the variant exists is a stat on local storage, cheaper than a
+    # cache round trip, and never outlives a variant gc_media deleted
+    storage = fieldfile.storage
+    target = variant_name(name, width, fmt, crop)
+    exists = storage.exists(target) and not _outdated(storage, name, target)
+    cache_lookup("thumbnail", exists)
+    if exists:
+        return target
+
+    key = f"thumb:failed:{target}"
+    if cache.get(key):
+        return name
+    try:
+        with storage.open(name, "rb") as source:
+            data = render_variant(source, width, fmt, crop)
+        save = getattr(storage, "save_derived", storage.save)
+        return save(target, ContentFile(data))
+    except Exception as e:
+        logger.warning(f"Could not create {width}px {fmt} variant of {name}: {e}")
+        cache.set(key, True, FAILED_TIMEOUT)
+        return name
+
+
+def _outdated(storage, name, target) -> bool:
+    """Whether ``target`` is older than the original it was made from.
+
+    Only files stored before uploads were content-addressed can be replaced
+    under the same name.
+    """
+    if digest_from_name(name):
+        return False
+    try:
+        return storage.get_modified_time(target) < storage.get_modified_time(name)
+    except (NotImplementedError, OSError):
+        return False
+
+
+def variant_url(fieldfile, width: int, fmt: str = "webp", crop: bool = False) -> str:
+    if not fieldfile:
+        return ""
+    return fieldfile.storage.url(get_variant(fieldfile, width, fmt, crop))
+
+
+VARIANT_SUFFIX = re.compile(r"^\.\d+(?:w|sq)\.(?:webp|jpeg)$")
+
+
+def variant_names(storage, name: str) -> list[str]:
+    """Names of the generated variants of ``name`` that exist in ``storage``."""
+    directory, basename = os.path.split(name)
+    stem = os.path.splitext(basename)[0]
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [
+        os.path.join(directory, f).replace("\\", "/")
+        for f in files
+        if f.startswith(stem) and VARIANT_SUFFIX.match(f[len(stem) :])
+    ]
+
+
+def delete_variants(storage, name: str):
+    for variant in variant_names(storage, name):
+        storage.delete(variant)
@@ -0,0 +1,149 @@
+# core/tracing.py
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# The span that new spans attach to. Context variables follow the code into
+# awaited coroutines, asyncio tasks and sync_to_async threads, so nested
+# calls find their parent without it being passed around.
+_current = ContextVar("trace_span", default=None)
+_write_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "_t0")
+
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self, error=None):
+        record = {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round((time.perf_counter() - self._t0) * 1000, 3),
+            "attrs": self.attrs,
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        # list.append is atomic, so spans may finish in any thread
+        self.trace.records.append(record)
+        return record
+
+
+class _NoSpan:
+    """Stands in for a span when nothing is being traced."""
+
+    def set(self, **attrs):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Trace:
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.records = []
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def _activate(span):
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.finish(error=e)
+        raise
+    else:
+        span.finish()
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a stage of the current trace; yields a span to ``set()`` attrs on.
+
+    Outside a trace this yields NO_SPAN and records nothing.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield NO_SPAN
+        return
+    with _activate(Span(parent.trace, name, parent.span_id, attrs)) as child:
+        yield child
+
+
+@contextmanager
+def trace(name: str, trace_id: str = None, **attrs):
+    """Start a trace rooted at a ``name`` span and export it when done.
+
+    ``trace_id`` correlates the spans, e.g. with a request id. A no-op
+    yielding NO_SPAN while TRACING_ENABLED is off.
+    """
+    if not getattr(settings, "TRACING_ENABLED", False):
+        yield NO_SPAN
+        return
+    root = Span(Trace(trace_id or new_trace_id()), name, None, attrs)
+    try:
+        with _activate(root):
+            yield root
+    finally:
+        export(root.trace)
+
+
+def export(trace):
+    """Append the spans of ``trace`` to TRACING_FILE, one JSON object per line."""
+    records = trace.records
+    if not records or records[-1]["duration_ms"] < settings.TRACING_MIN_MS:
+        return
+    lines = "".join(json.dumps(r, default=str) + "\n" for r in records)
+    path = settings.TRACING_FILE
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One append per trace keeps concurrent workers' traces whole
+        with _write_lock, open(path, "a") as fh:
+            fh.write(lines)
+    except OSError as e:
+        logger.warning(f"Could not write trace {trace.trace_id}: {e}")
+
+
+def read_traces(path=None) -> dict:
+    """Spans in ``path`` (default TRACING_FILE) grouped by trace id, in file order."""
+    traces = {}
+    try:
+        with open(path or settings.TRACING_FILE) as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                traces.setdefault(record["trace_id"], []).append(record)
+    except FileNotFoundError:
+        pass
+    return traces
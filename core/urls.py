@@ -16,6 +16,7 @@ urlpatterns = [
     path("courses/", views.course_list, name="course_list"),
     path("courses/<slug:slug>/", views.course_detail, name="course_detail"),
     path("courses/<slug:slug>/join/", views.join_course, name="join_course"),
+    path("courses/<slug:slug>/export/", views.export_course, name="export_course"),
     path("courses/<slug:slug>/post/new/", views.create_post, name="create_post"),
     path("posts/<slug:slug>/", views.post_detail, name="post_detail"),
     path("posts/<slug:slug>/edit/", views.edit_post, name="edit_post"),
@@ -45,4 +46,9 @@ urlpatterns = [
     path(
         "subscribe-newsletter/", views.subscribe_newsletter, name="subscribe_newsletter"
     ),
+    # staff tools
+    path("staff/profiles/", views.profile_list, name="profile_list"),
+    path(
+        "staff/profiles/<str:name>/", views.profile_download, name="profile_download"
+    ),
 ]
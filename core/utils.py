@@ -1,28 +1,73 @@
+import asyncio
 import re
 import time
-import requests
+import weakref
 import logging
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from requests.adapters import HTTPAdapter, Retry
-from PyPDF2 import PdfReader
+
+from . import local_models
+from .lazy import lazy_import
+from .metrics import (
+    HF_RETRIES,
+    PDF_EXTRACT_LATENCY,
+    SUMMARY_CHUNKS,
+    hf_call,
+    local_inference,
+)
+from .tracing import span
 
 logger = logging.getLogger(__name__)
+# Only the AI views and jobs need these; keep them out of worker start-up
+httpx = lazy_import("httpx")
+requests = lazy_import("requests")
+PyPDF2 = lazy_import("PyPDF2")
+
+HF_API_URL = "https://api-inference.huggingface.co/models/{model}"
+# Hardcode models to ensure they are correct and available, bypassing .env issues.
+SUMMARY_MODELS = [
+    "facebook/bart-large-cnn",  # Primary
+    "t5-base",                  # Fallback
+]
+EXPLAIN_MODELS = [
+    "google/flan-t5-small", # Primary
+    "t5-small",             # Fallback
+]
 
 
 # ✅ Extract text from PDF
-def extract_text_from_pdf(file_path: str) -> str:
-    reader = PdfReader(file_path)
-    texts = []
-    for page in reader.pages:
-        txt = page.extract_text()
-        if txt:
-            texts.append(txt)
-    return "\n".join(texts)
+@PDF_EXTRACT_LATENCY.time()
+def extract_text_from_pdf(file_path: str, max_pages: int = None) -> str:
+    with span("extract_text_from_pdf") as s:
+        reader = PyPDF2.PdfReader(file_path)
+        texts = []
+        pages = reader.pages[:max_pages]
+        for page in pages:
+            txt = page.extract_text()
+            if txt:
+                texts.append(txt)
+        text = "\n".join(texts)
+        s.set(pages=len(pages), chars=len(text))
+        return text
+
+
+SENTENCE_END = re.compile(r"(?<=[\.\?\!])\s+")
+
+
+def split_sentences(text: str) -> list[str]:
+    return SENTENCE_END.split(text)
 
 
 # ✅ Split into chunks under HF token/size limit
 def chunk_text(text: str, max_chars: int = 4500) -> list[str]:
-    sentences = re.split(r"(?<=[\.\?\!])\s+", text)
+    with span("chunk_text", chars=len(text), max_chars=max_chars) as s:
+        chunks = _chunk_text(text, max_chars)
+        s.set(chunks=len(chunks))
+        return chunks
+
+
+def _chunk_text(text: str, max_chars: int) -> list[str]:
+    sentences = split_sentences(text)
     chunks, current = [], ""
 
     for sent in sentences:
@@ -38,62 +83,87 @@ def chunk_text(text: str, max_chars: int = 4500) -> list[str]:
 
 
 # ✅ Session w/ retry logic so fewer sudden random errors
-def _requests_session_with_retries() -> requests.Session:
+def _requests_session_with_retries() -> "requests.Session":
     session = requests.Session()
-    retries = Retry(
+    retries = requests.adapters.Retry(
         total=3,
         backoff_factor=0.5,
         status_forcelist=[429, 500, 502, 503, 504],
         allowed_methods=["POST"]
     )
-    adapter = HTTPAdapter(max_retries=retries)
+    adapter = requests.adapters.HTTPAdapter(max_retries=retries)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     return session
 
 
-# ✅ Robust flexible summarizer
-def generate_summary(text: str, max_length: int = 200, min_length: int = 50) -> str:
-    api_token = getattr(settings, "HF_API_TOKEN", None)
-    # Hardcode models to ensure they are correct and available, bypassing .env issues.
-    models = [
-        "facebook/bart-large-cnn",  # Primary
-        "t5-base",                  # Fallback
-    ]
+def _count_retries(model: str, resp) -> int:
+    # urllib3 records the retries it made behind the session's back
+    retries = getattr(resp.raw, "retries", None)
+    if retries is None or not retries.history:
+        return 0
+    HF_RETRIES.labels(model).inc(len(retries.history))
+    return len(retries.history)
 
+
+def _hf_headers() -> dict:
+    api_token = getattr(settings, "HF_API_TOKEN", None)
     if not api_token:
+        return {}
+    return {"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"}
+
+
+def _summary_payload(chunk: str, max_length: int, min_length: int) -> dict:
+    return {
+        "inputs": chunk,
+        "options": {"use_cache": False},
+        "parameters": {
+            "max_new_tokens": max_length,
+            "min_length": min_length,
+            "do_sample": False
+        }
+    }
+
+
+def _summary_output(data) -> str:
+    return (data[0].get("summary_text") or data[0].get("generated_text", "")).strip()
+
+
+def _explain_output(data) -> str:
+    return data[0].get("generated_text", "") or data[0].get("summary_text", "")
+
+
+# ✅ Robust flexible summarizer
+def generate_summary(text: str, max_length: int = 200, min_length: int = 50) -> str:
+    if settings.AI_SUMMARY_PROVIDER == "local":
+        return local_summary(text, max_length, min_length)
+    headers = _hf_headers()
+    if not headers:
         raise RuntimeError("HF Summarization models or API Token missing")
 
-    headers = {"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"}
     chunks = chunk_text(text)
+    SUMMARY_CHUNKS.observe(len(chunks))
     session = _requests_session_with_retries()
 
-    for model in models:
+    for model in SUMMARY_MODELS:
         summaries = []
-        api_url = f"https://api-inference.huggingface.co/models/{model}"
+        api_url = HF_API_URL.format(model=model)
         logger.info(f"Trying summarization with model: {model}")
 
         success = True
 
         for i, chunk in enumerate(chunks):
-            payload = {
-                "inputs": chunk,
-                "options": {"use_cache": False},
-                "parameters": {
-                    "max_new_tokens": max_length,
-                    "min_length": min_length,
-                    "do_sample": False
-                }
-            }
+            payload = _summary_payload(chunk, max_length, min_length)
             try:
-                resp = session.post(api_url, headers=headers, json=payload, timeout=60)
-                resp.raise_for_status()
-                data = resp.json()
-
-                text_out = data[0].get("summary_text") or data[0].get("generated_text", "")
-                summaries.append(text_out.strip())
+                with span("hf_call", model=model, chunk=i, chars=len(chunk)) as s:
+                    with hf_call(model):
+                        resp = session.post(api_url, headers=headers, json=payload, timeout=60)
+                        s.set(status=resp.status_code, retries=_count_retries(model, resp))
+                        resp.raise_for_status()
+                summaries.append(_summary_output(resp.json()))
 
-                time.sleep(0.4)
+                with span("sleep", seconds=0.4):
+                    time.sleep(0.4)
 
             except Exception as e:
                 logger.error(f"❌ HF model failed [{model}] | Chunk {i+1}: {e}")
@@ -109,6 +179,27 @@ def generate_summary(text: str, max_length: int = 200, min_length: int = 50) ->
     return "Summary unavailable. All models failed."
 
 
+# ✅ Same, with the model run in this process (AI_SUMMARY_PROVIDER=local)
+def local_summary(text: str, max_length: int = 200, min_length: int = 50) -> str:
+    summarizer = local_models.get_summarizer()
+    chunks = chunk_text(text)
+    SUMMARY_CHUNKS.observe(len(chunks))
+    summaries = []
+    for i, chunk in enumerate(chunks):
+        with span("local_generate", model=summarizer.name, chunk=i, chars=len(chunk)):
+            with local_inference(summarizer.name):
+                summaries.append(summarizer.summarize(chunk, max_length, min_length))
+    return "\n".join(summaries)
+
+
+def ai_result_ok(text: str) -> bool:
+    # The generators report exhausted model fallbacks as text, not exceptions
+    return not any(
+        marker in text
+        for marker in ("Explanation unavailable", "Summary unavailable")
+    )
+
+
 # ✅ Cleaning the explanation
 def clean_explanation(text: str, concept: str) -> str:
     sentences = re.split(r"(?<=[.!?])\s+", text)
@@ -132,30 +223,24 @@ def clean_explanation(text: str, concept: str) -> str:
 
 # ✅ Explanation generator with fallback
 def generate_explanation(text: str) -> str:
-    api_token = getattr(settings, "HF_API_TOKEN", None)
-    # Hardcode models to ensure they are correct and available, bypassing .env issues.
-    models = [
-        "google/flan-t5-small", # Primary
-        "t5-small",             # Fallback
-    ]
-
-    if not api_token:
+    headers = _hf_headers()
+    if not headers:
         return "Explanation unavailable (API not configured)"
 
-    headers = {"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"}
     session = _requests_session_with_retries()
     concept = text[:200]
 
-    for model in models:
-        api_url = f"https://api-inference.huggingface.co/models/{model}"
+    for model in EXPLAIN_MODELS:
+        api_url = HF_API_URL.format(model=model)
         payload = {"inputs": concept, "options": {"use_cache": False}}
 
         try:
-            resp = session.post(api_url, headers=headers, json=payload, timeout=40)
-            resp.raise_for_status()
-            data = resp.json()
-
-            output = data[0].get("generated_text", "") or data[0].get("summary_text", "")
+            with span("hf_call", model=model, chars=len(concept)) as s:
+                with hf_call(model):
+                    resp = session.post(api_url, headers=headers, json=payload, timeout=40)
+                    s.set(status=resp.status_code, retries=_count_retries(model, resp))
+                    resp.raise_for_status()
+            output = _explain_output(resp.json())
             if output:
                 return clean_explanation(output, concept)
 
@@ -165,6 +250,100 @@ def generate_explanation(text: str) -> str:
     return "Explanation unavailable. All models failed."
 
 
+# ✅ Async HF client, so a worker can wait on many model calls at once
+_async_clients = weakref.WeakKeyDictionary()
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _async_client() -> "httpx.AsyncClient":
+    # Connection pools belong to an event loop, so keep one client per loop
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limit = getattr(settings, "HF_MAX_CONNECTIONS", 200)
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit)
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def _apost(model: str, headers: dict, payload: dict, timeout: float):
+    """POST with the same retry policy as _requests_session_with_retries."""
+    client = _async_client()
+    url = HF_API_URL.format(model=model)
+    with span("hf_call", model=model, chars=len(payload["inputs"])) as s, hf_call(model):
+        for attempt in range(4):
+            if attempt:
+                HF_RETRIES.labels(model).inc()
+                s.set(retries=attempt)
+            try:
+                with span("hf_attempt", attempt=attempt) as a:
+                    resp = await client.post(url, headers=headers, json=payload, timeout=timeout)
+                    a.set(status=resp.status_code)
+                if resp.status_code not in RETRY_STATUSES or attempt == 3:
+                    resp.raise_for_status()
+                    return resp.json()
+            except httpx.TransportError:
+                if attempt == 3:
+                    raise
+            with span("retry_backoff", seconds=0.5 * 2**attempt):
+                await asyncio.sleep(0.5 * 2**attempt)
+
+
+async def agenerate_summary(text: str, max_length: int = 200, min_length: int = 50) -> str:
+    if settings.AI_SUMMARY_PROVIDER == "local":
+        # CPU-bound, and torch releases the GIL while it computes
+        return await sync_to_async(local_summary, thread_sensitive=False)(
+            text, max_length, min_length
+        )
+    headers = _hf_headers()
+    if not headers:
+        raise RuntimeError("HF Summarization models or API Token missing")
+
+    chunks = chunk_text(text)
+    SUMMARY_CHUNKS.observe(len(chunks))
+    for model in SUMMARY_MODELS:
+        summaries = []
+        logger.info(f"Trying summarization with model: {model}")
+
+        try:
+            for i, chunk in enumerate(chunks):
+                payload = _summary_payload(chunk, max_length, min_length)
+                data = await _apost(model, headers, payload, timeout=60)
+                summaries.append(_summary_output(data))
+                with span("sleep", seconds=0.4):
+                    await asyncio.sleep(0.4)
+        except Exception as e:
+            logger.error(f"❌ HF model failed [{model}] | Chunk {i+1}: {e}")
+            logger.warning(f"⚠️ Model failed: {model} — trying fallback")
+            continue
+
+        logger.info(f"✅ Summarization success using model: {model}")
+        return "\n".join(summaries)
+
+    return "Summary unavailable. All models failed."
+
+
+async def agenerate_explanation(text: str) -> str:
+    headers = _hf_headers()
+    if not headers:
+        return "Explanation unavailable (API not configured)"
+
+    concept = text[:200]
+    for model in EXPLAIN_MODELS:
+        payload = {"inputs": concept, "options": {"use_cache": False}}
+        try:
+            data = await _apost(model, headers, payload, timeout=40)
+            output = _explain_output(data)
+            if output:
+                return clean_explanation(output, concept)
+        except Exception as e:
+            logger.error(f"Explanation API failed [{model}]: {e}")
+
+    return "Explanation unavailable. All models failed."
+
+
 # ✅ HF Test Function for debug view
 def test_api_connection():
     token = getattr(settings, "HF_API_TOKEN", None)
@@ -0,0 +1,46 @@
+# core/versions.py
+
+import time
+from django.core.cache import cache
+
+# Version counters used in fragment cache keys. Bumping a counter makes every
+# fragment keyed on the old value unreachable, so nothing is ever deleted.
+# Kinds in use:
+#   "course" - course card (members, posts, likes, comments)
+#   "post"   - post page (content, attachment, comments)
+#   "likes"  - like button and count of a post
+#   "notifications" - a user's notification badge and dropdown
+#   "profile" - a user's name and avatar, in the pages they view themselves
+
+
+def _key(kind: str, pk) -> str:
+    return f"version:{kind}:{pk}"
+
+
+def _initial() -> int:
+    # Seed from the clock rather than 1: if a counter is evicted, its new
+    # value must not collide with fragments cached under the old one.
+    return time.time_ns()
+
+
+def get_versions(kind: str, pks) -> dict:
+    keys = {_key(kind, pk): pk for pk in pks}
+    found = cache.get_many(list(keys))
+    missing = {key: _initial() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_version(kind: str, pk) -> int:
+    return get_versions(kind, [pk])[pk]
+
+
+def bump_version(kind: str, *pks) -> None:
+    for pk in pks:
+        key = _key(kind, pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), timeout=None)
@@ -1,28 +1,71 @@
 # core/views.py
 
 import re
-import requests
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q, Count
 from django.core.exceptions import PermissionDenied
-from django.http import JsonResponse
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.views.decorators.http import require_POST
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.html import format_html
 import logging
+from django.conf import settings
 logger = logging.getLogger(__name__)
 from django.core.mail import send_mail
 
-from .models import Profile, Discipline, Course, Post, Comment, Like, Notification, User
+from .models import (
+    AIJob,
+    Profile,
+    Discipline,
+    Course,
+    Post,
+    Comment,
+    Like,
+    Notification,
+    User,
+)
 from .forms import CommentForm, PostForm, ProfileForm, UserRegisterForm, NewsletterForm
 from .utils import (
     extract_text_from_pdf,
     chunk_text,
-    generate_summary,
-    generate_explanation,
+    agenerate_summary,
+    agenerate_explanation,
+    ai_result_ok,
 )
+from .likes import post_like_count, toggle_post_like, user_likes_post
+from .stats import course_card_stats, get_user_stats
+from .queries import with_comment_counts
+from .versions import bump_version, get_version, get_versions
+from .conditional import not_modified, page_etag, set_validators
+from .exports import EXPORT_FORMATS, iter_course_rows, iter_export_lines
+from .metrics import cache_lookup, render_metrics
+from .profiling import list_profiles, profile_path
+from .duplicates import find_near_duplicates, reuse_summaries
+from .ai_jobs import (
+    content_hash,
+    is_short_content,
+    precomputed_result,
+    schedule_precompute,
+)
+from .textrank import compress, extractive_summary
+from .tracing import span
+from .throttle import ai_admission, pdf_cost, text_cost
+
+# Context processors query the database, so async views render in a thread
+arender = sync_to_async(render)
 
 
 def home(request):
@@ -65,14 +108,11 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     profile = request.user.profile
-    posts = Post.objects.filter(author=request.user).order_by("-created_at")
-    posts_count = posts.count()
-    active_course = (
-        Course.objects.filter(members=profile)
-        .annotate(post_count=Count("posts"))
-        .order_by("-post_count")
-        .first()
-    )
+    posts = with_comment_counts(
+        Post.objects.filter(author=request.user).select_related("course")
+    ).order_by("-created_at")
+    posts_count = get_user_stats(request.user).total_posts
+    active_course = profile.joined_courses.order_by("-post_count").first()
 
     return render(
         request,
@@ -103,30 +143,48 @@ def edit_profile(request):
 
 @login_required
 def course_list(request):
-    disciplines = Discipline.objects.prefetch_related(
-        "course_set",
-        "course_set__members",
-        "course_set__posts",
-        "course_set__posts__likes",
-        "course_set__posts__comments",
-    ).all()
-
-    for discipline in disciplines:
-        for course in discipline.course_set.all():
-            course.total_likes = sum(post.likes.count() for post in course.posts.all())
-            course.total_comments = sum(
-                post.comments.count() for post in course.posts.all()
-            )
-
-    return render(request, "course_list.html", {"disciplines": disciplines})
+    disciplines = Discipline.objects.prefetch_related("course_set").all()
+
+    # Course cards are cached per course version; statistics are only
+    # queried, in bulk, for the cards that have to be re-rendered.
+    courses = [course for d in disciplines for course in d.course_set.all()]
+    versions = get_versions("course", [course.pk for course in courses])
+    cards = {}
+    for course in courses:
+        course.cache_version = versions[course.pk]
+        key = make_template_fragment_key("course_card", [course.pk, course.cache_version])
+        cards[key] = course
+    cached = cache.get_many(list(cards))
+    for key in cards:
+        cache_lookup("fragment", key in cached)
+    stale = [course for key, course in cards.items() if key not in cached]
+    if stale:
+        card_stats = course_card_stats([course.pk for course in stale])
+        for course in stale:
+            course.__dict__.update(card_stats[course.pk])
+
+    joined_course_ids = set(
+        request.user.profile.joined_courses.values_list("pk", flat=True)
+    )
+    return render(
+        request,
+        "course_list.html",
+        {"disciplines": disciplines, "joined_course_ids": joined_course_ids},
+    )
 
 
 @login_required
 def course_detail(request, slug):
     course = get_object_or_404(Course, slug=slug)
+    etag = page_etag(request, request.user, get_version("course", course.pk))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
 
     filter_type = request.GET.get("filter", "all")
-    all_posts = course.posts.all().order_by("-created_at")
+    all_posts = with_comment_counts(
+        course.posts.select_related("author__profile")
+    ).order_by("-created_at")
     if filter_type == "pdf":
         posts = all_posts.filter(file__iendswith=".pdf")
     elif filter_type == "image":
@@ -136,7 +194,7 @@ def course_detail(request, slug):
     else:
         posts = all_posts
 
-    is_joined = course in request.user.profile.joined_courses.all()
+    is_joined = request.user.profile.joined_courses.filter(pk=course.pk).exists()
     filter_choices = [
         ("all", "All"),
         ("pdf", "PDF"),
@@ -144,7 +202,7 @@ def course_detail(request, slug):
         ("text", "Text"),
     ]
 
-    return render(
+    response = render(
         request,
         "course_detail.html",
         {
@@ -155,6 +213,51 @@ def course_detail(request, slug):
             "filter_choices": filter_choices,
         },
     )
+    return set_validators(response, etag)
+
+
+@login_required
+def export_course(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    course = get_object_or_404(Course, slug=slug)
+    export_format = request.GET.get("format", "jsonl")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"error": "Unsupported format."}, status=400)
+
+    response = StreamingHttpResponse(
+        iter_export_lines(iter_course_rows(course), export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{course.slug}.{export_format}"'
+    )
+    return response
+
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=403)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+@login_required
+def profile_list(request):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return render(request, "profiles.html", {"profiles": list_profiles()})
+
+
+@login_required
+def profile_download(request, name):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    path = profile_path(name)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
 
 
 @login_required
@@ -181,6 +284,23 @@ def create_post(request, slug):
             post.course = course
             post.save()
             messages.success(request, "Your post has been created!")
+            near = find_near_duplicates(post)
+            if near:
+                original, score = near[0]
+                # Its summaries describe this post too; no need to pay for new ones
+                reuse_summaries(post, original)
+                messages.warning(
+                    request,
+                    format_html(
+                        'This looks like a repost of <a href="{}">{}</a> in {} '
+                        "({}% similar).",
+                        reverse("post_detail", args=[original.slug]),
+                        original.title,
+                        original.course.code,
+                        round(score * 100),
+                    ),
+                )
+            schedule_precompute(post)
             return redirect("post_detail", slug=post.slug)
     else:
         form = PostForm()
@@ -196,28 +316,38 @@ def create_post(request, slug):
 
 @login_required
 def post_detail(request, slug):
-    post = get_object_or_404(Post, slug=slug)
-    comment_form = CommentForm()
-
-    # To show 'explain' button for short content, 'summary' for long content
-    TEXT_EXPLAIN_THRESHOLD = 200
-    content_text = post.content or ""
-    is_short_content = (
-        bool(content_text.strip()) and len(content_text) <= TEXT_EXPLAIN_THRESHOLD
+    post = get_object_or_404(
+        Post.objects.select_related("course", "author__profile"), slug=slug
     )
+    post_version = get_version("post", post.pk)
+    like_version = get_version("likes", post.pk)
+    etag = page_etag(request, request.user, post_version, like_version)
+    cached = not_modified(request, etag, post.updated_at)
+    if cached:
+        return cached
 
-    comments = post.comments.all().order_by("-created_at")  # Most recent first
+    comment_form = CommentForm()
 
-    return render(
+    comments = post.comments.select_related("user__profile").order_by(
+        "-created_at"
+    )  # Most recent first
+
+    response = render(
         request,
         "post_detail.html",
         {
             "post": post,
             "comment_form": comment_form,
-            "is_short_content": is_short_content,
+            # To show 'explain' button for short content, 'summary' for long content
+            "is_short_content": is_short_content(post.content),
             "comments": comments,
+            "is_liked": user_likes_post(request.user, post),
+            "like_count": post_like_count(post),
+            "post_version": post_version,
+            "like_version": like_version,
         },
     )
+    return set_validators(response, etag, post.updated_at)
 
 
 @login_required
@@ -244,7 +374,7 @@ def add_comment(request, post_id):
                 )
 
         # Always return updated comments list, regardless of form validity
-        comments = post.comments.all().order_by("-created_at")
+        comments = post.comments.select_related("user__profile").order_by("-created_at")
         return render(
             request,
             "_comments_list.html",
@@ -264,7 +394,7 @@ def edit_post(request, slug):
     if request.method == "POST":
         form = PostForm(request.POST, request.FILES, instance=post)
         if form.is_valid():
-            form.save()
+            schedule_precompute(form.save())
             messages.success(request, "Post updated successfully!")
             return redirect("post_detail", slug=post.slug)
     else:
@@ -325,7 +455,7 @@ def delete_comment(request, comment_id):
     post = comment.post
     if request.method == "POST":
         comment.delete()
-        comments = post.comments.all().order_by("-created_at")
+        comments = post.comments.select_related("user__profile").order_by("-created_at")
         return render(
             request, "_comments_list.html", {"comments": comments, "user": request.user}
         )
@@ -358,17 +488,14 @@ def toggle_like(request, post_id):
     user = request.user
 
     # Like / Unlike
-    if user in post.likes.all():
-        Like.objects.filter(user=user, post=post).delete()
-    else:
-        Like.objects.create(user=user, post=post)
-        if post.author != user:
-            Notification.objects.create(
-                user=post.author,
-                from_user=user,
-                post=post,
-                message=f'{user.username} liked your post "{post.title}"',
-            )
+    liked = toggle_post_like(user, post)
+    if liked and post.author != user:
+        Notification.objects.create(
+            user=post.author,
+            from_user=user,
+            post=post,
+            message=f'{user.username} liked your post "{post.title}"',
+        )
 
     # If it's an HTMX request, render only the like form partial
     if request.headers.get("Hx-Request"):
@@ -378,6 +505,9 @@ def toggle_like(request, post_id):
             {
                 "post": post,
                 "user": user,
+                "is_liked": liked,
+                "like_count": post_like_count(post),
+                "like_version": get_version("likes", post.pk),
             },
         )
 
@@ -386,48 +516,34 @@ def toggle_like(request, post_id):
 
 @login_required
 def dashboard(request):
-    profile = request.user.profile
-    total_posts = Post.objects.filter(author=request.user).count()
-    top_liked = (
-        Post.objects.filter(author=request.user)
-        .annotate(like_count=Count("likes"))
-        .order_by("-like_count")
-        .first()
-    )
-    active_course = (
-        Course.objects.filter(members=profile)
-        .annotate(post_count=Count("posts"))
+    stats = get_user_stats(request.user)
+    # Per-course counts live on Course.post_count, most active first
+    course_stats = list(
+        Course.objects.filter(members__user=request.user)
         .order_by("-post_count")
-        .first()
-    )
-    course_stats = (
-        Course.objects.filter(members=profile)
-        .annotate(post_count=Count("posts"))
         .values("title", "post_count")
     )
-    top5_posts = (
-        Post.objects.filter(author=request.user)
-        .annotate(like_count=Count("likes"))
-        .order_by("-like_count")[:5]
-        .values("title", "like_count")
-    )
+    top5_posts = [
+        {"title": p["title"], "like_count": p["like_count"]} for p in stats.top_posts
+    ]
     return render(
         request,
         "dashboard.html",
         {
-            "total_posts": total_posts,
-            "top_liked": top_liked,
-            "active_course": active_course,
-            "course_stats": list(course_stats),
-            "top5_posts": list(top5_posts),
+            "total_posts": stats.total_posts,
+            "top_liked": top5_posts[0] if top5_posts else None,
+            "active_course": course_stats[0] if course_stats else None,
+            "course_stats": course_stats,
+            "top5_posts": top5_posts,
         },
     )
 
 
 @login_required
 def notifications(request):
-    notes = request.user.notifications.all()
-    request.user.notifications.filter(is_read=False).update(is_read=True)
+    notes = request.user.notifications.select_related("post")
+    if request.user.notifications.filter(is_read=False).update(is_read=True):
+        bump_version("notifications", request.user.pk)
     return render(
         request,
         "notifications.html",
@@ -455,121 +571,252 @@ def delete_notification(request, pk):
     return JsonResponse({"success": True})
 
 
+async def ai_partial_etag(request, post, kind):
+    """ETag for an AI partial; it only changes when the post itself does."""
+    user = await request.auser()
+    return await sync_to_async(
+        lambda: page_etag(request, user, kind, get_version("post", post.pk))
+    )()
+
+
+async def extractive_preview(text):
+    """Local TextRank summary of ``text``, computed once per content.
+
+    It takes ~150ms of CPU on a long post, so it runs in a worker thread
+    rather than on the event loop, and polling clients reuse the result.
+    """
+    key = f"ai_preview:{content_hash(text)}"
+    preview = await cache.aget(key)
+    if preview is None:
+        preview = await sync_to_async(extractive_summary, thread_sensitive=False)(
+            text
+        )
+        await cache.aset(key, preview)
+    return preview
+
+
+async def ai_queued(request, post, admission, text=None):
+    """Cheap stand-in for an AI result when the request was not admitted."""
+    # The background worker produces the result instead; a later retry is
+    # then served from the stored copy without running the model again
+    await sync_to_async(schedule_precompute)(post, priority=AIJob.INTERACTIVE)
+    if admission.reason == "busy":
+        message = "The AI tools are busy right now. Your request has been queued."
+    else:
+        message = "You have reached your AI request limit. Your request has been queued."
+    response = await arender(
+        request,
+        "partials/ai_summary.html",
+        {
+            "queued": message,
+            "retry_url": request.get_full_path(),
+            "retry_in": max(5, min(admission.retry_after, 30)),
+            # Something to read right away while the model result is pending
+            "preview": await extractive_preview(text) if text else "",
+        },
+    )
+    response["Retry-After"] = str(admission.retry_after)
+    return response
+
+
+def ai_error_message(error, what):
+    error_msg = str(error)
+    if "API_TOKEN" in error_msg:
+        return "API configuration error. Please check your Hugging Face API settings."
+    if "timeout" in error_msg.lower():
+        return "API request timed out. The server might be busy, please try again later."
+    if "extract_text" in error_msg:
+        return "Could not extract text from PDF. The file might be corrupted or password protected."
+    return f"Could not generate AI {what}. Please try again later."
+
+
 @login_required
-def post_explain(request, slug):
-    post = get_object_or_404(Post, slug=slug)
+async def post_explain(request, slug):
+    post = await aget_object_or_404(Post, slug=slug)
+    etag = await ai_partial_etag(request, post, "explain")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     text = (post.content or "").strip()
     if not text:
-        return render(
+        return await arender(
             request,
             "partials/ai_summary.html",
             {"error": "No text content to explain."},
         )
-    try:
-        explanation = generate_explanation(text)
-        return render(
+    stored = precomputed_result(post, AIJob.EXPLANATION)
+    cache_lookup("ai_result", bool(stored))
+    if stored:
+        response = await arender(
             request,
             "partials/ai_summary.html",
-            {
-                "summary": explanation,
-                "title": "AI Explanation",
-                "now": timezone.localtime(),
-            },
+            {"summary": stored, "title": "AI Explanation", "now": timezone.localtime()},
         )
-    except Exception as e:
-        logger.error(f"AI explanation error: {str(e)}")
+        return set_validators(response, etag)
 
-        error_msg = str(e)
-        if "API_TOKEN" in error_msg:
-            error_msg = (
-                "API configuration error. Please check your Hugging Face API settings."
+    async with ai_admission(await request.auser(), cost=1) as admission:
+        if not admission.admitted:
+            return await ai_queued(request, post, admission)
+        try:
+            explanation = await agenerate_explanation(text)
+        except Exception as e:
+            logger.error(f"AI explanation error: {str(e)}")
+            return await arender(
+                request,
+                "partials/ai_summary.html",
+                {"error": ai_error_message(e, "explanation")},
             )
-        elif "timeout" in error_msg.lower():
-            error_msg = "API request timed out. The server might be busy, please try again later."
-        else:
-            error_msg = "Could not generate AI explanation. Please try again later."
 
-        return render(request, "partials/ai_summary.html", {"error": error_msg})
+    response = await arender(
+        request,
+        "partials/ai_summary.html",
+        {
+            "summary": explanation,
+            "title": "AI Explanation",
+            "now": timezone.localtime(),
+        },
+    )
+    return set_validators(response, etag) if ai_result_ok(explanation) else response
+
+
+async def shared_pdf_summary(post):
+    """A summary already generated for the same upload by any post."""
+    if not post.file_digest:
+        return None
+    return await (
+        Post.objects.filter(file=post.file.name, pdf_summary__gt="")
+        .values_list("pdf_summary", flat=True)
+        .afirst()
+    )
 
 
 @login_required
-def post_summary(request, slug):
-    post = get_object_or_404(Post, slug=slug)
+async def post_summary(request, slug):
+    post = await aget_object_or_404(Post, slug=slug)
     summary_type = request.GET.get("type", "pdf")  # 'pdf' or 'text'
+    etag = await ai_partial_etag(request, post, f"summary-{summary_type}")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    # Serve stored results first, then charge for new work by its size
+    if summary_type == "pdf":
+        if not post.file:
+            return await arender(
+                request, "partials/ai_summary.html", {"error": "No PDF attached."}
+            )
+        stored = await shared_pdf_summary(post)
+        if stored and post.pdf_summary != stored:
+            post.pdf_summary = stored
+            await post.asave(update_fields=["pdf_summary"])
+        text = None
+        try:
+            cost = pdf_cost(post.file.size)
+        except OSError:
+            cost = 1
+    else:
+        text = (post.content or "").strip()
+        if not text:
+            return await arender(
+                request,
+                "partials/ai_summary.html",
+                {"error": "No text content to process."},
+            )
+        stored = precomputed_result(post, AIJob.TEXT_SUMMARY)
+        cost = text_cost(text)
 
-    # Get the source text
-    try:
-        if summary_type == "pdf":
-            if not post.file:
-                return render(
-                    request, "partials/ai_summary.html", {"error": "No PDF attached."}
-                )
-            text = extract_text_from_pdf(post.file.path)
-            if not text.strip():
-                return render(
-                    request,
-                    "partials/ai_summary.html",
-                    {
-                        "error": "Could not extract text from PDF. The file might be empty or protected."
-                    },
-                )
-        else:
-            text = (post.content or "").strip()
-            if not text:
-                return render(
-                    request,
-                    "partials/ai_summary.html",
-                    {"error": "No text content to process."},
-                )
+    cache_lookup("ai_result", bool(stored))
+    if stored:
+        response = await arender(
+            request,
+            "partials/ai_summary.html",
+            {"summary": stored, "title": "AI Summary", "now": timezone.localtime()},
+        )
+        return set_validators(response, etag)
 
-        # Generate summary
-        chunks = chunk_text(text, max_chars=8000)
-        summaries = []
+    async with ai_admission(await request.auser(), cost) as admission:
+        if not admission.admitted:
+            return await ai_queued(request, post, admission, text)
+        try:
+            return await summarize_post(request, post, summary_type, text, etag)
+        except Exception as e:
+            logger.error(f"AI summary error: {str(e)}")
+            return await arender(
+                request,
+                "partials/ai_summary.html",
+                {"error": ai_error_message(e, "summary")},
+            )
 
-        for block in chunks:
-            try:
-                summaries.append(generate_summary(text=block))
-            except Exception as e:
-                logger.error(f"Chunk summarization error: {str(e)}")
-                return render(
-                    request,
-                    "partials/ai_summary.html",
-                    {"error": f"Error during summarization: {str(e)}"},
-                )
 
-        final_summary = "\n\n".join(summaries)
+async def summarize_post(request, post, summary_type, text, etag):
+    if summary_type == "pdf":
+        # PDF parsing is CPU-bound; keep it off the event loop
+        text = await sync_to_async(extract_text_from_pdf, thread_sensitive=False)(
+            post.file.path
+        )
+        if not text.strip():
+            return await arender(
+                request,
+                "partials/ai_summary.html",
+                {
+                    "error": "Could not extract text from PDF. The file might be empty or protected."
+                },
+            )
 
-        # If it's a PDF summary, save it
-        if summary_type == "pdf":
-            post.pdf_summary = final_summary
-            post.save()
+    # Generate summary
+    # Huge documents are cut down to their central sentences first; like
+    # TextRank below, that is CPU-bound and stays off the event loop
+    compressed = await sync_to_async(compress, thread_sensitive=False)(text)
+    chunks = chunk_text(compressed, max_chars=8000)
+    summaries = []
 
-        return render(
+    for i, block in enumerate(chunks):
+        try:
+            with span("summarize_block", block=i, chars=len(block)):
+                summaries.append(await agenerate_summary(text=block))
+        except Exception as e:
+            logger.error(f"Chunk summarization error: {str(e)}")
+            return await arender(
+                request,
+                "partials/ai_summary.html",
+                {"error": f"Error during summarization: {str(e)}"},
+            )
+
+    with span("reduce", parts=len(summaries)):
+        final_summary = "\n\n".join(summaries)
+    if not ai_result_ok(final_summary):
+        # Every model failed; fall back to the local extractive summary, which
+        # is neither saved nor cached so the next click tries the models again
+        return await arender(
             request,
             "partials/ai_summary.html",
             {
-                "summary": final_summary,
-                "title": "AI Summary",
+                "summary": await extractive_preview(text),
+                "title": "Quick Summary",
                 "now": timezone.localtime(),
             },
         )
 
-    except Exception as e:
-        logger.error(f"AI summary error: {str(e)}")
+    # If it's a PDF summary, save it
+    if summary_type == "pdf":
+        post.pdf_summary = final_summary
+        with span("persist"):
+            await post.asave(update_fields=["pdf_summary"])
 
-        error_msg = str(e)
-        if "API_TOKEN" in error_msg:
-            error_msg = (
-                "API configuration error. Please check your Hugging Face API settings."
-            )
-        elif "timeout" in error_msg.lower():
-            error_msg = "API request timed out. The server might be busy, please try again later."
-        elif "extract_text" in error_msg:
-            error_msg = "Could not extract text from PDF. The file might be corrupted or password protected."
-        else:
-            error_msg = "Could not generate AI summary. Please try again later."
-
-        return render(request, "partials/ai_summary.html", {"error": error_msg})
+    response = await arender(
+        request,
+        "partials/ai_summary.html",
+        {
+            "summary": final_summary,
+            "title": "AI Summary",
+            "now": timezone.localtime(),
+        },
+    )
+    # Saving bumped the post version, so the ETag computed above is stale
+    if summary_type == "pdf":
+        return response
+    return set_validators(response, etag)
 
 
 @login_required
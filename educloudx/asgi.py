@@ -5,12 +5,26 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Serve it with uvicorn workers so the async AI views (post_summary,
+post_explain) can wait on many model calls per process:
+
+    gunicorn educloudx.asgi:application -k uvicorn.workers.UvicornWorker
+
+With AI_SUMMARY_PROVIDER=local, add --preload and set LOCAL_MODEL_PRELOAD so
+the workers fork from a master that already mapped the model weights.
 """
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educloudx.settings')
 
 application = get_asgi_application()
+
+if settings.LOCAL_MODEL_PRELOAD:
+    from core.local_models import preload
+
+    preload()
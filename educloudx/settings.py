@@ -6,6 +6,7 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 
 from pathlib import Path
 import os
+import sys
 import environ
 
 
@@ -17,6 +18,7 @@ environ.Env.read_env(os.path.join(BASE_DIR, ".env"))
 # -------------- SECRET & DEBUG FROM ENV ----------------
 SECRET_KEY = env("DJANGO_SECRET_KEY", default="insecure-key-for-dev")
 DEBUG = env.bool("DEBUG", default=False)
+TESTING = sys.argv[1:2] == ["test"]
 
 ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=["localhost", "127.0.0.1"])
 
@@ -72,12 +74,17 @@ SOCIALACCOUNT_PROVIDERS = {
 
 # ----------------- MIDDLEWARE -----------------
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",                # request latency for /metrics
+    "core.middleware.TracingMiddleware",                # only with TRACING_ENABLED
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",       # ← WhiteNoise middleware added
+    "core.middleware.StaticFilesMiddleware",            # ← WhiteNoise, async-capable
+    "core.middleware.QueryBudgetMiddleware",            # logs N+1s and slow SQL
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",         # only with DATABASE_REPLICA_URL
+    "core.middleware.ProfilingMiddleware",              # only with PROFILING_ENABLED
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",     # for social-allauth
@@ -111,17 +118,51 @@ DATABASES = {
         default="sqlite:///" + str(BASE_DIR / "db.sqlite3")
     )
 }
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("DATABASE_CONN_MAX_AGE", default=0)
+
+# Optional read replica. GETs of READ_REPLICA_VIEWS read from it; a user who
+# has just written is kept on the primary for READ_REPLICA_STICKY_SECONDS.
+# Two local SQLite files work for trying it out (run `migrate --database replica`).
+DATABASE_REPLICA_URL = env("DATABASE_REPLICA_URL", default="")
+READ_REPLICA_ALIAS = "replica" if DATABASE_REPLICA_URL else None
+if READ_REPLICA_ALIAS:
+    DATABASES[READ_REPLICA_ALIAS] = env.db("DATABASE_REPLICA_URL")
+    DATABASES[READ_REPLICA_ALIAS]["CONN_MAX_AGE"] = env.int(
+        "DATABASE_REPLICA_CONN_MAX_AGE", default=DATABASES["default"]["CONN_MAX_AGE"]
+    )
+    # Tests run against a single database
+    DATABASES[READ_REPLICA_ALIAS]["TEST"] = {"MIRROR": "default"}
+for db in DATABASES.values():
+    db["CONN_HEALTH_CHECKS"] = db["CONN_MAX_AGE"] != 0
+
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+READ_REPLICA_VIEWS = ["course_list", "course_detail", "search", "post_detail"]
+READ_REPLICA_STICKY_SECONDS = env.int("READ_REPLICA_STICKY_SECONDS", default=10)
 
 # Cache configuration
-CACHES = {
-    "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": env("REDIS_URL", default="redis://127.0.0.1:6379/1"),
-        "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+# Version counters and cached fragments must be shared by all workers, so
+# production defaults to a local Redis. DEBUG and the test suite default to
+# a per-process in-memory cache instead; setting REDIS_URL to an empty value
+# forces that elsewhere too, which the core.W001 check warns about.
+REDIS_URL = env(
+    "REDIS_URL", default="" if DEBUG or TESTING else "redis://127.0.0.1:6379/1"
+)
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": REDIS_URL,
+            "OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            }
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         }
     }
-}
 
 # ----------------- PASSWORD VALIDATION -----------------
 AUTH_PASSWORD_VALIDATORS = [
@@ -147,6 +188,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Quality of the resized WebP/JPEG copies of uploaded images (core.thumbnails)
+THUMBNAIL_QUALITY = env.int("THUMBNAIL_QUALITY", default=80)
+
 # For WhiteNoise: compress static files and add cache-control headers
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
@@ -165,3 +209,126 @@ HF_SUMMARY_MODEL_PRIMARY = env("HF_SUMMARY_MODEL_PRIMARY", default="facebook/bar
 HF_SUMMARY_MODEL_FALLBACK = env("HF_SUMMARY_MODEL_FALLBACK", default="t5-base")
 HF_EXPLAIN_MODEL_PRIMARY = env("HF_EXPLAIN_MODEL_PRIMARY", default="google/flan-t5-small")
 HF_EXPLAIN_MODEL_FALLBACK = env("HF_EXPLAIN_MODEL_FALLBACK", default="t5-small")
+# Texts longer than this are cut down to their most central sentences by
+# core.textrank before summarization, bounding the model calls per document
+AI_PRECOMPRESS_CHARS = env.int("AI_PRECOMPRESS_CHARS", default=24000)
+# Connection pool size of the async client used by the AI views under ASGI
+HF_MAX_CONNECTIONS = env.int("HF_MAX_CONNECTIONS", default=200)
+# "api" calls the Hugging Face Inference API; "local" runs LOCAL_SUMMARY_MODEL
+# (a directory or Hub id with .safetensors weights) in-process via
+# core.local_models. The weights are memory-mapped, so all workers share one
+# copy; start gunicorn with --preload and LOCAL_MODEL_PRELOAD=True to load
+# the model once in the master and have workers inherit it warm.
+AI_SUMMARY_PROVIDER = env("AI_SUMMARY_PROVIDER", default="api")
+LOCAL_SUMMARY_MODEL = env("LOCAL_SUMMARY_MODEL", default="facebook/bart-large-cnn")
+LOCAL_MODEL_PRELOAD = env.bool("LOCAL_MODEL_PRELOAD", default=False)
+# Torch threads per worker; keep workers x threads <= cores
+LOCAL_MODEL_THREADS = env.int("LOCAL_MODEL_THREADS", default=1)
+
+# -------- AI precomputation (core.ai_jobs) --------
+# Creating or editing a post queues its summary/explanation; run the queue with
+# `python manage.py run_ai_jobs --loop` (or from cron without --loop).
+AI_PRECOMPUTE_ENABLED = env.bool("AI_PRECOMPUTE_ENABLED", default=True)
+# Each edit pushes the job back by this much, so a burst of edits runs once
+AI_PRECOMPUTE_DEBOUNCE_SECONDS = env.int("AI_PRECOMPUTE_DEBOUNCE_SECONDS", default=30)
+AI_JOB_LEASE_SECONDS = env.int("AI_JOB_LEASE_SECONDS", default=600)
+AI_JOB_MAX_ATTEMPTS = env.int("AI_JOB_MAX_ATTEMPTS", default=5)
+# Jobs queued by a click ("interactive") go ahead of jobs queued on upload
+# ("eager") and of bulk backfills. Backlogged classes share the workers in
+# proportion to their weights, at most *_CONCURRENCY jobs of a class run at
+# once, and a job moves up one class for every AI_JOB_AGING_SECONDS it waits.
+AI_JOB_CLASS_WEIGHTS = {"interactive": 6, "eager": 3, "backfill": 1}
+AI_JOB_CLASS_CONCURRENCY = {
+    "interactive": env.int("AI_JOB_INTERACTIVE_CONCURRENCY", default=4),
+    "eager": env.int("AI_JOB_EAGER_CONCURRENCY", default=2),
+    "backfill": env.int("AI_JOB_BACKFILL_CONCURRENCY", default=1),
+}
+AI_JOB_AGING_SECONDS = env.int("AI_JOB_AGING_SECONDS", default=300)
+
+# -------- AI admission control (core.throttle) --------
+# Each user has a token bucket measured in HF calls (one per 8000-character
+# chunk): AI_RATE_BURST calls at once, refilled at AI_RATE_PER_MINUTE.
+# Requests over the limit get a "queued" fragment and are left to run_ai_jobs.
+AI_RATE_BURST = env.int("AI_RATE_BURST", default=20)
+AI_RATE_PER_MINUTE = env.float("AI_RATE_PER_MINUTE", default=10)
+# Concurrent AI requests across all workers (and per user), so AI calls can
+# never occupy every worker that serves pages
+AI_MAX_CONCURRENT = env.int("AI_MAX_CONCURRENT", default=8)
+AI_MAX_CONCURRENT_PER_USER = env.int("AI_MAX_CONCURRENT_PER_USER", default=2)
+# Slots held by a worker that died are reclaimed after this long
+AI_SLOT_TTL = env.int("AI_SLOT_TTL", default=300)
+
+# -------- Near-duplicate posts (core.duplicates) --------
+# Estimated Jaccard similarity of post text (and PDF text) above which a new
+# post is reported as a repost and reuses the original's AI summaries
+DUPLICATE_THRESHOLD = env.float("DUPLICATE_THRESHOLD", default=0.8)
+# Pages of a PDF read for its fingerprint
+DUPLICATE_PDF_PAGES = env.int("DUPLICATE_PDF_PAGES", default=5)
+
+# -------- Request profiling (core.middleware.ProfilingMiddleware) --------
+# Off: the middleware is not loaded at all. On: staff requests sending an
+# "X-Profile: 1" header are profiled, plus PROFILING_SAMPLE_RATE of requests
+# to PROFILING_VIEWS (all views when empty). Profiles are listed at
+# /staff/profiles/ and only the newest PROFILING_KEEP are kept.
+PROFILING_ENABLED = env.bool("PROFILING_ENABLED", default=False)
+PROFILING_SAMPLE_RATE = env.float("PROFILING_SAMPLE_RATE", default=0.0)
+PROFILING_VIEWS = env.list("PROFILING_VIEWS", default=[])
+# "collapsed" (sampled stacks for flame graphs) or "pstats" (cProfile)
+PROFILING_FORMAT = env("PROFILING_FORMAT", default="collapsed")
+PROFILING_INTERVAL = env.float("PROFILING_INTERVAL", default=0.005)
+PROFILING_DIR = env("PROFILING_DIR", default=os.path.join(BASE_DIR, "profiles"))
+PROFILING_KEEP = env.int("PROFILING_KEEP", default=50)
+
+# -------- Metrics (core.metrics, served at /metrics) --------
+# Under gunicorn, export PROMETHEUS_MULTIPROC_DIR=<empty dir> before start-up
+# (and empty it on every deploy); each worker then writes its counters to
+# memory-mapped files there and /metrics sums them across workers.
+# When METRICS_TOKEN is set, scrapers must send "Authorization: Bearer <token>".
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# -------- Tracing (core.tracing) --------
+# Off: nothing is traced and the middleware is not loaded. On: requests to
+# TRACING_VIEWS (all views when empty) and background AI jobs record a span
+# per stage (PDF extraction, chunking, each model call and retry, reduce,
+# persist) and append them to TRACING_FILE as JSON lines, keyed by the
+# X-Request-ID. Only traces taking at least TRACING_MIN_MS are written.
+# Break one down with `python manage.py show_trace <request id>`.
+TRACING_ENABLED = env.bool("TRACING_ENABLED", default=False)
+TRACING_VIEWS = env.list("TRACING_VIEWS", default=["post_summary", "post_explain"])
+TRACING_FILE = env("TRACING_FILE", default=os.path.join(BASE_DIR, "traces.jsonl"))
+TRACING_MIN_MS = env.float("TRACING_MIN_MS", default=0)
+
+# -------- Start-up imports (manage.py import_report) --------
+# Autoscaled workers should serve traffic quickly after boot. Modules listed
+# as lazy are only needed by some requests and must be imported on first
+# use, not at boot. `import_report --check` enforces both; the test suite
+# runs it with a generous budget of its own. Import times vary by machine,
+# so set a tighter budget here where boots are measured on known hardware.
+STARTUP_IMPORT_BUDGET_MS = env.float("STARTUP_IMPORT_BUDGET_MS", default=None)
+STARTUP_LAZY_MODULES = env.list(
+    "STARTUP_LAZY_MODULES",
+    default=[
+        "numpy", "httpx", "PyPDF2", "PIL.Image",
+        "torch", "transformers", "safetensors",
+    ],
+)
+
+# -------- Likes --------
+# Buffer like/unlike events in Redis and apply them in batches with
+# `python manage.py flush_likes` (run it from cron) instead of writing per click.
+# Requires REDIS_URL.
+LIKES_WRITE_BEHIND = env.bool("LIKES_WRITE_BEHIND", default=False)
+
+# -------- Conditional GET (core.conditional) --------
+# Mixed into every ETag; set it to the release/commit id so a deploy with
+# changed templates does not answer 304 for pages rendered by the old code.
+ETAG_SALT = env("ETAG_SALT", default="")
+
+# -------- Query budgets (core.middleware.QueryBudgetMiddleware) --------
+QUERY_BUDGET_ENABLED = env.bool("QUERY_BUDGET_ENABLED", default=True)
+QUERY_BUDGET_MAX_QUERIES = env.int("QUERY_BUDGET_MAX_QUERIES", default=20)
+QUERY_BUDGET_MAX_SQL_MS = env.int("QUERY_BUDGET_MAX_SQL_MS", default=200)
+# The same statement running more often than this is reported as an N+1
+QUERY_BUDGET_MAX_DUPLICATES = env.int("QUERY_BUDGET_MAX_DUPLICATES", default=3)
+# Per-view overrides of QUERY_BUDGET_MAX_QUERIES, keyed by URL name
+QUERY_BUDGETS = {}
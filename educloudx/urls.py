@@ -20,11 +20,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core import views as core_views
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("core.urls")),
     path("accounts/", include("allauth.urls")),  # <-- THIS ONE!
     path("healthz/", lambda request: HttpResponse("OK")),
+    path("metrics", core_views.metrics, name="metrics"),
 ]
 
 
@@ -5,12 +5,22 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
+
+With AI_SUMMARY_PROVIDER=local, start gunicorn with --preload and set
+LOCAL_MODEL_PRELOAD so the workers fork from a master that already mapped the
+model weights.
 """
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educloudx.settings')
 
 application = get_wsgi_application()
+
+if settings.LOCAL_MODEL_PRELOAD:
+    from core.local_models import preload
+
+    preload()
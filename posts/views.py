@@ -1,18 +1,23 @@
+import logging
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404
 from django.http import JsonResponse
-from django.utils.log import logger
-from core.utils import generate_explanation
-from .models import Post
+from core.models import AIJob, Post
+from core.ai_jobs import precomputed_result, schedule_precompute
+from core.throttle import ai_admission
+from core.utils import agenerate_explanation
+
+logger = logging.getLogger(__name__)
 
 
 @login_required
-def explain_post(request, post_id):
+async def explain_post(request, post_id):
     """
     Post için AI açıklaması üretir.
     """
     try:
-        post = get_object_or_404(Post, id=post_id)
+        post = await aget_object_or_404(Post, id=post_id)
 
         # Post içeriğini logla
         logger.debug(
@@ -20,7 +25,25 @@ def explain_post(request, post_id):
         )
 
         # API'yi çağır
-        explanation = generate_explanation(f"{post.title} - {post.content}")
+        async with ai_admission(await request.auser(), cost=1) as admission:
+            if not admission.admitted:
+                # Limit aşıldıysa açıklamayı kuyruğa al, varsa hazırını döndür
+                await sync_to_async(schedule_precompute)(
+                    post, priority=AIJob.INTERACTIVE
+                )
+                return JsonResponse(
+                    {
+                        "explanation": precomputed_result(post, AIJob.EXPLANATION),
+                        "post_id": post_id,
+                        "status": "queued",
+                        "retry_after": admission.retry_after,
+                    },
+                    status=429,
+                    headers={"Retry-After": str(admission.retry_after)},
+                )
+            explanation = await agenerate_explanation(
+                f"{post.title} - {post.content}"
+            )
 
         # Başarılı sonucu logla
         logger.info(f"Generated explanation for post {post_id}: {explanation[:100]}...")